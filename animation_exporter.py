@@ -0,0 +1,209 @@
+import io
+import queue
+import struct
+import threading
+import zlib
+import errors
+import numpy as np
+from pathlib import Path
+from PIL import GifImagePlugin, Image
+from center_object import CenterObject
+from point_object import PointObject
+from simulation_visualizer import SimulationVisualizer
+
+# Formats an animation can be exported as - an animated GIF, an animated PNG
+# or a directory of numbered PNG frames
+ANIMATION_FORMATS = ("gif", "apng", "frames")
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# The acTL chunk comes right after the signature and the IHDR chunk
+_ACTL_OFFSET = len(_PNG_SIGNATURE) + 25
+
+
+class AnimationExporter:
+    # At most this many frames wait for the encoding thread, before drawing waits
+    _QUEUE_SIZE = 4
+
+    def __init__(self, sim_vis: SimulationVisualizer, center_obj: CenterObject,
+                 path: Path, animation_format: str = "gif", stride: int = 1,
+                 frame_duration: int = 40):
+        """
+        Exports an animation of the simulation, where every frame shows the steps
+        up to the stride-th step after the previous frame. Steps are added in chunks
+        with add_steps() and drawn onto one persistent frame, so each step is
+        drawn only once. Frames are encoded on a background thread while the next
+        ones are drawn and written to the file (or directory) as soon as they're
+        encoded, so no more than a few frames are held in memory. Path is the
+        animation file or the directory for the frames. Frame duration is
+        in milliseconds.
+        """
+        if animation_format not in ANIMATION_FORMATS:
+            raise errors.InvalidAnimationFormatError
+        if type(stride) is not int or stride <= 0:
+            raise errors.InvalidAnimationStrideError
+        self._sim_vis = sim_vis
+        self._path = path
+        self._animation_format = animation_format
+        self._stride = stride
+        self._frame_duration = frame_duration
+
+        self._frame = sim_vis.new_image(center_obj)
+        self._steps_since_frame = 0
+        self._frame_count = 0
+        # File of a GIF or APNG, opened once the first frame is encoded
+        self._file = None
+        self._encoded_count = 0
+        self._apng_sequence = 0
+        self._encoding_error = None
+        if animation_format == "frames":
+            path.mkdir(parents=True, exist_ok=True)
+
+        self._frame_queue = queue.Queue(self._QUEUE_SIZE)
+        self._encoding_thread = threading.Thread(target=self._encode_frames, daemon=True)
+        self._encoding_thread.start()
+
+    @property
+    def frame_count(self) -> int:
+        return self._frame_count
+
+    def add_steps(self, simulation_steps: np.ndarray):
+        """Draws the given (k, n, 2) steps, passing on a frame every stride steps."""
+        simulation_steps = np.asarray(simulation_steps, dtype=float)
+        start = 0
+        while start < len(simulation_steps):
+            end = start + self._stride - self._steps_since_frame
+            block = simulation_steps[start:end]
+            self._sim_vis.draw_steps(self._frame, block)
+            self._steps_since_frame += len(block)
+            start += len(block)
+            if self._steps_since_frame == self._stride:
+                self._pass_frame(self._frame.copy())
+
+    def close(self, point_objs: list[PointObject] = None):
+        """
+        Passes on the last frame, with end positions of the given point objects
+        drawn on it, waits for all frames to be encoded and finishes the animation.
+        """
+        if not self._encoding_thread.is_alive():
+            return
+        if self._steps_since_frame > 0 or point_objs is not None:
+            last_frame = self._frame.copy()
+            if point_objs is not None:
+                self._sim_vis.draw_end_positions(last_frame, point_objs)
+            self._pass_frame(last_frame)
+        self._frame_queue.put(None)
+        self._encoding_thread.join()
+        try:
+            if self._encoding_error is not None:
+                raise self._encoding_error
+            if self._file is not None:
+                self._finish_file()
+        finally:
+            if self._file is not None:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _pass_frame(self, frame: Image.Image):
+        """Hands a frame over to the encoding thread."""
+        self._frame_queue.put(frame)
+        self._frame_count += 1
+        self._steps_since_frame = 0
+
+    def _encode_frames(self):
+        """Runs on the encoding thread until a None frame is received."""
+        while True:
+            frame = self._frame_queue.get()
+            if frame is None:
+                return
+            if self._encoding_error is not None:
+                continue
+            try:
+                self._encode_frame(frame, self._encoded_count)
+                self._encoded_count += 1
+            except Exception as exc:
+                # Raised again by close(), in the thread which called it
+                self._encoding_error = exc
+
+    def _encode_frame(self, frame: Image.Image, index: int):
+        """Saves a numbered frame or appends it to the animation file."""
+        if self._animation_format == "frames":
+            frame.save(self._path / f"frame_{index:05d}.png")
+            return
+        if self._file is None:
+            self._file = open(self._path, "wb")
+        if self._animation_format == "gif":
+            self._write_gif_frame(frame, index)
+        else:
+            self._write_apng_frame(frame, index)
+
+    def _write_gif_frame(self, frame: Image.Image, index: int):
+        """Appends a frame with a palette of its own to the GIF file."""
+        # Quantizing to a palette is the costly part of GIF encoding
+        frame = frame.quantize()
+        if index == 0:
+            header, _ = GifImagePlugin.getheader(
+                frame, info={"loop": 0, "duration": self._frame_duration})
+            self._file.write(b"".join(header))
+        self._file.write(b"".join(GifImagePlugin.getdata(
+            frame, duration=self._frame_duration, include_color_table=True)))
+
+    def _write_apng_frame(self, frame: Image.Image, index: int):
+        """
+        Appends a frame to the APNG file. The frame is encoded as a PNG, whose
+        image data is copied into the animation - as IDAT chunks for the first
+        frame and fdAT chunks for the others, each after a frame control chunk.
+        """
+        encoded = io.BytesIO()
+        frame.save(encoded, "PNG")
+        chunks = self._read_png_chunks(encoded.getvalue())
+        if index == 0:
+            self._file.write(_PNG_SIGNATURE)
+            self._write_png_chunk(*chunks[0])  # IHDR
+            # The amount of frames is filled in once it's known
+            self._write_png_chunk(b"acTL", struct.pack(">II", 0, 0))
+        self._write_png_chunk(b"fcTL", struct.pack(
+            ">IIIIIHHBB", self._next_apng_sequence(), frame.width, frame.height,
+            0, 0, self._frame_duration, 1000, 0, 0))
+        for chunk_type, data in chunks[1:]:
+            if chunk_type == b"IDAT":
+                if index == 0:
+                    self._write_png_chunk(b"IDAT", data)
+                else:
+                    self._write_png_chunk(b"fdAT", struct.pack(
+                        ">I", self._next_apng_sequence()) + data)
+            elif index == 0 and chunk_type != b"IEND":
+                self._write_png_chunk(chunk_type, data)
+
+    def _finish_file(self):
+        """Ends the GIF or APNG file, once all frames have been written to it."""
+        if self._animation_format == "gif":
+            self._file.write(b";")
+            return
+        self._write_png_chunk(b"IEND", b"")
+        self._file.seek(_ACTL_OFFSET)
+        self._write_png_chunk(b"acTL", struct.pack(">II", self._encoded_count, 0))
+
+    def _next_apng_sequence(self) -> int:
+        """Returns the sequence number of the next fcTL or fdAT chunk."""
+        self._apng_sequence += 1
+        return self._apng_sequence - 1
+
+    def _write_png_chunk(self, chunk_type: bytes, data: bytes):
+        self._file.write(struct.pack(">I", len(data)) + chunk_type + data
+                         + struct.pack(">I", zlib.crc32(chunk_type + data)))
+
+    @staticmethod
+    def _read_png_chunks(png: bytes) -> list[tuple[bytes, bytes]]:
+        """Returns the type and data of each chunk of a PNG file."""
+        chunks = []
+        offset = len(_PNG_SIGNATURE)
+        while offset < len(png):
+            length, chunk_type = struct.unpack(">I4s", png[offset:offset + 8])
+            chunks.append((chunk_type, png[offset + 8:offset + 8 + length]))
+            offset += length + 12
+        return chunks
@@ -0,0 +1,254 @@
+import argparse
+import itertools
+import json
+import sys
+import errors
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from dataclasses import dataclass
+from pathlib import Path
+from config_data import ConfigData
+from body_table import BodyTable
+from point_object import PointObject
+from simulation import Simulation
+from space_event import SpaceEvent
+
+
+@dataclass
+class BatchMember:
+    name: str
+    config: ConfigData
+
+
+@dataclass
+class BatchResult:
+    name: str
+    point_obj_amount: int
+    collisions: list[SpaceEvent]
+    close_calls: list[SpaceEvent]
+
+    @property
+    def collided_amount(self) -> int:
+        """Amount of point objects, which collided with anything."""
+        return sum(len(collision.point_obj_indexes) for collision in self.collisions)
+
+
+def _load_json(path: Path) -> dict:
+    try:
+        with path.open("r") as file:
+            return json.load(file)
+    except (FileNotFoundError, PermissionError, json.JSONDecodeError) as exc:
+        raise errors.UnableToOpenConfigError from exc
+
+
+def _set_parameter(data: dict, parameter: str, value):
+    """Sets a configuration value, nested keys are separated with dots."""
+    keys = parameter.split(".")
+    for key in keys[:-1]:
+        if not isinstance(data.get(key), dict):
+            raise errors.InvalidBatchSpecError
+        data = data[key]
+    data[keys[-1]] = value
+
+
+def load_batch_spec(path: Path) -> list[BatchMember]:
+    """
+    Reads a batch specification - a json file with either a list of configuration
+    files ("configs") or a base configuration file ("base"), which is varied by
+    a parameter sweep ("sweep" - lists of values of configuration keys, every
+    combination of them is a member) and/or an ensemble ("ensemble" - amount of
+    members, relative normal perturbation of initial velocities and a seed).
+    Paths are relative to the specification file.
+    """
+    spec = _load_json(path)
+    if not isinstance(spec, dict) or ("configs" in spec) == ("base" in spec):
+        raise errors.InvalidBatchSpecError
+    if "configs" in spec:
+        if not isinstance(spec["configs"], list) or len(spec["configs"]) == 0:
+            raise errors.InvalidBatchSpecError
+        return [BatchMember(Path(config_path).stem,
+                            ConfigData.load(path.parent / config_path))
+                for config_path in spec["configs"]]
+
+    base = _load_json(path.parent / spec["base"])
+    sweep = spec.get("sweep", {})
+    ensemble = spec.get("ensemble", {"members": 1, "velocity_perturbation": 0.0})
+    if (not isinstance(sweep, dict) or not isinstance(ensemble, dict)
+        or not all(isinstance(values, list) and len(values) > 0
+                   for values in sweep.values())
+        or type(ensemble.get("members")) is not int or ensemble["members"] < 1
+        or not isinstance(ensemble.get("velocity_perturbation", 0.0), (int, float))):
+        raise errors.InvalidBatchSpecError
+    rng = np.random.default_rng(ensemble.get("seed", 0))
+
+    members = []
+    for values in itertools.product(*sweep.values()):
+        data = deepcopy(base)
+        for parameter, value in zip(sweep.keys(), values):
+            _set_parameter(data, parameter, value)
+        name = ", ".join(f"{parameter}={value}"
+                         for parameter, value in zip(sweep.keys(), values)) or path.stem
+        for member in range(ensemble["members"]):
+            member_data = deepcopy(data)
+            for obj in member_data["point_objects"]:
+                perturbation = rng.normal(0.0, ensemble.get("velocity_perturbation", 0.0),
+                                          2)
+                obj["velocity"] = (np.asarray(obj["velocity"], dtype=float)
+                                   * (1 + perturbation)).tolist()
+            member_name = name if ensemble["members"] == 1 else f"{name} #{member}"
+            members.append(BatchMember(member_name, ConfigData.from_dict(member_data)))
+    return members
+
+
+def _stack_key(config: ConfigData) -> tuple:
+    """Members with the same key can be simulated together as one run."""
+    return (config.steps, config.meters_per_pixel, config.close_call_distance,
+            config.center_obj.diameter, config.center_obj.mass, config.neighbour_search,
+            config.close_call_dedupe, config.integrator, config.time_step,
+            config.adaptive_time_step, config.propagator)
+
+
+def stack_members(members: list[BatchMember], stack: bool = True) -> list[list[int]]:
+    """
+    Returns lists of indexes of members, which are simulated together - ones with
+    the same center object and simulation settings, or every member alone.
+    Members with stop conditions are always alone, one member meeting them
+    mustn't stop the others.
+    """
+    if not stack:
+        return [[index] for index in range(len(members))]
+    stacks = {}
+    for index, member in enumerate(members):
+        key = _stack_key(member.config)
+        if member.config.stop_on_collision or member.config.stop_at_live_bodies > 0:
+            key = index
+        stacks.setdefault(key, []).append(index)
+    return list(stacks.values())
+
+
+def _run_stack(configs: list[ConfigData]) -> list[tuple[list[SpaceEvent],
+                                                        list[SpaceEvent]]]:
+    """
+    Simulates the members of a stack as one vectorized run, where the point objects
+    of each member form a group, so they never collide with other members' ones.
+    Returns the collisions and close calls of each member, indexed like in
+    a separate run of the member.
+    """
+    sizes = [len(config.point_objs) for config in configs]
+    offsets = np.cumsum([0] + sizes)
+    first = configs[0]
+    # Objects are copied into a new table, so the members' configurations aren't moved
+    point_objs = PointObject.from_body_table(BodyTable.from_point_objects(
+        [obj for config in configs for obj in config.point_objs]))
+    simulation = Simulation(first.meters_per_pixel, first.close_call_distance,
+                            first.center_obj, point_objs, first.neighbour_search,
+                            first.close_call_dedupe, first.integrator, first.time_step,
+                            first.adaptive_time_step, first.propagator,
+                            stop_on_collision=first.stop_on_collision,
+                            stop_at_live_bodies=first.stop_at_live_bodies,
+                            point_obj_groups=np.repeat(np.arange(len(configs)), sizes))
+
+    results = [([], []) for _ in configs]
+    for chunk in simulation.iterate(first.steps):
+        for events, event_type in ((chunk.collisions, 0), (chunk.close_calls, 1)):
+            for event in events:
+                indexes = np.asarray(event.point_obj_indexes)
+                event_members = np.searchsorted(offsets, indexes, side="right") - 1
+                for member in np.unique(event_members).tolist():
+                    member_indexes = indexes[event_members == member] - offsets[member]
+                    results[member][event_type].append(
+                        SpaceEvent(event.step, member_indexes.tolist()))
+    return results
+
+
+def run_batch(members: list[BatchMember], workers: int = 1,
+              stack: bool = True) -> list[BatchResult]:
+    """
+    Runs all members in a pool of worker processes, stacked where possible.
+    Stacks are split, so there are enough of them to keep every worker busy.
+    """
+    stacks = [part.tolist() for indexes in stack_members(members, stack)
+              for part in np.array_split(indexes, min(len(indexes), workers))]
+    stack_configs = [[members[index].config for index in indexes] for indexes in stacks]
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            stack_results = list(executor.map(_run_stack, stack_configs))
+    else:
+        stack_results = [_run_stack(configs) for configs in stack_configs]
+
+    results = [None] * len(members)
+    for indexes, member_results in zip(stacks, stack_results):
+        for index, (collisions, close_calls) in zip(indexes, member_results):
+            results[index] = BatchResult(members[index].name,
+                                         len(members[index].config.point_objs),
+                                         collisions, close_calls)
+    return results
+
+
+def format_summary(results: list[BatchResult]) -> str:
+    """Presents the results of all members as a table."""
+    name_width = max([len("member")] + [len(result.name) for result in results]) + 2
+    lines = [f"{'member':<{name_width}}{'objects':>10}{'collided':>10}"
+             f"{'collisions':>12}{'close calls':>13}"]
+    for result in results:
+        lines.append(f"{result.name:<{name_width}}{result.point_obj_amount:>10}"
+                     f"{result.collided_amount:>10}{len(result.collisions):>12}"
+                     f"{len(result.close_calls):>13}")
+    return "\n".join(lines)
+
+
+def save_summary(results: list[BatchResult], path: Path):
+    """Saves all events of all members to a json file."""
+    data = [{
+        "name": result.name,
+        "point_objects": result.point_obj_amount,
+        "collisions": [{"step": event.step, "point_obj_indexes": event.point_obj_indexes}
+                       for event in result.collisions],
+        "close_calls": [{"step": event.step, "point_obj_indexes": event.point_obj_indexes}
+                        for event in result.close_calls]
+    } for result in results]
+    with path.open("w") as file:
+        json.dump(data, file, indent=4)
+
+
+def main(args: list[str]):
+    parser = argparse.ArgumentParser(
+        description="run many simulations from a batch specification")
+    parser.add_argument("spec", type=str, help="batch specification .json file")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="amount of processes running the simulations")
+    parser.add_argument("-o", "--output", type=str,
+                        help="save all collisions and close calls to a .json file")
+    parser.add_argument("--no-stack", action="store_true",
+                        help="simulate every member separately")
+    parsed_args = parser.parse_args(args)
+    if parsed_args.workers < 1:
+        parser.error("there has to be at least 1 worker")
+
+    try:
+        members = load_batch_spec(Path(parsed_args.spec))
+    except (errors.InvalidBatchSpecError, errors.UnableToOpenConfigError,
+            errors.NegativeMassError, errors.NegativeDiameterError,
+            errors.InvalidStepsError, errors.InvalidResolutionError,
+            errors.InvalidMetersPerPixelError, errors.InvalidCenterObjectDataError,
+            errors.InvalidPointObjectDataError, errors.InvalidCloseCallDistanceError,
+            errors.InvalidNeighbourSearchError, errors.InvalidCloseCallDedupeError,
+            errors.InvalidIntegratorError, errors.InvalidTimeStepError,
+            errors.InvalidAdaptiveTimeStepError, errors.InvalidPropagatorError,
+            errors.InvalidWorkersError, errors.InvalidStopOnCollisionError,
+            errors.InvalidStopAtLiveBodiesError) as exc:
+        print(exc)
+        exit()
+    results = run_batch(members, parsed_args.workers, not parsed_args.no_stack)
+    print(format_summary(results))
+    if parsed_args.output is not None:
+        try:
+            save_summary(results, Path(parsed_args.output))
+        except PermissionError as exc:
+            print(exc)
+            exit()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,413 @@
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import errors
+import numpy as np
+from pathlib import Path
+from time import perf_counter
+from neighbour_search import NEIGHBOUR_SEARCHES
+from body_table import BodyTable
+from center_object import CenterObject
+from config_data import ConfigData
+from point_object import PointObject
+from profiler import Profiler
+from simulation import Simulation
+from simulation_visualizer import SimulationVisualizer
+
+# Radius of the ring and the disk synthetic scenarios are generated in (meters)
+SCENARIO_RADIUS = 1.0e7
+# Synthetic scenarios of the benchmark suite - a thin ring, a uniform disk and
+# dense swarms, all orbiting an Earth-like center object
+SCENARIOS = ("ring", "disk", "cluster")
+# Parts of a run, which the benchmark suite times separately
+PHASES = ("config_load", "stepping", "collisions", "close_calls", "render", "report")
+# Center object of the suite's scenarios
+_CENTER_DIAMETER = 1.0e6
+_CENTER_MASS = 5.972e24
+_G_CONST = 6.67430e-11
+# Resolution of the image the suite's scenarios are rendered to
+_RENDER_RESOLUTION = (1024, 1024)
+
+
+def generate_positions(n: int, clustering: float, seed: int = 0) -> np.ndarray:
+    """
+    Generates n positions around a center object at (0, 0). The given fraction
+    (0 to 1) of them forms a thin dense ring, the rest is spread uniformly over
+    a disk, so 0 gives a uniform disk and values close to 1 a clustered ring
+    with sparse outliers.
+    """
+    rng = np.random.default_rng(seed)
+    ring_n = round(n * clustering)
+    radii = np.concatenate((
+        rng.normal(SCENARIO_RADIUS / 2, SCENARIO_RADIUS / 1000, ring_n),
+        SCENARIO_RADIUS * np.sqrt(rng.uniform(0.0, 1.0, n - ring_n))))
+    angles = rng.uniform(0.0, 2 * np.pi, n)
+    return np.stack((radii * np.cos(angles), radii * np.sin(angles)), axis=1)
+
+
+def generate_clusters(n: int, clusters: int = 8, seed: int = 0) -> np.ndarray:
+    """
+    Generates n positions around a center object at (0, 0), in the given amount
+    of dense swarms with random centers in a disk.
+    """
+    rng = np.random.default_rng(seed)
+    center_radii = SCENARIO_RADIUS * np.sqrt(rng.uniform(0.25, 0.8, clusters))
+    center_angles = rng.uniform(0.0, 2 * np.pi, clusters)
+    centers = np.stack((center_radii * np.cos(center_angles),
+                        center_radii * np.sin(center_angles)), axis=1)
+    cluster_indexes = rng.integers(0, clusters, n)
+    return centers[cluster_indexes] + rng.normal(0.0, SCENARIO_RADIUS / 100, (n, 2))
+
+
+def generate_scenario(scenario: str, n: int, steps: int, seed: int = 0) -> ConfigData:
+    """
+    Generates the configuration of one of SCENARIOS with n point objects,
+    each starting on a circular orbit around the center object.
+    Close call distance shrinks with n, so there is a similar amount of close
+    calls per object whatever n is.
+    """
+    if scenario == "ring":
+        positions = generate_positions(n, 1.0, seed)
+    elif scenario == "disk":
+        positions = generate_positions(n, 0.0, seed)
+    elif scenario == "cluster":
+        positions = generate_clusters(n, seed=seed)
+    else:
+        raise ValueError(f"Unknown scenario {scenario}, must be one of {SCENARIOS}.")
+    radii = np.maximum(np.linalg.norm(positions, axis=1), _CENTER_DIAMETER / 2)
+    speeds = np.sqrt(_G_CONST * _CENTER_MASS / radii)
+    velocities = np.stack((-positions[:, 1], positions[:, 0]), axis=1) \
+        * (speeds / radii)[:, np.newaxis]
+    point_objs = PointObject.from_body_table(BodyTable(positions, velocities,
+                                                       np.ones(n)))
+    close_call_distance = SCENARIO_RADIUS / (10 * np.sqrt(n))
+    return ConfigData(steps, _RENDER_RESOLUTION,
+                      2 * SCENARIO_RADIUS / _RENDER_RESOLUTION[0], close_call_distance,
+                      CenterObject(_CENTER_DIAMETER, _CENTER_MASS), point_objs)
+
+
+class _PhaseTimer:
+    def __init__(self):
+        """Sums up the time spent in each phase."""
+        self._timings = dict.fromkeys(PHASES, 0.0)
+
+    @property
+    def timings(self) -> dict[str, float]:
+        return self._timings
+
+    def add(self, phase: str, seconds: float):
+        self._timings[phase] += seconds
+
+
+def time_simulation_phases(config_path: Path) -> dict[str, float]:
+    """
+    Loads the configuration from the given file, runs it and draws and reports
+    its output, like the command line interface does. Returns the time spent in
+    each of PHASES in seconds. Stepping is everything the simulation does apart
+    from looking for collisions and close calls.
+    """
+    timer = _PhaseTimer()
+    start = perf_counter()
+    config = ConfigData.load(config_path)
+    timer.add("config_load", perf_counter() - start)
+
+    simulation = Simulation(config.meters_per_pixel, config.close_call_distance,
+                            config.center_obj, config.point_objs,
+                            config.neighbour_search, config.close_call_dedupe,
+                            config.integrator, config.time_step,
+                            config.adaptive_time_step, config.propagator,
+                            config.workers, config.stop_on_collision,
+                            config.stop_at_live_bodies)
+    sim_vis = SimulationVisualizer(config.resolution, config.meters_per_pixel)
+    image = sim_vis.new_image(config.center_obj)
+    start_positions = None
+    collisions = []
+    close_calls = []
+    run_time = 0.0
+    chunks = simulation.iterate(config.steps)
+    # Collisions and close calls are timed by the profiler, as the simulation
+    # looks for them between steps
+    profiler = Profiler()
+    while True:
+        start = perf_counter()
+        with profiler:
+            chunk = next(chunks, None)
+        run_time += perf_counter() - start
+        if chunk is None:
+            break
+        start = perf_counter()
+        if start_positions is None:
+            start_positions = chunk.positions[0].copy()
+        sim_vis.draw_steps(image, chunk.positions)
+        collisions.extend(chunk.collisions)
+        close_calls.extend(chunk.close_calls)
+        timer.add("render", perf_counter() - start)
+    start = perf_counter()
+    sim_vis.draw_end_positions(image, simulation.point_objs)
+    timer.add("render", perf_counter() - start)
+    for phase in ("collisions", "close_calls"):
+        stats = profiler.stats.get(f"simulation.{phase}")
+        if stats is not None:
+            timer.add(phase, stats.seconds)
+    timer.add("stepping", run_time - timer.timings["collisions"]
+              - timer.timings["close_calls"])
+
+    start = perf_counter()
+    sim_vis.generate_event_report(start_positions, collisions, close_calls,
+                                  simulation.point_objs)
+    timer.add("report", perf_counter() - start)
+    return timer.timings
+
+
+def run_benchmark_suite(scenarios: list[str], sizes: list[int], step_counts: list[int],
+                        repeats: int = 1) -> list[dict]:
+    """
+    Times every phase of a run of every scenario for every combination of n and
+    the amount of steps. Scenarios are loaded from columnar config files.
+    The best time of the given amount of repeats is kept for each phase.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for scenario in scenarios:
+            for n in sizes:
+                for steps in step_counts:
+                    config_path = Path(directory) / f"{scenario}_{n}_{steps}.npz"
+                    generate_scenario(scenario, n, steps).save(config_path)
+                    runs = [time_simulation_phases(config_path) for _ in range(repeats)]
+                    phases = {phase: min(run[phase] for run in runs) for phase in PHASES}
+                    results.append({"scenario": scenario, "n": n, "steps": steps,
+                                    "phases": phases,
+                                    "total": min(sum(run.values()) for run in runs)})
+    return results
+
+
+def _result_key(result: dict) -> tuple:
+    return result["scenario"], result["n"], result["steps"]
+
+
+def compare_results(results: list[dict], baseline: list[dict], threshold: float,
+                    min_difference: float = 0.005) -> list[dict]:
+    """
+    Compares the time of each phase (and the total) of each result with the result
+    of the same scenario, n and amount of steps in the baseline. A phase is
+    a regression if it got slower by more than the threshold (a fraction of the
+    baseline time) and by more than min_difference seconds, so that noise of very
+    short phases isn't reported. Results missing from the baseline are skipped.
+    """
+    baseline_results = {_result_key(result): result for result in baseline}
+    comparison = []
+    for result in results:
+        baseline_result = baseline_results.get(_result_key(result))
+        if baseline_result is None:
+            continue
+        timings = {**result["phases"], "total": result["total"]}
+        baseline_timings = {**baseline_result["phases"],
+                            "total": baseline_result["total"]}
+        for phase, seconds in timings.items():
+            baseline_seconds = baseline_timings.get(phase)
+            if baseline_seconds is None:
+                continue
+            difference = seconds - baseline_seconds
+            comparison.append({
+                "scenario": result["scenario"], "n": result["n"],
+                "steps": result["steps"], "phase": phase, "seconds": seconds,
+                "baseline": baseline_seconds,
+                "regression": (difference > min_difference
+                               and difference > threshold * baseline_seconds)
+            })
+    return comparison
+
+
+def save_results(results: list[dict], path: Path):
+    """Saves the results of the suite as json, along with what they were run on."""
+    data = {
+        "machine": {"python": platform.python_version(), "numpy": np.__version__,
+                    "platform": platform.platform()},
+        "results": results
+    }
+    with path.open("w") as file:
+        json.dump(data, file, indent=4)
+
+
+def load_results(path: Path) -> list[dict]:
+    """Loads the results saved by save_results()."""
+    with path.open("r") as file:
+        return json.load(file)["results"]
+
+
+def format_suite_results(results: list[dict]) -> str:
+    """Presents the results of the suite as a table, times in milliseconds."""
+    lines = [f"{'scenario':<10}{'n':>9}{'steps':>8}"
+             + "".join(f"{phase:>13}" for phase in PHASES) + f"{'total':>13}"]
+    for result in results:
+        lines.append(f"{result['scenario']:<10}{result['n']:>9}{result['steps']:>8}"
+                     + "".join(f"{result['phases'][phase] * 1000:>13.2f}"
+                               for phase in PHASES)
+                     + f"{result['total'] * 1000:>13.2f}")
+    return "\n".join(lines)
+
+
+def format_comparison(comparison: list[dict]) -> str:
+    """Presents the comparison with a baseline as a table, times in milliseconds."""
+    lines = [f"{'scenario':<10}{'n':>9}{'steps':>8}{'phase':>13}{'baseline':>12}"
+             f"{'now':>12}{'change':>9}"]
+    for entry in comparison:
+        change = (entry["seconds"] / entry["baseline"] - 1 if entry["baseline"] > 0
+                  else 0.0)
+        lines.append(f"{entry['scenario']:<10}{entry['n']:>9}{entry['steps']:>8}"
+                     f"{entry['phase']:>13}{entry['baseline'] * 1000:>12.2f}"
+                     f"{entry['seconds'] * 1000:>12.2f}{change:>+9.1%}"
+                     + ("  REGRESSION" if entry["regression"] else ""))
+    return "\n".join(lines)
+
+
+def time_neighbour_search(name: str, positions: np.ndarray, close_call_distance: float,
+                          repeats: int = 3) -> dict:
+    """
+    Times the close call query a simulation step runs for all positions, building
+    the index included. Returns the best time in seconds. Collisions don't use
+    a neighbour search, they're timed by the suite command.
+    """
+    neighbour_search = NEIGHBOUR_SEARCHES[name]
+    close_call_times = []
+    for _ in range(repeats):
+        start = perf_counter()
+        neighbour_search(positions, close_call_distance).query_pairs(
+            positions, close_call_distance)
+        close_call_times.append(perf_counter() - start)
+    return {"close_calls": min(close_call_times)}
+
+
+def run_neighbour_search_benchmark(sizes: list[int], clusterings: list[float],
+                                   searches: list[str]) -> list[dict]:
+    """Benchmarks every neighbour search for every combination of n and clustering."""
+    results = []
+    for n in sizes:
+        # Keep a similar amount of close calls per object whatever n is
+        close_call_distance = SCENARIO_RADIUS / np.sqrt(n)
+        for clustering in clusterings:
+            positions = generate_positions(n, clustering)
+            for name in searches:
+                timings = time_neighbour_search(name, positions, close_call_distance)
+                results.append({"search": name, "n": n, "clustering": clustering,
+                                **timings})
+    return results
+
+
+def available_searches() -> list[str]:
+    """Returns the names of neighbour searches usable in the current environment."""
+    names = []
+    for name, neighbour_search in NEIGHBOUR_SEARCHES.items():
+        try:
+            neighbour_search.check_available()
+        except errors.MissingScipyError:
+            continue
+        names.append(name)
+    return names
+
+
+def format_results(results: list[dict]) -> str:
+    """Presents the benchmark results as a table, times in milliseconds."""
+    lines = [f"{'search':<8}{'n':>10}{'clustering':>12}{'close calls':>14}"]
+    for result in results:
+        lines.append(f"{result['search']:<8}{result['n']:>10}"
+                     f"{result['clustering']:>12.2f}"
+                     f"{result['close_calls'] * 1000:>14.2f}")
+    return "\n".join(lines)
+
+
+def _suite_main(parsed_args: argparse.Namespace):
+    """Runs the benchmark suite and compares it with a baseline, if one is given."""
+    if parsed_args.repeats < 1 or min(parsed_args.sizes) < 1 \
+            or min(parsed_args.steps) < 0 or parsed_args.threshold < 0:
+        print("Sizes and repeats must be greater than 0, steps and threshold "
+              "can't be negative.")
+        exit()
+    baseline = None
+    if parsed_args.baseline is not None:
+        try:
+            baseline = load_results(Path(parsed_args.baseline))
+        except (FileNotFoundError, PermissionError, json.JSONDecodeError,
+                KeyError) as exc:
+            print(f"Unable to read the baseline: {exc}")
+            exit()
+
+    results = run_benchmark_suite(parsed_args.scenarios, parsed_args.sizes,
+                                  parsed_args.steps, parsed_args.repeats)
+    print(format_suite_results(results))
+    if parsed_args.output is not None:
+        try:
+            save_results(results, Path(parsed_args.output))
+        except PermissionError as exc:
+            print(exc)
+            exit()
+    if baseline is not None:
+        comparison = compare_results(results, baseline, parsed_args.threshold,
+                                     parsed_args.min_difference)
+        print()
+        print(format_comparison(comparison))
+        if any(entry["regression"] for entry in comparison):
+            # A nonzero exit status lets scripts fail on a regression
+            sys.exit(1)
+
+
+def main(args: list[str]):
+    parser = argparse.ArgumentParser(
+        description="benchmark the neighbour searches used by the simulation "
+        "(the default command), or every phase of whole runs")
+    subparsers = parser.add_subparsers(dest="command")
+    searches_parser = subparsers.add_parser(
+        "searches", help="compare the neighbour searches on synthetic positions")
+    searches_parser.add_argument("-n", "--sizes", type=int, nargs="+",
+                                 default=[1000, 10000, 100000],
+                                 help="amounts of point objects")
+    searches_parser.add_argument("-c", "--clusterings", type=float, nargs="+",
+                                 default=[0.0, 0.9, 0.99],
+                                 help="fractions of point objects in a dense ring")
+    searches_parser.add_argument("--searches", type=str, nargs="+",
+                                 default=available_searches(),
+                                 choices=list(NEIGHBOUR_SEARCHES.keys()),
+                                 help="neighbour searches to compare, by default "
+                                 "all that can be used")
+    suite_parser = subparsers.add_parser(
+        "suite", help="time each phase of runs of synthetic scenarios")
+    suite_parser.add_argument("--scenarios", type=str, nargs="+",
+                              default=list(SCENARIOS), choices=SCENARIOS,
+                              help="synthetic scenarios to run")
+    suite_parser.add_argument("-n", "--sizes", type=int, nargs="+",
+                              default=[1000, 10000], help="amounts of point objects")
+    suite_parser.add_argument("-k", "--steps", type=int, nargs="+", default=[100],
+                              help="amounts of steps")
+    suite_parser.add_argument("-r", "--repeats", type=int, default=1,
+                              help="runs of each scenario, the best time is kept")
+    suite_parser.add_argument("-o", "--output", type=str,
+                              help="save the results to a .json file")
+    suite_parser.add_argument("-b", "--baseline", type=str,
+                              help="compare the results with ones saved with -o, "
+                              "exit with status 1 on a regression")
+    suite_parser.add_argument("-t", "--threshold", type=float, default=0.25,
+                              help="how much slower (as a fraction) a phase has "
+                              "to get to be a regression")
+    suite_parser.add_argument("--min-difference", type=float, default=0.005,
+                              help="seconds a phase has to get slower by "
+                              "to be a regression")
+    parsed_args = parser.parse_args(args)
+    if parsed_args.command is None:
+        parsed_args = parser.parse_args(["searches"])
+    if parsed_args.command == "suite":
+        _suite_main(parsed_args)
+        return
+    try:
+        results = run_neighbour_search_benchmark(parsed_args.sizes,
+                                                 parsed_args.clusterings,
+                                                 parsed_args.searches)
+    except errors.MissingScipyError as exc:
+        print(exc)
+        exit()
+    print(format_results(results))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
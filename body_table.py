@@ -0,0 +1,69 @@
+import numpy as np
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from point_object import PointObject
+
+
+class BodyTable:
+    __slots__ = ("_positions", "_velocities", "_masses")
+
+    def __init__(self, positions: np.ndarray, velocities: np.ndarray,
+                 masses: np.ndarray):
+        """
+        Structure-of-arrays storage for point objects. Positions (meters) and
+        velocities (m/s) are contiguous (n, 2) float arrays, masses (kilograms)
+        are a (n,) float array. The row index is the point object's index.
+        """
+        self._positions = np.ascontiguousarray(positions, dtype=float).reshape(-1, 2)
+        self._velocities = np.ascontiguousarray(velocities, dtype=float).reshape(-1, 2)
+        self._masses = np.ascontiguousarray(masses, dtype=float).reshape(-1)
+
+    def __len__(self) -> int:
+        return len(self._masses)
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self._positions
+
+    @property
+    def velocities(self) -> np.ndarray:
+        return self._velocities
+
+    @property
+    def masses(self) -> np.ndarray:
+        return self._masses
+
+    @classmethod
+    def from_point_objects(cls, point_objs: list["PointObject"]):
+        """Copy the state of the given point objects into a new table."""
+        n = len(point_objs)
+        table = cls(np.empty((n, 2)), np.empty((n, 2)), np.empty(n))
+        for source, (rows, indexes) in cls._group_by_table(point_objs).items():
+            table._positions[rows] = source._positions[indexes]
+            table._velocities[rows] = source._velocities[indexes]
+            table._masses[rows] = source._masses[indexes]
+        return table
+
+    def sync_to_point_objects(self, point_objs: list["PointObject"]):
+        """Write the positions and velocities back into the given point objects."""
+        for target, (rows, indexes) in self._group_by_table(point_objs).items():
+            target._positions[indexes] = self._positions[rows]
+            target._velocities[indexes] = self._velocities[rows]
+
+    @staticmethod
+    def _group_by_table(point_objs: list["PointObject"]) -> dict:
+        """
+        Groups point objects by the table holding their state, so each table is
+        read or written at once. Returns the positions of the objects in the list
+        and their rows in the table for each table.
+        """
+        tables = [obj.body_table for obj in point_objs]
+        indexes = np.array([obj.index for obj in point_objs], dtype=np.int64)
+        if len(tables) > 0 and tables.count(tables[0]) == len(tables):
+            # Usually all of them view into one table
+            return {tables[0]: (np.arange(len(tables)), indexes)}
+        groups = {}
+        for row, table in enumerate(tables):
+            groups.setdefault(table, []).append(row)
+        return {table: (rows, indexes[rows]) for table, rows in groups.items()}
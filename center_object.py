@@ -4,6 +4,8 @@ from space_object import SpaceObject
 
 
 class CenterObject(SpaceObject):
+    __slots__ = ("_diameter",)
+
     def __init__(self, diameter: float = 1.0, mass: float = 1.0):
         """
         Diameter is a float which indicates the object's diameter in meters,
@@ -31,5 +33,5 @@ class CenterObject(SpaceObject):
         """Convert this object's data to json."""
         return {
             "diameter": self._diameter,
-            "mass": self._mass
+            "mass": self._to_json_number(self.mass)
         }
@@ -0,0 +1,176 @@
+import os
+import time
+import zipfile
+import errors
+import numpy as np
+from pathlib import Path
+from typing import Callable
+from space_event import SpaceEvent
+from simulation_output import SimulationOutput, EVENT_DTYPE
+
+# Checkpoints are saved next to the other output files with this suffix
+CHECKPOINT_SUFFIX = ".ckpt.npz"
+_VERSION = 1
+
+
+class Checkpoint:
+    def __init__(self, step: int, positions: np.ndarray, velocities: np.ndarray,
+                 alive: np.ndarray, start_positions: np.ndarray,
+                 start_velocities: np.ndarray, collisions: list[SpaceEvent],
+                 close_calls: list[SpaceEvent],
+                 reported_close_calls: list[tuple[int]] = ()):
+        """
+        State of a simulation after the given amount of steps - everything needed
+        to continue it exactly as if it had never stopped. Positions and velocities
+        of all point objects are (n, 2) arrays, alive is False for objects, which
+        have already collided. Start positions and velocities are the ones from
+        step 0. Events are all the ones, which occurred up to the step. Reported close
+        calls are the groups of objects, which won't be reported again.
+        Positions of the earlier steps aren't part of a checkpoint, they are
+        already in the trajectory file.
+        """
+        self._step = step
+        self._positions = np.array(positions, dtype=float).reshape(-1, 2)
+        self._velocities = np.array(velocities, dtype=float).reshape(-1, 2)
+        self._alive = np.array(alive, dtype=bool).reshape(-1)
+        self._start_positions = np.array(start_positions, dtype=float).reshape(-1, 2)
+        self._start_velocities = np.array(start_velocities, dtype=float).reshape(-1, 2)
+        self._collision_records = SimulationOutput.events_to_records(collisions)
+        self._close_call_records = SimulationOutput.events_to_records(close_calls)
+        self._reported_close_calls = [tuple(group) for group in reported_close_calls]
+
+    @property
+    def step(self) -> int:
+        return self._step
+
+    @property
+    def point_obj_amount(self) -> int:
+        return len(self._positions)
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self._positions
+
+    @property
+    def velocities(self) -> np.ndarray:
+        return self._velocities
+
+    @property
+    def alive(self) -> np.ndarray:
+        return self._alive
+
+    @property
+    def start_positions(self) -> np.ndarray:
+        return self._start_positions
+
+    @property
+    def start_velocities(self) -> np.ndarray:
+        return self._start_velocities
+
+    @property
+    def collisions(self) -> list[SpaceEvent]:
+        return SimulationOutput.records_to_events(self._collision_records)
+
+    @property
+    def close_calls(self) -> list[SpaceEvent]:
+        return SimulationOutput.records_to_events(self._close_call_records)
+
+    @property
+    def reported_close_calls(self) -> list[tuple[int]]:
+        return self._reported_close_calls
+
+    def save(self, path: Path):
+        """
+        Saves the checkpoint as a .npz file. It's written to a temporary file first
+        and then moved over the given path, so an interrupted save never leaves
+        a broken checkpoint behind - the previous one stays intact.
+        """
+        path = Path(path)
+        temporary_path = path.with_name(path.name + ".tmp")
+        groups = self._reported_close_calls
+        with Path.open(temporary_path, "wb") as file:
+            np.savez(file, version=_VERSION, step=self._step,
+                     positions=self._positions, velocities=self._velocities,
+                     alive=self._alive, start_positions=self._start_positions,
+                     start_velocities=self._start_velocities,
+                     collisions=self._collision_records,
+                     close_calls=self._close_call_records,
+                     reported_close_calls=np.array(
+                         [index for group in groups for index in group], dtype=np.int64),
+                     reported_close_call_sizes=np.array(
+                         [len(group) for group in groups], dtype=np.int64))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: Path):
+        """Loads a checkpoint saved with save()."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["version"]) != _VERSION:
+                    raise errors.InvalidCheckpointFileError
+                step = int(data["step"])
+                arrays = [data[name] for name in (
+                    "positions", "velocities", "alive", "start_positions",
+                    "start_velocities")]
+                events = [SimulationOutput.records_to_events(
+                              data[name].astype(EVENT_DTYPE))
+                          for name in ("collisions", "close_calls")]
+                groups = np.split(data["reported_close_calls"],
+                                  np.cumsum(data["reported_close_call_sizes"])[:-1])
+        except (OSError, EOFError, KeyError, ValueError, TypeError,
+                zipfile.BadZipFile):
+            raise errors.InvalidCheckpointFileError
+        point_obj_amount = len(arrays[0])
+        if (step < 0 or arrays[2].shape != (point_obj_amount,)
+            or any(array.shape != (point_obj_amount, 2)
+                   for array in arrays[:2] + arrays[3:])):
+            raise errors.InvalidCheckpointFileError
+        return cls(step, *arrays, *events,
+                   [tuple(group.tolist()) for group in groups if len(group) > 0])
+
+
+class CheckpointWriter:
+    def __init__(self, path: Path, every_steps: int = None, every_seconds: float = None,
+                 before_save: Callable = None):
+        """
+        Decides when a running simulation saves a checkpoint to the given path -
+        every given amount of steps and/or seconds, whichever comes first.
+        Before save is called before each checkpoint is saved, to make the files
+        the checkpoint relies on (like the trajectory) durable first, so a crash
+        never leaves a checkpoint ahead of them.
+        """
+        if every_steps is not None and (type(every_steps) is not int
+                                        or every_steps <= 0):
+            raise errors.InvalidCheckpointIntervalError
+        if every_seconds is not None and (not isinstance(every_seconds, (int, float))
+                                          or every_seconds <= 0):
+            raise errors.InvalidCheckpointIntervalError
+        self._path = Path(path)
+        self._every_steps = every_steps
+        self._every_seconds = every_seconds
+        self._before_save = before_save
+        self._last_step = None
+        self._last_time = time.monotonic()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def due(self, step: int) -> bool:
+        """Returns whether a checkpoint should be saved after the given step."""
+        if self._last_step is None:
+            # Steps are counted from the first step the writer sees
+            self._last_step = step
+        if self._every_steps is not None and step - self._last_step >= self._every_steps:
+            return True
+        return (self._every_seconds is not None
+                and time.monotonic() - self._last_time >= self._every_seconds)
+
+    def save(self, checkpoint: Checkpoint):
+        if self._before_save is not None:
+            self._before_save()
+        checkpoint.save(self._path)
+        self._last_step = checkpoint.step
+        self._last_time = time.monotonic()
@@ -3,36 +3,247 @@ import sys
 import errors
 import numpy as np
 from pathlib import Path
-from config_data import ConfigData
+from config_data import ConfigData, NPZ_SUFFIX
 from simulation import Simulation
-from simulation_visualizer import SimulationVisualizer
+from simulation_visualizer import SimulationVisualizer, HEATMAP_SCALINGS
+from trajectory import Trajectory, TrajectoryWriter
+from animation_exporter import AnimationExporter, ANIMATION_FORMATS
+from checkpoint import Checkpoint, CheckpointWriter, CHECKPOINT_SUFFIX
 from center_object import CenterObject
 from point_object import PointObject
+from profiler import Profiler, profiled
+from progress import ProgressReporter
 from datetime import datetime
 
 
 class CommandLineInterface:
+    # Amount of positions drawn at once when rendering a saved trajectory
+    _RENDER_CHUNK_POSITIONS = 2**20
+
     def __init__(self, args: list[str]):
         """Initialize the program by parsing arguments and running the simulation"""
         self._args = self._parse_args(args)
-
-        # Initialize and run simulation and visualization
+        # Phases are only timed, if profiling was requested
+        self._profiler = None
+        if self._args.profile or self._args.profile_trace is not None:
+            self._profiler = Profiler(trace=self._args.profile_trace is not None)
+            self._profiler.start()
         self._start_config_data = self._load_config(self._args)
+        # Saved files are named after the time the program started,
+        # a resumed run keeps the names of the files of the run it continues
+        self._file_name = datetime.now().strftime("%d-%m-%Y_%H:%M:%S")
+        if self._args.resume is not None:
+            self._file_name = self._args.resume[0].removesuffix(CHECKPOINT_SUFFIX)
+        if self._args.render is not None:
+            self._render_trajectory(Path(self._args.render[0]))
+        else:
+            self._run_simulation()
+
+    def _create_visualizer(self) -> SimulationVisualizer:
+        """Create a visualizer, the resolution and scale can be overridden by args"""
+        resolution = self._start_config_data.resolution
+        meters_per_pixel = self._start_config_data.meters_per_pixel
+        try:
+            if self._args.resolution is not None:
+                resolution = tuple(self._args.resolution)
+                if resolution[0] <= 0 or resolution[1] <= 0:
+                    raise errors.InvalidResolutionError
+            if self._args.meters_per_pixel is not None:
+                meters_per_pixel = self._args.meters_per_pixel
+                if meters_per_pixel <= 0:
+                    raise errors.InvalidMetersPerPixelError
+        except (errors.InvalidResolutionError, errors.InvalidMetersPerPixelError) as exc:
+            print(exc)
+            exit()
+        return SimulationVisualizer(resolution, meters_per_pixel,
+                                    tuple(self._args.center_color),
+                                    tuple(self._args.step_color),
+                                    tuple(self._args.point_color))
+
+    @profiled("cli.run_simulation")
+    def _run_simulation(self):
+        """Initialize and run simulation and visualization"""
         sim_objs = self._start_config_data.get_simulation_objects()
+        try:
+            self._sim = Simulation(self._start_config_data.meters_per_pixel,
+                                   self._start_config_data.close_call_distance,
+                                   sim_objs[0], sim_objs[1],
+                                   self._start_config_data.neighbour_search,
+                                   self._start_config_data.close_call_dedupe,
+                                   self._start_config_data.integrator,
+                                   self._start_config_data.time_step,
+                                   self._start_config_data.adaptive_time_step,
+                                   self._start_config_data.propagator,
+                                   self._start_config_data.workers,
+                                   self._start_config_data.stop_on_collision,
+                                   self._start_config_data.stop_at_live_bodies)
+        except errors.MissingScipyError as exc:
+            print(exc)
+            exit()
+
+        sim_vis = self._create_visualizer()
+        self._start_drawing(sim_vis, self._sim.center_obj)
+        trajectory_path = Path(f"{self._file_name}.traj")
+        trajectory_writer = None
+        checkpoint_writer = None
+        progress_reporter = None
+        checkpoint = None
+        start_positions = None
+        collisions = []
+        close_calls = []
+        try:
+            if self._args.resume is not None:
+                checkpoint = Checkpoint.load(Path(self._args.resume[0]))
+                if (checkpoint.point_obj_amount != len(self._sim.point_objs)
+                    or checkpoint.step > self._start_config_data.steps):
+                    raise errors.CheckpointMismatchError
+                # Steps before the checkpoint are drawn from the saved trajectory
+                self._draw_saved_steps(trajectory_path, checkpoint.step)
+                trajectory_writer = TrajectoryWriter.reopen(trajectory_path,
+                                                            checkpoint.step)
+                start_positions = checkpoint.start_positions
+                collisions = checkpoint.collisions
+                close_calls = checkpoint.close_calls
+            elif self._args.save:
+                trajectory_writer = TrajectoryWriter(
+                    trajectory_path, len(self._sim.point_objs),
+                    self._start_config_data.meters_per_pixel)
+            if (self._args.checkpoint_steps is not None
+                or self._args.checkpoint_seconds is not None):
+                # A checkpoint is only saved once the trajectory up to it is on the disk
+                checkpoint_writer = CheckpointWriter(
+                    Path(f"{self._file_name}{CHECKPOINT_SUFFIX}"),
+                    self._args.checkpoint_steps, self._args.checkpoint_seconds,
+                    trajectory_writer.sync)
+            if self._args.progress or self._args.metrics_file is not None:
+                progress_reporter = ProgressReporter(
+                    sys.stderr if self._args.progress else None,
+                    metrics_path=self._args.metrics_file,
+                    metrics_every_seconds=self._args.metrics_seconds)
+        except (errors.InvalidCheckpointFileError, errors.CheckpointMismatchError,
+                errors.InvalidTrajectoryFileError, errors.TrajectoryMismatchError,
+                errors.InvalidCheckpointIntervalError,
+                errors.InvalidProgressIntervalError, PermissionError) as exc:
+            print(exc)
+            exit()
+
+        # The output is drawn (and saved) chunk by chunk,
+        # so steps are never all held in memory
+        for chunk in self._sim.iterate(self._start_config_data.steps, None,
+                                       checkpoint_writer, checkpoint,
+                                       progress_reporter):
+            if start_positions is None:
+                start_positions = chunk.positions[0].copy()
+            self._draw_steps(chunk.positions)
+            if trajectory_writer is not None:
+                trajectory_writer.write(chunk.positions)
+            collisions.extend(chunk.collisions)
+            close_calls.extend(chunk.close_calls)
+        if trajectory_writer is not None:
+            trajectory_writer.close()
+        self._finish_drawing(self._sim.center_obj, self._sim.point_objs)
+        self._output_col = sim_vis.generate_event_report(
+            start_positions, collisions, close_calls, self._sim.point_objs)
+
+    @profiled("cli.render_trajectory")
+    def _render_trajectory(self, path: Path):
+        """
+        Draw a trajectory saved by an earlier run without simulating it again.
+        The loaded configuration has to be the end state saved along with it.
+        There are no events in a trajectory, so no report is generated.
+        """
+        try:
+            trajectory = Trajectory(path)
+            if trajectory.point_obj_amount != len(self._start_config_data.point_objs):
+                raise errors.TrajectoryMismatchError
+        except (errors.InvalidTrajectoryFileError,
+                errors.TrajectoryMismatchError) as exc:
+            print(exc)
+            exit()
 
-        self._sim = Simulation(self._start_config_data.meters_per_pixel,
-                               self._start_config_data.close_call_distance,
-                               sim_objs[0], sim_objs[1])
-        self._output = self._sim.run(self._start_config_data.steps)
+        self._start_drawing(self._create_visualizer(), self._start_config_data.center_obj)
+        chunk_steps = max(1, self._RENDER_CHUNK_POSITIONS
+                          // max(1, trajectory.point_obj_amount))
+        for positions in trajectory.iter_chunks(chunk_steps):
+            self._draw_steps(positions)
+        self._finish_drawing(self._start_config_data.center_obj,
+                             self._start_config_data.point_objs)
+        self._output_col = None
 
-        sim_vis = SimulationVisualizer(self._start_config_data.resolution,
-                                       self._start_config_data.meters_per_pixel,
-                                       tuple(self._args.center_color),
-                                       tuple(self._args.step_color),
-                                       tuple(self._args.point_color))
-        self._output_img = sim_vis.draw(self._sim.center_obj, self._sim.point_objs,
-                                        self._output.simulation_steps)
-        self._output_col = sim_vis.generate_report(self._output, self._sim.point_objs)
+    def _draw_saved_steps(self, path: Path, steps: int):
+        """Draw the first steps of a trajectory saved by an interrupted run"""
+        trajectory = Trajectory(path)
+        if (trajectory.point_obj_amount != len(self._start_config_data.point_objs)
+            or trajectory.steps < steps):
+            raise errors.TrajectoryMismatchError
+        chunk_steps = max(1, self._RENDER_CHUNK_POSITIONS
+                          // max(1, trajectory.point_obj_amount))
+        for start in range(0, steps, chunk_steps):
+            self._draw_steps(trajectory.positions[start:min(steps, start + chunk_steps)])
+
+    def _start_drawing(self, sim_vis: SimulationVisualizer, center_obj: CenterObject):
+        """
+        Prepare everything the steps are drawn onto - the image (or a heatmap
+        of it), the animation and the tile pyramid, whichever are requested.
+        A tile pyramid replaces the image, which could be too large to allocate.
+        """
+        self._sim_vis = sim_vis
+        self._output_img = None
+        self._heatmap = None
+        self._animation = None
+        self._tile_pyramid = None
+        if self._args.tiles is not None:
+            try:
+                self._tile_pyramid = sim_vis.new_tile_pyramid(self._args.tiles)
+            except errors.InvalidTileSizeError as exc:
+                print(exc)
+                exit()
+        else:
+            self._output_img = sim_vis.new_image(center_obj)
+            if self._args.heatmap is not None:
+                self._heatmap = sim_vis.new_heatmap()
+        if self._args.save and self._args.animate is not None:
+            paths = {
+                "gif": Path(f"{self._file_name}.gif"),
+                "apng": Path(f"{self._file_name}_animation.png"),
+                "frames": Path(f"{self._file_name}_frames")
+            }
+            try:
+                self._animation = AnimationExporter(
+                    sim_vis, center_obj, paths[self._args.animate],
+                    self._args.animate, self._args.animation_stride)
+            except (errors.InvalidAnimationStrideError, PermissionError) as exc:
+                print(exc)
+                exit()
+
+    def _draw_steps(self, positions: np.ndarray):
+        """Draw a chunk of steps onto everything prepared by _start_drawing()"""
+        if self._tile_pyramid is not None:
+            self._sim_vis.bin_steps(self._tile_pyramid, positions)
+        elif self._heatmap is not None:
+            self._sim_vis.accumulate_steps(self._heatmap, positions)
+        else:
+            self._sim_vis.draw_steps(self._output_img, positions)
+        if self._animation is not None:
+            self._animation.add_steps(positions)
+
+    def _finish_drawing(self, center_obj: CenterObject, point_objs: list[PointObject]):
+        """Draw the end positions and save the animation and tiles, if requested"""
+        try:
+            if self._animation is not None:
+                self._animation.close(point_objs)
+            if self._tile_pyramid is not None:
+                self._sim_vis.export_tile_pyramid(Path(f"{self._file_name}_tiles"),
+                                                  self._tile_pyramid, center_obj,
+                                                  point_objs)
+        except PermissionError as exc:
+            print(exc)
+            exit()
+        if self._heatmap is not None:
+            self._sim_vis.draw_heatmap(self._output_img, self._heatmap,
+                                       self._args.heatmap)
+        if self._output_img is not None:
+            self._sim_vis.draw_end_positions(self._output_img, point_objs)
 
     @staticmethod
     def _parse_args(args: list[str]) -> argparse.Namespace:
@@ -49,12 +260,66 @@ class CommandLineInterface:
         parser.add_argument("--point-color", type=int, nargs=3,
                             default=[255, 0, 0],
                             help="color of end states of point objs")
+        parser.add_argument("--resolution", type=int, nargs=2,
+                            help="override the resolution of the image")
+        parser.add_argument("--meters-per-pixel", type=float,
+                            help="override the scale of the image")
+        image_group = parser.add_mutually_exclusive_group()
+        image_group.add_argument("--heatmap", type=str, choices=HEATMAP_SCALINGS,
+                                 help="draw how often each pixel was visited instead "
+                                 "of flat steps, with the given color scaling")
+        image_group.add_argument("--tiles", type=int, metavar="TILE_SIZE",
+                                 help="with -s, save a pyramid of tiles of the given "
+                                 "size instead of a single image")
+        parser.add_argument("--animate", type=str, choices=ANIMATION_FORMATS,
+                            help="with -s, also save an animation of the steps")
+        parser.add_argument("--animation-stride", type=int, default=1,
+                            help="amount of steps between frames of the animation")
+        parser.add_argument("-r", "--render", type=str, nargs=1,
+                            help="draw a saved .traj file instead of simulating, "
+                            "-f has to be the end state .json saved with it")
+        parser.add_argument("--checkpoint-steps", type=int, metavar="STEPS",
+                            help="with -s, save a checkpoint every given amount "
+                            "of steps")
+        parser.add_argument("--checkpoint-seconds", type=float, metavar="SECONDS",
+                            help="with -s, save a checkpoint every given amount "
+                            "of seconds")
+        parser.add_argument("--resume", type=str, nargs=1, metavar="CHECKPOINT",
+                            help="with -s, continue an interrupted run from its "
+                            f"{CHECKPOINT_SUFFIX} file, -f has to be its config")
+        parser.add_argument("--progress", action="store_true",
+                            help="show the progress of the simulation")
+        parser.add_argument("--metrics-file", type=str, metavar="PATH",
+                            help="append progress metrics of the simulation to "
+                            "the file as json lines")
+        parser.add_argument("--metrics-seconds", type=float, default=10.0,
+                            metavar="SECONDS",
+                            help="amount of seconds between metrics (default 10)")
+        parser.add_argument("--profile", action="store_true",
+                            help="print how long each phase of the run took")
+        parser.add_argument("--profile-trace", type=str, metavar="PATH",
+                            help="profile and save every timed call as a Chrome "
+                            "trace .json file")
         input_group = parser.add_mutually_exclusive_group(required=True)
         input_group.add_argument("-f", "--file", type=str, nargs=1,
-                                help="use the values from .json file")
+                                help="use the values from .json or .npz file")
         input_group.add_argument("-i", "--interactive", action="store_true",
                                 help="input values manually")
-        return parser.parse_args(args)
+        parsed_args = parser.parse_args(args)
+        if parsed_args.render is not None and parsed_args.file is None:
+            parser.error("-r/--render requires the end state file given with -f")
+        if parsed_args.tiles is not None and not parsed_args.save:
+            parser.error("--tiles requires -s")
+        if ((parsed_args.checkpoint_steps is not None
+             or parsed_args.checkpoint_seconds is not None
+             or parsed_args.resume is not None) and not parsed_args.save):
+            parser.error("--checkpoint-steps, --checkpoint-seconds and --resume "
+                         "require -s")
+        if parsed_args.resume is not None and (parsed_args.file is None
+                                               or parsed_args.render is not None):
+            parser.error("--resume requires the starting config given with -f "
+                         "and can't be used with -r")
+        return parsed_args
 
     @staticmethod
     def _load_config_from_input() -> ConfigData:
@@ -134,18 +399,27 @@ class CommandLineInterface:
         return ConfigData(steps, resolution, meters_per_pixel, close_call_distance,
                           center_obj, point_objs)
 
+    @profiled("cli.load_config")
     def _load_config(self, args) -> ConfigData:
         """Load configuration data from user input or a json file"""
         config_data = None
         if self._args.file is not None:
             try:
-                config_data = ConfigData.from_json(Path(args.file[0]))
+                config_data = ConfigData.load(Path(args.file[0]))
             except (errors.NegativeMassError, errors.NegativeDiameterError,
                     errors.UnableToOpenConfigError, errors.InvalidStepsError,
                     errors.InvalidResolutionError, errors.InvalidMetersPerPixelError,
                     errors.InvalidCenterObjectDataError,
                     errors.InvalidPointObjectDataError,
-                    errors.InvalidCloseCallDistanceError) as exc:
+                    errors.InvalidCloseCallDistanceError,
+                    errors.InvalidNeighbourSearchError,
+                    errors.InvalidCloseCallDedupeError,
+                    errors.InvalidIntegratorError, errors.InvalidTimeStepError,
+                    errors.InvalidAdaptiveTimeStepError,
+                    errors.InvalidPropagatorError,
+                    errors.InvalidWorkersError,
+                    errors.InvalidStopOnCollisionError,
+                    errors.InvalidStopAtLiveBodiesError) as exc:
                 print(exc)
                 exit()
         else:
@@ -155,29 +429,58 @@ class CommandLineInterface:
     def output_to_console(self):
         """Output the simulation results to the console"""
         if not self._args.quiet:
-            print(self._output_col)
-            self._output_img.show()
+            if self._output_col is not None:
+                print(self._output_col)
+            if self._output_img is not None:
+                self._output_img.show()
 
+    @profiled("cli.output_to_file")
     def output_to_file(self):
         """Output the simulation results to files"""
         if self._args.save:
-            file_name = datetime.now().strftime("%d-%m-%Y_%H:%M:%S")
+            file_name = self._file_name
             try:
-                end_config_data = ConfigData(self._start_config_data.steps,
-                                             self._start_config_data.resolution,
-                                             self._start_config_data.meters_per_pixel,
-                                             self._start_config_data.close_call_distance,
-                                             self._sim.center_obj, self._sim.point_objs)
-                end_config_data.save_data_to_json(Path(f"{file_name}.json"))
-                self._output_img.save(f"{file_name}.png")
+                if self._output_img is not None:
+                    self._output_img.save(f"{file_name}.png")
+                if self._args.render is not None:
+                    # A re-render only produces a new image
+                    return
+                start = self._start_config_data
+                end_config_data = ConfigData(
+                    start.steps, start.resolution, start.meters_per_pixel,
+                    start.close_call_distance, self._sim.center_obj,
+                    self._sim.point_objs, start.neighbour_search,
+                    start.close_call_dedupe, start.integrator, start.time_step,
+                    start.adaptive_time_step, start.propagator, start.workers,
+                    start.stop_on_collision, start.stop_at_live_bodies)
+                # The end state is saved in the same format as the loaded config
+                end_suffix = ".json"
+                if (self._args.file is not None
+                    and Path(self._args.file[0]).suffix == NPZ_SUFFIX):
+                    end_suffix = NPZ_SUFFIX
+                end_config_data.save(Path(f"{file_name}{end_suffix}"))
                 with Path.open(f"{file_name}.txt", "w") as file:
                     file.write(self._output_col)
             except PermissionError as exc:
                 print(exc)
                 exit()
 
+    def output_profile(self):
+        """Stop profiling, print the summary and save the trace, if requested"""
+        if self._profiler is None:
+            return
+        self._profiler.stop()
+        print(self._profiler.format_summary())
+        if self._args.profile_trace is not None:
+            try:
+                self._profiler.save_trace(Path(self._args.profile_trace))
+            except PermissionError as exc:
+                print(exc)
+                exit()
+
 
 if __name__ == "__main__":
     cli = CommandLineInterface(sys.argv[1:])
     cli.output_to_console()
     cli.output_to_file()
+    cli.output_profile()
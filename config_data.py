@@ -1,20 +1,42 @@
 import json
+import zipfile
 import errors
+import numpy as np
 from pathlib import Path
 from center_object import CenterObject
 from point_object import PointObject
+from neighbour_search import NEIGHBOUR_SEARCHES, CLOSE_CALL_DEDUPES
+from integrators import INTEGRATORS, PROPAGATORS
+from body_table import BodyTable
+from profiler import profiled
+
+# Suffix of the columnar configuration format, any other file is read as json
+NPZ_SUFFIX = ".npz"
 
 
 class ConfigData:
     def __init__(self, steps: int, resolution: list[int], meters_per_pixel: float,
                  close_call_distance: float, center_obj: CenterObject,
-                 point_objs: list[PointObject]):
+                 point_objs: list[PointObject], neighbour_search: str = "grid",
+                 close_call_dedupe: str = "step", integrator: str = "euler",
+                 time_step: float = 1.0, adaptive_time_step: bool = False,
+                 propagator: str = "numeric", workers: int = 1,
+                 stop_on_collision: bool = False, stop_at_live_bodies: int = 0):
         self._steps = steps
         self._resolution = resolution
         self._meters_per_pixel = meters_per_pixel
         self._close_call_distance = close_call_distance
         self._center_obj = center_obj
         self._point_objs = point_objs
+        self._neighbour_search = neighbour_search
+        self._close_call_dedupe = close_call_dedupe
+        self._integrator = integrator
+        self._time_step = time_step
+        self._adaptive_time_step = adaptive_time_step
+        self._propagator = propagator
+        self._workers = workers
+        self._stop_on_collision = stop_on_collision
+        self._stop_at_live_bodies = stop_at_live_bodies
 
     @property
     def steps(self) -> int:
@@ -40,54 +62,221 @@ class ConfigData:
     def point_objs(self) -> list[PointObject]:
         return self._point_objs
 
+    @property
+    def neighbour_search(self) -> str:
+        return self._neighbour_search
+
+    @property
+    def close_call_dedupe(self) -> str:
+        return self._close_call_dedupe
+
+    @property
+    def integrator(self) -> str:
+        return self._integrator
+
+    @property
+    def time_step(self) -> float:
+        return self._time_step
+
+    @property
+    def adaptive_time_step(self) -> bool:
+        return self._adaptive_time_step
+
+    @property
+    def propagator(self) -> str:
+        return self._propagator
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    @property
+    def stop_on_collision(self) -> bool:
+        return self._stop_on_collision
+
+    @property
+    def stop_at_live_bodies(self) -> int:
+        return self._stop_at_live_bodies
+
     def get_simulation_objects(self) -> tuple[CenterObject, list[PointObject]]:
         return self._center_obj, self._point_objs
 
     @classmethod
+    @profiled("config.load_json")
     def from_json(cls, path: Path):
         """Create an object from the given json data"""
         try:
             with path.open("r") as file:
-                data = json.load(file)
-
-                steps = data["steps"]
-                resolution = data["resolution"]
-                meters_per_pixel = data["meters_per_pixel"]
-                close_call_distance = data["close_call_distance"]
-
-                if type(steps) is not int or steps < 0:
-                    raise errors.InvalidStepsError
-                if (len(resolution) != 2
-                    or type(resolution[0]) is not int
-                    or type(resolution[1]) is not int
-                    or resolution[0] <= 0
-                    or resolution[1] <= 0):
-                    raise errors.InvalidResolutionError
-                if (not isinstance(meters_per_pixel, (int, float))
-                    or meters_per_pixel <= 0):
-                    raise errors.InvalidMetersPerPixelError
-                if (not isinstance(close_call_distance, (int, float))
-                    or close_call_distance <= 0):
-                    raise errors.InvalidCloseCallDistanceError
-
-                center_obj = CenterObject.from_json(data["center_object"])
-                point_objs = [PointObject.from_json(obj)
-                              for obj in data["point_objects"]]
-
-                return cls(steps, resolution, meters_per_pixel, close_call_distance,
-                           center_obj, point_objs)
+                return cls.from_dict(json.load(file))
         except (FileNotFoundError, PermissionError, json.JSONDecodeError) as exc:
             raise errors.UnableToOpenConfigError from exc
 
-    def save_data_to_json(self, path: Path):
-        """Save this object's data to a json file"""
-        data = {
+    @classmethod
+    @profiled("config.load_npz")
+    def from_npz(cls, path: Path):
+        """
+        Create an object from a columnar .npz file - the settings are stored
+        as a json string, point objects as arrays of positions, velocities
+        and masses, which are validated all at once
+        """
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                settings = json.loads(str(data["settings"]))
+                positions = data["positions"] if "positions" in data else None
+                velocities = data["velocities"] if "velocities" in data else None
+                masses = data["masses"] if "masses" in data else None
+        except (OSError, EOFError, KeyError, ValueError, TypeError,
+                zipfile.BadZipFile) as exc:
+            raise errors.UnableToOpenConfigError from exc
+        if not isinstance(settings, dict):
+            raise errors.UnableToOpenConfigError
+
+        # Settings are validated the same way as ones from json
+        settings_args = cls._parse_settings(settings)
+        center_obj = CenterObject.from_json(settings["center_object"])
+        if (positions is None or velocities is None or masses is None
+            or positions.dtype.kind not in "iuf" or velocities.dtype.kind not in "iuf"
+            or masses.dtype.kind not in "iuf" or masses.ndim != 1
+            or positions.shape != (len(masses), 2)
+            or velocities.shape != (len(masses), 2)):
+            raise errors.InvalidPointObjectDataError
+        if (masses < 0).any():
+            raise errors.NegativeMassError
+        point_objs = PointObject.from_body_table(BodyTable(positions, velocities, masses))
+        return cls(center_obj=center_obj, point_objs=point_objs, **settings_args)
+
+    @classmethod
+    def load(cls, path: Path):
+        """Create an object from a .npz file or a json file, depending on the suffix"""
+        if path.suffix == NPZ_SUFFIX:
+            return cls.from_npz(path)
+        return cls.from_json(path)
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Create an object from configuration data already parsed from json"""
+        settings_args = cls._parse_settings(data)
+        center_obj = CenterObject.from_json(data["center_object"])
+        point_objs = PointObject.from_json_list(data["point_objects"])
+        return cls(center_obj=center_obj, point_objs=point_objs, **settings_args)
+
+    @staticmethod
+    def _parse_settings(data: dict) -> dict:
+        """
+        Returns the settings other than the simulation objects as keyword arguments
+        of the constructor, once they're validated
+        """
+        steps = data["steps"]
+        resolution = data["resolution"]
+        meters_per_pixel = data["meters_per_pixel"]
+        close_call_distance = data["close_call_distance"]
+        # Optional settings, older configuration files don't contain them
+        neighbour_search = data.get("neighbour_search", "grid")
+        close_call_dedupe = data.get("close_call_dedupe", "step")
+        integrator = data.get("integrator", "euler")
+        time_step = data.get("time_step", 1.0)
+        adaptive_time_step = data.get("adaptive_time_step", False)
+        propagator = data.get("propagator", "numeric")
+        workers = data.get("workers", 1)
+        stop_on_collision = data.get("stop_on_collision", False)
+        stop_at_live_bodies = data.get("stop_at_live_bodies", 0)
+
+        if type(steps) is not int or steps < 0:
+            raise errors.InvalidStepsError
+        if (len(resolution) != 2
+            or type(resolution[0]) is not int
+            or type(resolution[1]) is not int
+            or resolution[0] <= 0
+            or resolution[1] <= 0):
+            raise errors.InvalidResolutionError
+        if (not isinstance(meters_per_pixel, (int, float))
+            or meters_per_pixel <= 0):
+            raise errors.InvalidMetersPerPixelError
+        if (not isinstance(close_call_distance, (int, float))
+            or close_call_distance <= 0):
+            raise errors.InvalidCloseCallDistanceError
+        if neighbour_search not in NEIGHBOUR_SEARCHES:
+            raise errors.InvalidNeighbourSearchError
+        if close_call_dedupe not in CLOSE_CALL_DEDUPES:
+            raise errors.InvalidCloseCallDedupeError
+        if integrator not in INTEGRATORS:
+            raise errors.InvalidIntegratorError
+        if (not isinstance(time_step, (int, float))
+            or time_step <= 0):
+            raise errors.InvalidTimeStepError
+        if type(adaptive_time_step) is not bool:
+            raise errors.InvalidAdaptiveTimeStepError
+        if propagator not in PROPAGATORS:
+            raise errors.InvalidPropagatorError
+        if type(workers) is not int or workers < 1:
+            raise errors.InvalidWorkersError
+        if type(stop_on_collision) is not bool:
+            raise errors.InvalidStopOnCollisionError
+        if type(stop_at_live_bodies) is not int or stop_at_live_bodies < 0:
+            raise errors.InvalidStopAtLiveBodiesError
+
+        return {"steps": steps, "resolution": resolution,
+                "meters_per_pixel": meters_per_pixel,
+                "close_call_distance": close_call_distance,
+                "neighbour_search": neighbour_search,
+                "close_call_dedupe": close_call_dedupe, "integrator": integrator,
+                "time_step": time_step, "adaptive_time_step": adaptive_time_step,
+                "propagator": propagator, "workers": workers,
+                "stop_on_collision": stop_on_collision,
+                "stop_at_live_bodies": stop_at_live_bodies}
+
+    def to_dict(self) -> dict:
+        """Returns this object's data in the form it's saved as json"""
+        return {
             "steps": self._steps,
             "resolution": self._resolution,
             "meters_per_pixel": self._meters_per_pixel,
             "close_call_distance": self._close_call_distance,
             "center_object": self._center_obj.serialize(),
-            "point_objects": [obj.serialize() for obj in self._point_objs]
+            "point_objects": PointObject.serialize_all(self._point_objs),
+            **self._settings_dict()
+        }
+
+    def _settings_dict(self) -> dict:
+        """Returns the optional settings in the form they're saved as json"""
+        return {
+            "neighbour_search": self._neighbour_search,
+            "close_call_dedupe": self._close_call_dedupe,
+            "integrator": self._integrator,
+            "time_step": self._time_step,
+            "adaptive_time_step": self._adaptive_time_step,
+            "propagator": self._propagator,
+            "workers": self._workers,
+            "stop_on_collision": self._stop_on_collision,
+            "stop_at_live_bodies": self._stop_at_live_bodies
         }
+
+    @profiled("config.save_json", lambda self, path: len(self._point_objs))
+    def save_data_to_json(self, path: Path):
+        """Save this object's data to a json file"""
         with path.open("w") as file:
-            json.dump(data, file, indent=4)
+            json.dump(self.to_dict(), file, indent=4)
+
+    @profiled("config.save_npz", lambda self, path: len(self._point_objs))
+    def save_data_to_npz(self, path: Path):
+        """Save this object's data to a columnar .npz file, read by from_npz()"""
+        settings = {
+            "steps": self._steps,
+            "resolution": list(self._resolution),
+            "meters_per_pixel": self._meters_per_pixel,
+            "close_call_distance": self._close_call_distance,
+            "center_object": self._center_obj.serialize(),
+            **self._settings_dict()
+        }
+        table = BodyTable.from_point_objects(self._point_objs)
+        with path.open("wb") as file:
+            np.savez(file, settings=np.array(json.dumps(settings)),
+                     positions=table.positions, velocities=table.velocities,
+                     masses=table.masses)
+
+    def save(self, path: Path):
+        """Save this object's data to a .npz file or a json file, like load()"""
+        if path.suffix == NPZ_SUFFIX:
+            self.save_data_to_npz(path)
+        else:
+            self.save_data_to_json(path)
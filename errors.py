@@ -46,3 +46,113 @@ class InvalidMetersPerPixelError(Exception):
 class InvalidCloseCallDistanceError(Exception):
     def __init__(self):
         super().__init__("Invalid close call distance value.")
+
+
+class InvalidNeighbourSearchError(Exception):
+    def __init__(self):
+        super().__init__("Invalid neighbour search, must be grid, sweep or kdtree.")
+
+
+class MissingScipyError(Exception):
+    def __init__(self):
+        super().__init__("The kdtree neighbour search requires scipy to be installed.")
+
+
+class InvalidCloseCallDedupeError(Exception):
+    def __init__(self):
+        super().__init__("Invalid close call dedupe, must be step or run.")
+
+
+class InvalidIntegratorError(Exception):
+    def __init__(self):
+        super().__init__("Invalid integrator, must be euler, leapfrog, yoshida4 or rk4.")
+
+
+class InvalidTimeStepError(Exception):
+    def __init__(self):
+        super().__init__("Time step must be a number greater than 0.")
+
+
+class InvalidAdaptiveTimeStepError(Exception):
+    def __init__(self):
+        super().__init__("Adaptive time step must be true or false.")
+
+
+class InvalidPropagatorError(Exception):
+    def __init__(self):
+        super().__init__("Invalid propagator, must be numeric or kepler.")
+
+
+class InvalidTrajectoryFileError(Exception):
+    def __init__(self):
+        super().__init__("Unable to read the trajectory file, it's missing or corrupted.")
+
+
+class TrajectoryMismatchError(Exception):
+    def __init__(self):
+        super().__init__("The trajectory doesn't match the point objects "
+                         "of the configuration.")
+
+
+class InvalidHeatmapScalingError(Exception):
+    def __init__(self):
+        super().__init__("Invalid heatmap scaling, must be log or equalize.")
+
+
+class InvalidAnimationFormatError(Exception):
+    def __init__(self):
+        super().__init__("Invalid animation format, must be gif, apng or frames.")
+
+
+class InvalidAnimationStrideError(Exception):
+    def __init__(self):
+        super().__init__("Animation stride must be an integer greater than 0.")
+
+
+class InvalidTileSizeError(Exception):
+    def __init__(self):
+        super().__init__("Tile size must be an integer greater than 0.")
+
+
+class InvalidWorkersError(Exception):
+    def __init__(self):
+        super().__init__("Workers must be an integer greater than 0.")
+
+
+class InvalidBatchSpecError(Exception):
+    def __init__(self):
+        super().__init__("Invalid batch specification, it needs either a list of "
+                         "configs or a base config with a sweep or an ensemble.")
+
+
+class InvalidCheckpointFileError(Exception):
+    def __init__(self):
+        super().__init__("Unable to read the checkpoint, it's not a valid .npz "
+                         "checkpoint file.")
+
+
+class CheckpointMismatchError(Exception):
+    def __init__(self):
+        super().__init__("Checkpoint doesn't match the simulation, it has a different "
+                         "amount of point objects or more steps.")
+
+
+class InvalidCheckpointIntervalError(Exception):
+    def __init__(self):
+        super().__init__("Checkpoint interval must be a number greater than 0.")
+
+
+class InvalidProgressIntervalError(Exception):
+    def __init__(self):
+        super().__init__("Progress interval must be a number greater than 0.")
+
+
+class InvalidStopOnCollisionError(Exception):
+    def __init__(self):
+        super().__init__("Stop on collision must be a boolean.")
+
+
+class InvalidStopAtLiveBodiesError(Exception):
+    def __init__(self):
+        super().__init__("Stop at live bodies must be an integer greater than or "
+                         "equal to 0.")
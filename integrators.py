@@ -0,0 +1,108 @@
+import numpy as np
+from typing import Callable
+
+# Function returning the (n, 2) accelerations (m/s^2) of objects at (n, 2) positions
+AccelerationFunction = Callable[[np.ndarray], np.ndarray]
+
+
+class Integrator:
+    """
+    Advances positions (meters) and velocities (m/s) of point objects by a single
+    time step (seconds) under the given acceleration. Never modifies its inputs.
+    """
+
+    # Virtual methods
+    def step(self, positions: np.ndarray, velocities: np.ndarray,
+             acceleration: AccelerationFunction,
+             time_step: float) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the new positions and velocities."""
+        raise NotImplementedError()
+
+
+class SemiImplicitEuler(Integrator):
+    """
+    First order - velocity is updated from the current acceleration first,
+    then position from the new velocity. One acceleration per step.
+    """
+
+    def step(self, positions: np.ndarray, velocities: np.ndarray,
+             acceleration: AccelerationFunction,
+             time_step: float) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the new positions and velocities."""
+        new_velocities = velocities + (acceleration(positions) * time_step)
+        new_positions = positions + (new_velocities * time_step)
+        return new_positions, new_velocities
+
+
+class Leapfrog(Integrator):
+    """
+    Second order symplectic (drift-kick-drift form of velocity Verlet).
+    One acceleration per step, energy error doesn't grow over many orbits.
+    """
+
+    def step(self, positions: np.ndarray, velocities: np.ndarray,
+             acceleration: AccelerationFunction,
+             time_step: float) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the new positions and velocities."""
+        half_positions = positions + velocities * (time_step / 2)
+        new_velocities = velocities + acceleration(half_positions) * time_step
+        new_positions = half_positions + new_velocities * (time_step / 2)
+        return new_positions, new_velocities
+
+
+class Yoshida4(Integrator):
+    """
+    Fourth order symplectic - three leapfrog steps with Yoshida's coefficients.
+    Three accelerations per step.
+    """
+    _W0 = -2**(1 / 3) / (2 - 2**(1 / 3))
+    _W1 = 1 / (2 - 2**(1 / 3))
+    _DRIFTS = (_W1 / 2, (_W0 + _W1) / 2, (_W0 + _W1) / 2, _W1 / 2)
+    _KICKS = (_W1, _W0, _W1)
+
+    def step(self, positions: np.ndarray, velocities: np.ndarray,
+             acceleration: AccelerationFunction,
+             time_step: float) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the new positions and velocities."""
+        new_positions = positions + velocities * (self._DRIFTS[0] * time_step)
+        new_velocities = velocities
+        for drift, kick in zip(self._DRIFTS[1:], self._KICKS):
+            accel_vectors = acceleration(new_positions)
+            new_velocities = new_velocities + accel_vectors * (kick * time_step)
+            new_positions = new_positions + new_velocities * (drift * time_step)
+        return new_positions, new_velocities
+
+
+class RungeKutta4(Integrator):
+    """Classic fourth order Runge-Kutta. Four accelerations per step, not symplectic."""
+
+    def step(self, positions: np.ndarray, velocities: np.ndarray,
+             acceleration: AccelerationFunction,
+             time_step: float) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the new positions and velocities."""
+        half_step = time_step / 2
+        k1_v = acceleration(positions)
+        k1_x = velocities
+        k2_v = acceleration(positions + k1_x * half_step)
+        k2_x = velocities + k1_v * half_step
+        k3_v = acceleration(positions + k2_x * half_step)
+        k3_x = velocities + k2_v * half_step
+        k4_v = acceleration(positions + k3_x * time_step)
+        k4_x = velocities + k3_v * time_step
+
+        sixth_step = time_step / 6
+        new_positions = positions + (k1_x + 2 * k2_x + 2 * k3_x + k4_x) * sixth_step
+        new_velocities = velocities + (k1_v + 2 * k2_v + 2 * k3_v + k4_v) * sixth_step
+        return new_positions, new_velocities
+
+
+# Integrators, which can be chosen in the configuration file
+INTEGRATORS = {
+    "euler": SemiImplicitEuler,
+    "leapfrog": Leapfrog,
+    "yoshida4": Yoshida4,
+    "rk4": RungeKutta4
+}
+# Ways of moving point objects between steps - integrating their motion with one
+# of the integrators, or along exact two-body orbits (see kepler.py)
+PROPAGATORS = ("numeric", "kepler")
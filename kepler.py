@@ -0,0 +1,132 @@
+import numpy as np
+
+# Newton iterations of the universal Kepler equation stop after this many steps
+_MAX_ITERATIONS = 50
+# or once the universal anomaly changes by less than this fraction
+_TOLERANCE = 1e-13
+
+
+def _stumpff(z: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the Stumpff functions C(z) and S(z), using series near z = 0."""
+    c = np.empty_like(z)
+    s = np.empty_like(z)
+    small = np.abs(z) < 1e-6
+    elliptic = (z > 0) & ~small
+    hyperbolic = (z < 0) & ~small
+
+    sqrt_z = np.sqrt(z[elliptic])
+    c[elliptic] = (1 - np.cos(sqrt_z)) / z[elliptic]
+    s[elliptic] = (sqrt_z - np.sin(sqrt_z)) / sqrt_z**3
+
+    sqrt_minus_z = np.sqrt(-z[hyperbolic])
+    c[hyperbolic] = (np.cosh(sqrt_minus_z) - 1) / -z[hyperbolic]
+    s[hyperbolic] = (np.sinh(sqrt_minus_z) - sqrt_minus_z) / sqrt_minus_z**3
+
+    z_small = z[small]
+    c[small] = 1 / 2 - z_small / 24 + z_small**2 / 720
+    s[small] = 1 / 6 - z_small / 120 + z_small**2 / 5040
+    return c, s
+
+
+def propagate_kepler(positions: np.ndarray, velocities: np.ndarray, mu: float,
+                     elapsed: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Advances (n, 2) positions (meters) and velocities (m/s) of objects orbiting
+    a center object at (0, 0) with gravitational parameter mu (G * M) by elapsed
+    seconds along their exact two-body orbits. Solves the universal-variable
+    Kepler equation for all objects at once, so any time can be reached directly.
+    Returns the new positions and velocities.
+    Without any mass (mu = 0) objects move in straight lines.
+    """
+    if mu == 0:
+        return positions + velocities * elapsed, velocities.copy()
+    r0 = np.sqrt(np.einsum("ij,ij->i", positions, positions))
+    v0_squared = np.einsum("ij,ij->i", velocities, velocities)
+    radial_speed = np.einsum("ij,ij->i", positions, velocities) / r0
+    alpha = 2 / r0 - v0_squared / mu  # Reciprocal of the semi-major axis
+    sqrt_mu = np.sqrt(mu)
+
+    # Whole periods of bound orbits don't change anything, skipping them
+    # keeps the universal anomaly small
+    times = np.full(len(positions), float(elapsed))
+    bound = alpha > 0
+    periods = 2 * np.pi / np.sqrt(mu * alpha[bound]**3)
+    times[bound] = np.fmod(times[bound], periods)
+
+    # Starting guesses of the universal anomaly as in Vallado's algorithm
+    chi = sqrt_mu * alpha * times
+    unbound = np.flatnonzero(~bound)
+    u_alpha, u_times, u_r0 = alpha[unbound], times[unbound], r0[unbound]
+    chi[unbound] = sqrt_mu * u_times / u_r0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        semi_major_axis = 1 / u_alpha
+        sign = np.sign(u_times)
+        hyperbolic_guess = sign * np.sqrt(-semi_major_axis) * np.log(
+            -2 * mu * u_alpha * u_times
+            / (u_r0 * radial_speed[unbound]
+               + sign * np.sqrt(-mu * semi_major_axis) * (1 - u_r0 * u_alpha)))
+    usable = np.isfinite(hyperbolic_guess) & (u_alpha < -1e-12)
+    chi[unbound[usable]] = hyperbolic_guess[usable]
+    # Each object stops iterating once it converges, so its result doesn't depend
+    # on which other objects are propagated along with it
+    iterating = np.arange(len(chi))
+    for _ in range(_MAX_ITERATIONS):
+        it_chi, it_alpha, it_r0 = chi[iterating], alpha[iterating], r0[iterating]
+        it_radial_speed = radial_speed[iterating]
+        z = it_alpha * it_chi**2
+        c, s = _stumpff(z)
+        value = (it_r0 * it_radial_speed / sqrt_mu * it_chi**2 * c
+                 + (1 - it_alpha * it_r0) * it_chi**3 * s + it_r0 * it_chi
+                 - sqrt_mu * times[iterating])
+        derivative = (it_r0 * it_radial_speed / sqrt_mu * it_chi * (1 - z * s)
+                      + (1 - it_alpha * it_r0) * it_chi**2 * c + it_r0)
+        change = value / derivative
+        it_chi = it_chi - change
+        chi[iterating] = it_chi
+        iterating = iterating[np.abs(change) > _TOLERANCE * np.maximum(np.abs(it_chi),
+                                                                        1.0)]
+        if len(iterating) == 0:
+            break
+
+    z = alpha * chi**2
+    c, s = _stumpff(z)
+    f = 1 - chi**2 / r0 * c
+    g = times - chi**3 * s / sqrt_mu
+    new_positions = f[:, np.newaxis] * positions + g[:, np.newaxis] * velocities
+
+    r = np.sqrt(np.einsum("ij,ij->i", new_positions, new_positions))
+    f_dot = sqrt_mu / (r * r0) * (alpha * chi**3 * s - chi)
+    g_dot = 1 - chi**2 / r * c
+    new_velocities = (f_dot[:, np.newaxis] * positions
+                      + g_dot[:, np.newaxis] * velocities)
+    return new_positions, new_velocities
+
+
+def pericenter_distances(positions: np.ndarray, velocities: np.ndarray,
+                         mu: float) -> np.ndarray:
+    """Returns the closest distance to the center each object's orbit reaches."""
+    r = np.sqrt(np.einsum("ij,ij->i", positions, positions))
+    v_squared = np.einsum("ij,ij->i", velocities, velocities)
+    angular_momentum = (positions[:, 0] * velocities[:, 1]
+                        - positions[:, 1] * velocities[:, 0])
+    if mu == 0:
+        # Straight lines come closest at their distance from the center,
+        # objects, which don't move stay where they are
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(v_squared > 0, np.abs(angular_momentum)
+                            / np.sqrt(v_squared), r)
+    energy = v_squared / 2 - mu / r
+    eccentricity = np.sqrt(np.maximum(1 + 2 * energy * angular_momentum**2 / mu**2,
+                                      0.0))
+    return angular_momentum**2 / mu / (1 + eccentricity)
+
+
+def orbital_periods(positions: np.ndarray, velocities: np.ndarray,
+                    mu: float) -> np.ndarray:
+    """Returns the orbital period of each object, infinite for unbound orbits."""
+    if mu == 0:
+        return np.full(len(positions), np.inf)
+    r = np.sqrt(np.einsum("ij,ij->i", positions, positions))
+    alpha = 2 / r - np.einsum("ij,ij->i", velocities, velocities) / mu
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(alpha > 0, 2 * np.pi / np.sqrt(mu * np.abs(alpha)**3), np.inf)
@@ -0,0 +1,265 @@
+import itertools
+import numpy as np
+import errors
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# Largest coordinate, which is packed into integer keys by find_duplicate_points
+_MAX_PACKED_COORDINATE = 2**30
+
+
+def find_duplicate_points(points: np.ndarray) -> np.ndarray:
+    """
+    Returns sorted indexes of the given (n, 2) points with whole number coordinates
+    (e.g. pixel positions), which share their position with another point.
+    Points with NaN coordinates never collide. Each point is packed into a single
+    int64 key and duplicates are counted with np.bincount, falling back to sorting
+    the keys when they are too sparse for a count table.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    finite = np.flatnonzero(np.isfinite(points).all(axis=1))
+    if len(finite) < 2:
+        return np.empty(0, dtype=np.int64)
+    points = points[finite]
+
+    if np.abs(points).max() > _MAX_PACKED_COORDINATE:
+        # Too far apart to pack, compare both coordinates of sorted points instead
+        order = np.lexsort((points[:, 1], points[:, 0]))
+        same = (points[order[1:]] == points[order[:-1]]).all(axis=1)
+        return np.sort(finite[order[_mark_runs(same)]])
+
+    cells = points.astype(np.int64)
+    origin = cells.min(axis=0)
+    extent = cells.max(axis=0) - origin + 1
+    keys = (cells[:, 0] - origin[0]) * extent[1] + (cells[:, 1] - origin[1])
+    if extent[0] * extent[1] <= 4 * len(keys) + 1024:
+        counts = np.bincount(keys)
+        return finite[np.flatnonzero(counts[keys] > 1)]
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    return np.sort(finite[order[_mark_runs(sorted_keys[1:] == sorted_keys[:-1])]])
+
+
+def _mark_runs(same: np.ndarray) -> np.ndarray:
+    """
+    Gets a mask telling which sorted elements equal the previous one and
+    returns a mask of all elements, which are equal to a neighbour.
+    """
+    duplicate = np.zeros(len(same) + 1, dtype=bool)
+    duplicate[1:] |= same
+    duplicate[:-1] |= same
+    return duplicate
+
+
+class NeighbourSearch:
+    def __init__(self, points: np.ndarray, max_radius: float):
+        """
+        Index over the given (n, 2) points, which answers which points lie
+        within a radius (meters) of a query. Queries never use a radius
+        larger than max_radius.
+        """
+        self._points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self._max_radius = max_radius
+
+    @property
+    def points(self) -> np.ndarray:
+        return self._points
+
+    @classmethod
+    def check_available(cls):
+        """Raises an error if this search can't be used in the current environment."""
+
+    def _filter_within(self, queries: np.ndarray, query_indexes: np.ndarray,
+                       point_indexes: np.ndarray,
+                       radius: float) -> tuple[np.ndarray, np.ndarray]:
+        """Keeps only the candidate pairs, which are no further than radius apart."""
+        dist_vectors = self._points[point_indexes] - queries[query_indexes]
+        dist = np.sqrt(np.einsum("ij,ij->i", dist_vectors, dist_vectors))
+        within = dist <= radius
+        return query_indexes[within], point_indexes[within]
+
+    @staticmethod
+    def _expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """Concatenates the index ranges [start, start + count) into one array."""
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(starts, counts) + offsets
+
+    # Virtual methods
+    def query_pairs(self, queries: np.ndarray,
+                    radius: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds all pairs of a query and an indexed point no further than radius
+        apart. Returns two arrays of equal length - indexes into queries and
+        indexes into the indexed points.
+        """
+        raise NotImplementedError()
+
+
+class SpatialHash(NeighbourSearch):
+    # Upper bound of cells along one axis, keeps packed cell keys within int64
+    _MAX_CELLS_PER_AXIS = 2**30
+
+    def __init__(self, points: np.ndarray, max_radius: float):
+        """
+        Uniform grid index. Each point is hashed into a square cell of max_radius
+        meters, so all points within max_radius of a query lie in the query's cell
+        or one of its eight neighbours. The cell size is enlarged when the points
+        span too many cells to pack. Points with NaN coordinates aren't indexed.
+        """
+        super().__init__(points, max_radius)
+        finite = np.flatnonzero(np.isfinite(self._points).all(axis=1))
+        finite_points = self._points[finite]
+        self._cell_size = max_radius
+        if len(finite_points) > 0:
+            span = (finite_points.max(axis=0) - finite_points.min(axis=0)).max()
+            self._cell_size = max(max_radius, span / self._MAX_CELLS_PER_AXIS)
+
+        cells = self._cells_of(finite_points)
+        if len(cells) > 0:
+            # One empty cell of margin on each side, so neighbours of any
+            # occupied cell still pack into valid keys
+            self._origin = cells.min(axis=0) - 1
+            self._extent = cells.max(axis=0) - self._origin + 2
+        else:
+            self._origin = np.zeros(2, dtype=np.int64)
+            self._extent = np.zeros(2, dtype=np.int64)
+
+        keys = self._pack(cells)
+        order = np.argsort(keys, kind="stable")
+        # Indexes of the points sorted by their cell
+        self._order = finite[order]
+        # Occupied cells with the range of sorted points each of them holds
+        self._cell_keys, self._cell_starts, self._cell_counts = np.unique(
+            keys[order], return_index=True, return_counts=True)
+
+    @property
+    def cell_size(self) -> float:
+        return self._cell_size
+
+    def _cells_of(self, points: np.ndarray) -> np.ndarray:
+        """Returns the integer (x, y) cell coordinates of the given points."""
+        return np.floor(points / self._cell_size).astype(np.int64)
+
+    def _pack(self, cells: np.ndarray) -> np.ndarray:
+        """Packs (x, y) cell coordinates into a single int64 key per cell."""
+        local = cells - self._origin
+        return local[:, 0] * self._extent[1] + local[:, 1]
+
+    def query_pairs(self, queries: np.ndarray,
+                    radius: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds all pairs of a query and an indexed point no further than radius
+        apart, only comparing points in neighbouring cells.
+        """
+        queries = np.asarray(queries, dtype=float).reshape(-1, 2)
+        if len(self._order) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        finite = np.flatnonzero(np.isfinite(queries).all(axis=1))
+        query_cells = self._cells_of(queries[finite])
+        # Sorting the queries by cell keeps every lookup below in sorted order,
+        # since moving to a neighbouring cell shifts all keys by the same amount
+        query_keys = self._pack(query_cells)
+        query_order = np.argsort(query_keys, kind="stable")
+        query_keys = query_keys[query_order]
+        query_cells = query_cells[query_order]
+        query_ids = finite[query_order]
+
+        found_queries = []
+        found_points = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                local = query_cells + np.array([dx, dy]) - self._origin
+                # Cells outside the indexed area can't contain any point
+                inside = np.flatnonzero(
+                    ((local >= 0) & (local < self._extent)).all(axis=1))
+                keys = query_keys[inside] + (dx * self._extent[1] + dy)
+                slots = np.searchsorted(self._cell_keys, keys)
+                slots[slots == len(self._cell_keys)] = 0
+                occupied = self._cell_keys[slots] == keys
+                slots = slots[occupied]
+                starts = self._cell_starts[slots]
+                counts = self._cell_counts[slots]
+
+                found_queries.append(np.repeat(query_ids[inside[occupied]], counts))
+                found_points.append(self._order[self._expand_ranges(starts, counts)])
+
+        return self._filter_within(queries, np.concatenate(found_queries),
+                                   np.concatenate(found_points), radius)
+
+
+class SortSweep(NeighbourSearch):
+    def __init__(self, points: np.ndarray, max_radius: float):
+        """
+        Sort-and-sweep index. Points are sorted along the X axis, so a query only
+        compares the points inside the [x - radius, x + radius] band.
+        Works for any distribution of points, without tuning a cell size.
+        """
+        super().__init__(points, max_radius)
+        self._order = np.argsort(self._points[:, 0], kind="stable")
+        self._sorted_x = self._points[self._order, 0]
+
+    def query_pairs(self, queries: np.ndarray,
+                    radius: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds all pairs of a query and an indexed point no further than radius
+        apart, only comparing points inside the query's band.
+        """
+        queries = np.asarray(queries, dtype=float).reshape(-1, 2)
+        starts = np.searchsorted(self._sorted_x, queries[:, 0] - radius, side="left")
+        ends = np.searchsorted(self._sorted_x, queries[:, 0] + radius, side="right")
+        counts = np.maximum(ends - starts, 0)
+        query_indexes = np.repeat(np.arange(len(queries)), counts)
+        point_indexes = self._order[self._expand_ranges(starts, counts)]
+        return self._filter_within(queries, query_indexes, point_indexes, radius)
+
+
+class KDTree(NeighbourSearch):
+    def __init__(self, points: np.ndarray, max_radius: float):
+        """
+        KD-tree index backed by scipy. Handles strongly clustered points, where
+        neither grid cells nor sweep bands can be tight. Requires scipy.
+        Points with NaN coordinates aren't indexed, the tree can't hold them.
+        """
+        self.check_available()
+        super().__init__(points, max_radius)
+        # Indexes of the points held by the tree, in the tree's order
+        self._tree_indexes = np.flatnonzero(np.isfinite(self._points).all(axis=1))
+        self._tree = cKDTree(self._points[self._tree_indexes])
+
+    @classmethod
+    def check_available(cls):
+        """Raises an error if scipy isn't installed."""
+        if cKDTree is None:
+            raise errors.MissingScipyError
+
+    def query_pairs(self, queries: np.ndarray,
+                    radius: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds all pairs of a query and an indexed point no further than radius
+        apart by walking the tree.
+        """
+        queries = np.asarray(queries, dtype=float).reshape(-1, 2)
+        finite = np.flatnonzero(np.isfinite(queries).all(axis=1))
+        # The tree measures distances its own way, so candidates are searched with
+        # some slack and filtered with the same distance formula as other searches
+        slack = radius * 1e-9 + 1e-12
+        found = self._tree.query_ball_point(queries[finite], radius + slack,
+                                            return_sorted=False)
+        counts = np.fromiter(map(len, found), dtype=np.int64, count=len(found))
+        query_indexes = np.repeat(finite, counts)
+        point_indexes = self._tree_indexes[np.fromiter(
+            itertools.chain.from_iterable(found), dtype=np.int64, count=counts.sum())]
+        return self._filter_within(queries, query_indexes, point_indexes, radius)
+
+
+# Neighbour searches, which can be chosen in the configuration file
+NEIGHBOUR_SEARCHES = {
+    "grid": SpatialHash,
+    "sweep": SortSweep,
+    "kdtree": KDTree
+}
+# Scopes in which a close call of the same objects is only reported once
+CLOSE_CALL_DEDUPES = ("step", "run")
@@ -1,9 +1,12 @@
 from space_object import SpaceObject
+from body_table import BodyTable
 import numpy as np
 import errors
 
 
 class PointObject(SpaceObject):
+    __slots__ = ()
+
     def __init__(self, position: np.array = None, mass: float = 1.0,
                  velocity: np.array = None):
         """
@@ -11,29 +14,87 @@ class PointObject(SpaceObject):
         mass is a float, which represents an object's mass in kilograms,
         velocity is a speed vector (m/s).
         """
-        super().__init__(position, mass)
         if velocity is None:
-            self._velocity = np.array([0, 0]).astype(float)
-        else:
-            self._velocity = velocity
+            velocity = np.array([0, 0]).astype(float)
 
         # Position and velocity must be two-dimensional
-        if len(self._position) != 2 or len(self._velocity) != 2:
+        if (position is not None and len(position) != 2) or len(velocity) != 2:
             raise errors.InvalidPointObjectDataError
+        super().__init__(position, mass)
+        self._table.velocities[self._index] = velocity
 
     @property
     def velocity(self) -> np.array:
-        return self._velocity
+        """View of the object's velocity, writing into it changes the velocity."""
+        return self._table.velocities[self._index]
 
     def set_velocity(self, velocity: np.array):
-        self._velocity = velocity
+        self._table.velocities[self._index] = velocity
 
     def set_position(self, position: np.array):
-        self._position = position
+        self._table.positions[self._index] = position
+
+    @classmethod
+    def from_body_table(cls, table: BodyTable) -> list["PointObject"]:
+        """Create handles to all rows of the given table, which all share it."""
+        point_objs = []
+        for index in range(len(table)):
+            point_obj = cls.__new__(cls)
+            point_obj._table = table
+            point_obj._index = index
+            point_objs.append(point_obj)
+        return point_objs
 
     @classmethod
     def from_json(cls, json_data):
         """Create an object from the given json data."""
+        pos, mass, vel = cls._parse_json(json_data)
+        return cls(np.array(pos), mass, np.array(vel))
+
+    @classmethod
+    def from_json_list(cls, json_data: list[dict]) -> list["PointObject"]:
+        """
+        Create objects from a list of their json data, all of them share one
+        body table, which is filled at once.
+        """
+        positions = []
+        masses = []
+        velocities = []
+        for obj_data in json_data:
+            pos, mass, vel = cls._parse_json(obj_data)
+            if len(pos) != 2 or len(vel) != 2:
+                raise errors.InvalidPointObjectDataError
+            if mass < 0:
+                raise errors.NegativeMassError
+            positions.append(pos)
+            masses.append(mass)
+            velocities.append(vel)
+        return cls.from_body_table(BodyTable(np.array(positions, dtype=float),
+                                             np.array(velocities, dtype=float),
+                                             np.array(masses, dtype=float)))
+
+    def serialize(self):
+        """Convert this object's data to json."""
+        return {
+            "velocity": self._to_json_vector(self.velocity.tolist()),
+            "mass": self._to_json_number(self.mass),
+            "position": self._to_json_vector(self.position.tolist())
+        }
+
+    @staticmethod
+    def serialize_all(point_objs: list["PointObject"]) -> list[dict]:
+        """Convert the data of all given objects to json, like serialize() does."""
+        table = BodyTable.from_point_objects(point_objs)
+        return [{"velocity": PointObject._to_json_vector(vel),
+                 "mass": PointObject._to_json_number(mass),
+                 "position": PointObject._to_json_vector(pos)}
+                for vel, mass, pos in zip(table.velocities.tolist(),
+                                          table.masses.tolist(),
+                                          table.positions.tolist())]
+
+    @staticmethod
+    def _parse_json(json_data: dict) -> tuple[list, float, list]:
+        """Returns the position, mass and velocity from json data, once checked."""
         pos = json_data["position"]
         mass = json_data["mass"]
         vel = json_data["velocity"]
@@ -41,16 +102,7 @@ class PointObject(SpaceObject):
             or not isinstance(mass, (int, float))
             or not PointObject._verify_vector(vel)):
             raise errors.InvalidPointObjectDataError
-
-        return cls(np.array(pos), mass, np.array(vel))
-
-    def serialize(self):
-        """Convert this object's data to json."""
-        return {
-            "velocity": self._velocity.tolist(),
-            "mass": self._mass,
-            "position": self._position.tolist()
-        }
+        return pos, mass, vel
 
     @staticmethod
     def _verify_vector(vector: np.array):
@@ -0,0 +1,170 @@
+import functools
+import json
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Callable
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak memory isn't measured there
+    resource = None
+
+# Profiler, which profiled functions report to, None when profiling is disabled
+_active_profiler = None
+
+
+def profiled(phase: str, items: Callable = None) -> Callable:
+    """
+    Decorator reporting each call of the function as the given phase to the active
+    profiler. Items is an optional function getting the same arguments, which
+    returns how many objects the call processes. Without an active profiler
+    the function is just called, so it costs next to nothing.
+    """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def profiled_function(*args, **kwargs):
+            profiler = _active_profiler
+            if profiler is None:
+                return function(*args, **kwargs)
+            item_amount = 0 if items is None else items(*args, **kwargs)
+            start = profiler.begin()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.end(phase, start, item_amount)
+        return profiled_function
+    return decorator
+
+
+def _peak_memory() -> int:
+    """Returns the peak resident memory of this process so far in bytes."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class PhaseStats:
+    calls: int = 0
+    # Wall time of all calls, including phases nested in them
+    seconds: float = 0.0
+    # Amount of objects processed by all calls
+    items: int = 0
+    # How much the peak memory of the process grew during the calls
+    peak_memory_growth: int = 0
+
+    @property
+    def items_per_call(self) -> float:
+        return self.items / self.calls if self.calls > 0 else 0.0
+
+
+class Profiler:
+    # At most this many calls are kept for the trace, later ones are only counted
+    _MAX_TRACE_EVENTS = 2**21
+
+    def __init__(self, trace: bool = False):
+        """
+        Records the wall time, call count, processed objects and peak memory
+        growth of each phase reported while it's active (between start() and
+        stop(), or in a with statement). With trace, every call is also kept,
+        so it can be saved as a Chrome trace.
+        """
+        self._trace = trace
+        self._stats = {}
+        self._trace_events = []
+        self._dropped_trace_events = 0
+        self._start_time = perf_counter_ns()
+        self._previous_profiler = None
+
+    @property
+    def stats(self) -> dict[str, PhaseStats]:
+        return self._stats
+
+    @property
+    def peak_memory(self) -> int:
+        """Peak resident memory of the process in bytes, 0 if it's unknown."""
+        return _peak_memory()
+
+    def start(self):
+        """
+        Makes this the profiler, which profiled functions report to, until stop().
+        The profiler active before is restored then, so profilers can be nested.
+        """
+        global _active_profiler
+        if _active_profiler is not self:
+            self._previous_profiler = _active_profiler
+            _active_profiler = self
+
+    def stop(self):
+        global _active_profiler
+        if _active_profiler is self:
+            _active_profiler = self._previous_profiler
+            self._previous_profiler = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def begin(self) -> tuple[int, int]:
+        """Returns what end() needs to know about the start of a call."""
+        return perf_counter_ns(), _peak_memory()
+
+    def end(self, phase: str, start: tuple[int, int], items: int = 0):
+        """Records a call of the phase, which began with the given begin() result."""
+        end_time = perf_counter_ns()
+        start_time, start_memory = start
+        stats = self._stats.get(phase)
+        if stats is None:
+            stats = self._stats[phase] = PhaseStats()
+        stats.calls += 1
+        stats.seconds += (end_time - start_time) / 1e9
+        stats.items += items
+        stats.peak_memory_growth += _peak_memory() - start_memory
+        if self._trace:
+            if len(self._trace_events) < self._MAX_TRACE_EVENTS:
+                self._trace_events.append((phase, start_time, end_time,
+                                           threading.get_ident(), items))
+            else:
+                self._dropped_trace_events += 1
+
+    def format_summary(self) -> str:
+        """Presents the stats of all phases as a table, slowest first."""
+        name_width = max([len("phase")] + [len(phase) for phase in self._stats]) + 2
+        lines = [f"{'phase':<{name_width}}{'calls':>9}{'total ms':>12}"
+                 f"{'ms/call':>10}{'items':>12}{'items/call':>12}{'peak +MiB':>11}"]
+        for phase, stats in sorted(self._stats.items(),
+                                   key=lambda item: item[1].seconds, reverse=True):
+            lines.append(f"{phase:<{name_width}}{stats.calls:>9}"
+                         f"{stats.seconds * 1000:>12.2f}"
+                         f"{stats.seconds * 1000 / stats.calls:>10.3f}"
+                         f"{stats.items:>12}{stats.items_per_call:>12.1f}"
+                         f"{stats.peak_memory_growth / 2**20:>11.1f}")
+        if resource is not None:
+            lines.append(f"peak memory: {self.peak_memory / 2**20:.1f} MiB")
+        if self._dropped_trace_events > 0:
+            lines.append(f"{self._dropped_trace_events} calls weren't traced")
+        return "\n".join(lines)
+
+    def save_trace(self, path: Path):
+        """
+        Saves the traced calls in the Chrome trace event format, which can be
+        opened in chrome://tracing or Perfetto.
+        """
+        events = [{
+            "name": phase, "cat": phase.split(".")[0], "ph": "X",
+            "ts": (start_time - self._start_time) / 1000,
+            "dur": (end_time - start_time) / 1000,
+            "pid": os.getpid(), "tid": thread_id, "args": {"items": items}
+        } for phase, start_time, end_time, thread_id, items in self._trace_events]
+        with path.open("w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
@@ -0,0 +1,103 @@
+import json
+import time
+import errors
+from pathlib import Path
+from typing import TextIO
+
+
+class ProgressReporter:
+    def __init__(self, stream: TextIO = None, every_seconds: float = 0.5,
+                 metrics_path: Path = None, metrics_every_seconds: float = 10.0):
+        """
+        Reports the progress of a running simulation - the step, steps per second,
+        estimated time left, amount of live bodies and events so far. A progress
+        line is rewritten in the given stream every given amount of seconds and
+        metrics are appended to the given file as json lines every metrics
+        interval. A simulation asks due() after every step and only gathers
+        the metrics for report() when it's true, so it costs next to nothing.
+        """
+        for seconds in (every_seconds, metrics_every_seconds):
+            if not isinstance(seconds, (int, float)) or seconds <= 0:
+                raise errors.InvalidProgressIntervalError
+        self._stream = stream
+        self._every_seconds = every_seconds
+        self._metrics_every_seconds = metrics_every_seconds
+        self._metrics_file = None
+        if metrics_path is not None:
+            self._metrics_file = Path(metrics_path).open("a")
+        self._first_step = None
+        self._start_time = None
+        self._next_line_time = None
+        self._next_metrics_time = None
+        self._line_length = 0
+
+    def due(self, step: int) -> bool:
+        """Returns whether progress should be reported after the given step."""
+        now = time.monotonic()
+        if self._first_step is None:
+            # Speed is measured from the first step the reporter sees
+            self._first_step = step
+            self._start_time = now
+            self._next_line_time = now + self._every_seconds
+            self._next_metrics_time = now + self._metrics_every_seconds
+            return False
+        return ((self._stream is not None and now >= self._next_line_time)
+                or (self._metrics_file is not None and now >= self._next_metrics_time))
+
+    def report(self, step: int, steps: int, live_bodies: int, collisions: int,
+               close_calls: int, final: bool = False):
+        """
+        Reports the state after the given step (counted from 1) of all steps.
+        The final report is always written, regardless of the intervals.
+        """
+        now = time.monotonic()
+        if self._first_step is None:
+            self._first_step = step
+            self._start_time = now
+        elapsed = now - self._start_time
+        steps_per_second = (step - self._first_step) / elapsed if elapsed > 0 else 0.0
+        eta_seconds = None
+        if steps_per_second > 0:
+            eta_seconds = (steps - step) / steps_per_second
+        metrics = {
+            "time": time.time(), "elapsed_seconds": elapsed, "step": step,
+            "steps": steps, "steps_per_second": steps_per_second,
+            "eta_seconds": eta_seconds, "live_bodies": live_bodies,
+            "collisions": collisions, "close_calls": close_calls, "final": final
+        }
+        if self._stream is not None and (final or now >= self._next_line_time):
+            self._write_line(metrics)
+            self._next_line_time = now + self._every_seconds
+        if self._metrics_file is not None and (final
+                                               or now >= self._next_metrics_time):
+            self._metrics_file.write(json.dumps(metrics) + "\n")
+            self._metrics_file.flush()
+            self._next_metrics_time = now + self._metrics_every_seconds
+
+    def _write_line(self, metrics: dict):
+        """Rewrites the progress line with the given metrics."""
+        percent = 100 * metrics["step"] / metrics["steps"] if metrics["steps"] else 100
+        eta = "?"
+        if metrics["eta_seconds"] is not None:
+            minutes, seconds = divmod(round(metrics["eta_seconds"]), 60)
+            hours, minutes = divmod(minutes, 60)
+            eta = f"{hours}:{minutes:02}:{seconds:02}"
+        line = (f"step {metrics['step']}/{metrics['steps']} ({percent:.1f}%), "
+                f"{metrics['steps_per_second']:.1f} steps/s, ETA {eta}, "
+                f"live bodies: {metrics['live_bodies']}, "
+                f"collisions: {metrics['collisions']}, "
+                f"close calls: {metrics['close_calls']}")
+        # Leftovers of a longer previous line are overwritten with spaces
+        self._stream.write("\r" + line.ljust(self._line_length))
+        self._stream.flush()
+        self._line_length = len(line)
+
+    def close(self):
+        """Ends the progress line and closes the metrics file."""
+        if self._stream is not None and self._line_length > 0:
+            self._stream.write("\n")
+            self._stream.flush()
+            self._line_length = 0
+        if self._metrics_file is not None:
+            self._metrics_file.close()
+            self._metrics_file = None
@@ -0,0 +1,97 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable
+from profiler import profiled
+
+# Function run by the workers - gets the shared arrays, the first and one past
+# the last index of its shard and the arguments given to ShardPool.run()
+ShardFunction = Callable[..., object]
+
+# Shared arrays and the shard functions of the current worker process
+_worker_buffers = {}
+_worker_functions = {}
+_worker_shared_memory = []
+
+
+def _init_worker(functions: dict[str, ShardFunction],
+                 specs: dict[str, tuple[str, tuple[int], str]]):
+    """Attaches the worker process to the shared arrays."""
+    _worker_functions.update(functions)
+    for name, (shm_name, shape, dtype) in specs.items():
+        shared_memory = SharedMemory(shm_name)
+        _worker_shared_memory.append(shared_memory)
+        _worker_buffers[name] = np.ndarray(shape, dtype, buffer=shared_memory.buf)
+
+
+def _run_shard(function: str, start: int, stop: int, args: tuple):
+    """Runs a shard function for one shard in a worker process."""
+    return _worker_functions[function](_worker_buffers, start, stop, *args)
+
+
+class ShardPool:
+    def __init__(self, functions: dict[str, ShardFunction],
+                 arrays: dict[str, np.ndarray], item_amount: int, workers: int):
+        """
+        Splits item_amount items (point objects) into one contiguous shard per
+        worker process. The given arrays are copied into shared memory, which both
+        the workers and this process see without copying, through buffers.
+        Functions are run on the shards by name, they have to be picklable,
+        they're sent to each worker once.
+        """
+        self._item_amount = item_amount
+        self._workers = workers
+        self._shared_memory = []
+        self._buffers = {}
+        specs = {}
+        try:
+            for name, array in arrays.items():
+                shared_memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+                self._shared_memory.append(shared_memory)
+                buffer = np.ndarray(array.shape, array.dtype, buffer=shared_memory.buf)
+                buffer[...] = array
+                self._buffers[name] = buffer
+                specs[name] = (shared_memory.name, array.shape, array.dtype.str)
+            self._executor = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                                 initargs=(functions, specs))
+        except BaseException:
+            self._release_shared_memory()
+            raise
+
+    @property
+    def buffers(self) -> dict[str, np.ndarray]:
+        return self._buffers
+
+    @profiled("simulation.shards", lambda self, function, *_: self._item_amount)
+    def run(self, function: str, *args) -> list:
+        """
+        Runs the named function on all shards in parallel with the given arguments
+        and waits for them. Returns the results of the shards in their order.
+        """
+        bounds = np.linspace(0, self._item_amount, self._workers + 1).astype(int)
+        futures = [self._executor.submit(_run_shard, function, int(start), int(stop),
+                                         args)
+                   for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Stops the workers and frees the shared memory."""
+        self._executor.shutdown()
+        self._release_shared_memory()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _release_shared_memory(self):
+        self._buffers = {}
+        for shared_memory in self._shared_memory:
+            try:
+                shared_memory.close()
+            except BufferError:
+                # Arrays still viewing it keep it mapped until they're freed
+                pass
+            shared_memory.unlink()
+        self._shared_memory = []
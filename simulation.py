@@ -1,22 +1,103 @@
 import numpy as np
+import errors
 from point_object import PointObject
 from center_object import CenterObject
 from space_event import SpaceEvent
 from simulation_output import SimulationOutput
+from simulation_chunk import SimulationChunk
+import itertools
 from copy import copy
+from typing import Iterator
+from body_table import BodyTable
+from integrators import INTEGRATORS, PROPAGATORS
+from kepler import propagate_kepler, pericenter_distances, orbital_periods
+from neighbour_search import (NEIGHBOUR_SEARCHES, CLOSE_CALL_DEDUPES,
+                              find_duplicate_points)
+from shard_pool import ShardPool
+from profiler import profiled
+from checkpoint import Checkpoint, CheckpointWriter
+from progress import ProgressReporter
+
+# Numbers telling runs of iterate() apart, for reusing neighbour searches
+_run_ids = itertools.count()
 
 
 class Simulation:
     def __init__(self, meters_per_pixel: float, close_call_distance: float,
-                 center_obj: CenterObject, point_objs: list[PointObject]):
+                 center_obj: CenterObject, point_objs: list[PointObject],
+                 neighbour_search: str = "grid", close_call_dedupe: str = "step",
+                 integrator: str = "euler", time_step: float = 1.0,
+                 adaptive_time_step: bool = False, propagator: str = "numeric",
+                 workers: int = 1, stop_on_collision: bool = False,
+                 stop_at_live_bodies: int = 0, point_obj_groups: list[int] = None):
+        """
+        Neighbour search is the name of the index used to find close calls, one of
+        NEIGHBOUR_SEARCHES. Collisions are found by find_duplicate_points().
+        Close call dedupe decides when a group of objects is reported again -
+        "step" reports it once per step it occurs in, "run" only the first time.
+        Integrator is the name of the method advancing objects, one of INTEGRATORS.
+        Time step is the simulated time of one step in seconds. With adaptive time
+        step each step is split into smaller sub-steps for objects close enough
+        to the center object to need them, output stays one entry per step.
+        Propagator is "numeric" to integrate the motion step by step, or "kepler"
+        to place objects on their exact two-body orbits at every step, in which case
+        the time step only sets how often the orbits are sampled.
+        Workers is the amount of processes point objects are moved in. With more
+        than one, objects are split into shards advanced in parallel a block of
+        steps at a time, while collisions and close calls are still checked
+        here, step by step, so the output is the same.
+        The run stops before all steps are done after the step with its first
+        collision, if stop on collision is set, or once at most stop at live
+        bodies point objects haven't collided yet - by default when none are left.
+        Point object groups optionally label each point object with an integer,
+        objects from different groups never collide or have close calls with each
+        other. It lets independent simulations sharing a center object run as one.
+        """
         self._meters_per_pixel = meters_per_pixel
         self._close_call_distance = close_call_distance
+        if neighbour_search not in NEIGHBOUR_SEARCHES:
+            raise errors.InvalidNeighbourSearchError
+        self._neighbour_search = NEIGHBOUR_SEARCHES[neighbour_search]
+        self._neighbour_search.check_available()
+        if close_call_dedupe not in CLOSE_CALL_DEDUPES:
+            raise errors.InvalidCloseCallDedupeError
+        self._close_call_dedupe = close_call_dedupe
+        if integrator not in INTEGRATORS:
+            raise errors.InvalidIntegratorError
+        self._integrator = INTEGRATORS[integrator]()
 
         self._center_obj = center_obj
         self._point_objs = point_objs
+        self._point_obj_groups = None
+        if point_obj_groups is not None:
+            self._point_obj_groups = np.asarray(point_obj_groups, dtype=np.int64)
 
         self._G_CONST = 6.67430e-11
-        self._TIME_STEP = 1.0
+        if time_step <= 0:
+            raise errors.InvalidTimeStepError
+        self._time_step = time_step
+        self._adaptive_time_step = adaptive_time_step
+        if propagator not in PROPAGATORS:
+            raise errors.InvalidPropagatorError
+        self._propagator = propagator
+        if type(workers) is not int or workers < 1:
+            raise errors.InvalidWorkersError
+        self._workers = workers
+        if type(stop_on_collision) is not bool:
+            raise errors.InvalidStopOnCollisionError
+        self._stop_on_collision = stop_on_collision
+        if type(stop_at_live_bodies) is not int or stop_at_live_bodies < 0:
+            raise errors.InvalidStopAtLiveBodiesError
+        self._stop_at_live_bodies = stop_at_live_bodies
+        # Sub-step is at most this fraction of an object's dynamical time
+        self._ADAPTIVE_ACCURACY = 0.01
+        # A step is split into at most 2 ** _MAX_SUBSTEP_LEVEL sub-steps
+        self._MAX_SUBSTEP_LEVEL = 12
+        # Default amount of positions in a chunk yielded by iterate()
+        self._CHUNK_POSITIONS = 2**20
+        # Run id and step of the last close call check with the neighbour search
+        # over the positions after it, which are the positions before the next step
+        self._close_call_search = None
 
     @property
     def center_obj(self) -> CenterObject:
@@ -26,29 +107,183 @@ class Simulation:
     def point_objs(self) -> list[PointObject]:
         return self._point_objs
 
+    def _calculate_accelerations(self, positions: np.ndarray,
+                                 masses: np.ndarray) -> np.ndarray:
+        """
+        Calculate the acceleration vectors (m/s) of all objects with the given
+        (n, 2) positions and (n,) masses.
+        """
+        dist_vectors = self._center_obj.position - positions
+        dist = np.sqrt(np.einsum("ij,ij->i", dist_vectors, dist_vectors))
+        dist_norm = dist_vectors / dist[:, np.newaxis]
+
+        force = (self._center_obj.mass * masses * self._G_CONST) / (dist**2)
+        force_vectors = force[:, np.newaxis] * dist_norm
+        accel_vectors = force_vectors / masses[:, np.newaxis]
+
+        return accel_vectors
+
     def _calculate_acceleration(self, point_obj: PointObject) -> np.array:
         """Calculate the acceleration vector (m/s) based on the current values"""
-        dist_vector = self._center_obj.position - point_obj.position
-        dist = np.linalg.norm(dist_vector)
-        dist_norm = dist_vector / dist
+        return self._calculate_accelerations(point_obj.position[np.newaxis],
+                                             np.array([point_obj.mass]))[0]
+
+    def _calculate_next_batch(self, positions: np.ndarray, velocities: np.ndarray,
+                              masses: np.ndarray,
+                              time_step: float = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Runs a single simulation step (or a sub-step of the given length) for all
+        of the given objects at once with the chosen integrator.
+        Returns the new positions and velocities without modifying the inputs.
+        """
+        return self._integrator.step(
+            positions, velocities,
+            lambda at_positions: self._calculate_accelerations(at_positions, masses),
+            self._time_step if time_step is None else time_step)
+
+    def _calculate_substep_levels(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Returns for every position the level of sub-stepping it needs - a step
+        is split into 2 ** level sub-steps, each short enough compared to the
+        dynamical time (the time scale of an orbit) at the object's distance.
+        """
+        dist_vectors = self._center_obj.position - positions
+        dist = np.sqrt(np.einsum("ij,ij->i", dist_vectors, dist_vectors))
+        with np.errstate(divide="ignore"):
+            dynamical_time = np.sqrt(dist**3 / (self._G_CONST * self._center_obj.mass))
+            substeps = self._time_step / (self._ADAPTIVE_ACCURACY * dynamical_time)
+            levels = np.ceil(np.log2(np.maximum(substeps, 1.0)))
+        return np.clip(np.nan_to_num(levels, nan=self._MAX_SUBSTEP_LEVEL), 0,
+                       self._MAX_SUBSTEP_LEVEL).astype(int)
 
-        force = (self._center_obj.mass * point_obj.mass * self._G_CONST) / (dist**2)
-        force_vector = force * dist_norm
-        accel_vector = force_vector / point_obj.mass
+    @profiled("simulation.integrate", lambda self, positions, *_: len(positions))
+    def _advance(self, positions: np.ndarray, velocities: np.ndarray,
+                 masses: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Advances the given objects by one step. Returns their new positions,
+        velocities and a mask of objects, which hit the center object.
+        With adaptive time step objects are grouped by sub-step level and an object
+        stops moving at the sub-step in which it hits the center object.
+        """
+        if not self._adaptive_time_step:
+            new_positions, new_velocities = self._calculate_next_batch(
+                positions, velocities, masses)
+            return (new_positions, new_velocities,
+                    self._check_for_center_obj_collisions(new_positions))
 
-        return accel_vector
+        new_positions = positions.copy()
+        new_velocities = velocities.copy()
+        hit_center = np.zeros(len(positions), dtype=bool)
+        levels = self._calculate_substep_levels(positions)
+        for level in np.unique(levels).tolist():
+            group = np.flatnonzero(levels == level)
+            substep = self._time_step / 2**level
+            for _ in range(2**level):
+                moving = group[~hit_center[group]]
+                moved_positions, moved_velocities = self._calculate_next_batch(
+                    new_positions[moving], new_velocities[moving], masses[moving],
+                    substep)
+                new_positions[moving] = moved_positions
+                new_velocities[moving] = moved_velocities
+                hit_center[moving] = self._check_for_center_obj_collisions(
+                    new_positions[moving])
+        return new_positions, new_velocities, hit_center
 
     def _calculate_next(self, point_obj: PointObject) -> np.array:
         """
         Runs a single simulation step for a PointObject. Doesn't modify
-        the point object. Returns the new position.
+        the point object's position, only its velocity. Returns the new position.
         """
-        accel_vector = self._calculate_acceleration(point_obj)
+        new_positions, new_velocities = self._calculate_next_batch(
+            point_obj.position[np.newaxis], point_obj.velocity[np.newaxis],
+            np.array([point_obj.mass]))
+        point_obj.set_velocity(new_velocities[0])
+        return new_positions[0]
 
-        point_obj.set_velocity(point_obj.velocity + (accel_vector * self._TIME_STEP))
-        new_position = point_obj.position + (point_obj.velocity * self._TIME_STEP)
+    @profiled("simulation.kepler", lambda self, start_positions, *_: len(start_positions))
+    def _advance_kepler(self, start_positions: np.ndarray, start_velocities: np.ndarray,
+                        positions: np.ndarray, velocities: np.ndarray,
+                        elapsed: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Places the given objects on their two-body orbits elapsed seconds after
+        the start state. Returns their new positions, velocities and a mask of
+        objects, which hit the center object - are inside it, or passed a
+        pericenter inside it since the current positions and velocities.
+        """
+        mu = self._G_CONST * self._center_obj.mass
+        # Orbits are solved relative to the center object
+        center = self._center_obj.position
+        new_positions, new_velocities = propagate_kepler(
+            start_positions - center, start_velocities, mu, elapsed)
+        new_positions += center
 
-        return new_position
+        relative_positions = positions - center
+        was_approaching = np.einsum("ij,ij->i", relative_positions, velocities) < 0
+        now_receding = np.einsum("ij,ij->i", new_positions - center, new_velocities) > 0
+        periods = orbital_periods(relative_positions, velocities, mu)
+        whole_orbit = periods <= self._time_step
+        dives_into_center = (pericenter_distances(relative_positions, velocities, mu)
+                             <= self._center_obj.diameter / 2)
+        hit_center = (self._check_for_center_obj_collisions(new_positions)
+                      | (dives_into_center
+                         & ((was_approaching & now_receding) | whole_orbit)))
+        return new_positions, new_velocities, hit_center
+
+    def _advance_block(self, buffers: dict[str, np.ndarray], start: int, stop: int,
+                       first_step: int, block_steps: int):
+        """
+        Advances objects start:stop of the shared buffers by block_steps steps,
+        starting at first_step. Runs in the worker processes of a ShardPool.
+        Objects never affect each other's motion, so a shard can be moved without
+        knowing about collisions between objects - it only skips objects, which
+        were stopped before the block or hit the center object during it.
+        The state after each step is written to the block buffers.
+        """
+        positions = buffers["positions"][start:stop]
+        velocities = buffers["velocities"][start:stop]
+        masses = buffers["masses"][start:stop]
+        stopped = buffers["stopped"][start:stop]
+        for row in range(block_steps):
+            moving = np.flatnonzero(~stopped)
+            if self._propagator == "kepler":
+                new_positions, new_velocities, hit_center = self._advance_kepler(
+                    buffers["start_positions"][start:stop][moving],
+                    buffers["start_velocities"][start:stop][moving],
+                    positions[moving], velocities[moving],
+                    (first_step + row + 1) * self._time_step)
+            else:
+                new_positions, new_velocities, hit_center = self._advance(
+                    positions[moving], velocities[moving], masses[moving])
+            velocities[moving] = new_velocities
+            positions[moving[~hit_center]] = new_positions[~hit_center]
+            stopped[moving[hit_center]] = True
+            buffers["block_positions"][row, start:stop] = positions
+            buffers["block_velocities"][row, start:stop] = velocities
+            block_hit_center = buffers["block_hit_center"][row, start:stop]
+            block_hit_center[:] = False
+            block_hit_center[moving[hit_center]] = True
+
+    def _find_shard_close_calls(self, buffers: dict[str, np.ndarray], start: int,
+                                stop: int, run_id: int, step: int) -> list[list[int]]:
+        """
+        Returns the close call groups of the active objects start:stop of the shared
+        buffers, found while advancing them from the old to the new positions.
+        Runs in the worker processes of a ShardPool, together the shards give
+        the same groups in the same order as _find_close_calls() for all objects.
+        """
+        active = np.zeros(len(buffers["active"]), dtype=bool)
+        active[start:stop] = buffers["active"][start:stop]
+        return self._find_close_calls(buffers["old_positions"], buffers["new_positions"],
+                                      active, (run_id, step))
+
+    def _check_for_center_obj_collisions(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Returns a boolean mask of the given (n, 2) positions, which are colliding
+        with the center object - closer to it than the center object's radius.
+        """
+        dist_vectors = self._center_obj.position - positions
+        dist_to_center = np.sqrt(np.einsum("ij,ij->i", dist_vectors, dist_vectors))
+        return dist_to_center <= self._center_obj.diameter / 2
 
     def _check_for_center_obj_collision(self, position: np.array) -> bool:
         """
@@ -56,79 +291,345 @@ class Simulation:
         with the center object - if the distance between them is smaller than the
         center object's radius.
         """
-        dist_to_center = np.linalg.norm(self._center_obj.position - position)
-        return dist_to_center <= self._center_obj.diameter / 2
+        return bool(self._check_for_center_obj_collisions(position[np.newaxis])[0])
 
-    def _check_for_collisions(self, positions: list[np.array]) -> list[int]:
+    @profiled("simulation.collisions", lambda self, positions, *_: len(positions))
+    def _check_for_collisions(self, positions: list[np.array],
+                              groups: np.ndarray = None) -> list[int]:
         """
         Gets a list of positions of point objects and returns indexes of ones,
         which are currently colliding.
         Since a collision is defined as two objects on the same pixel this
         converts the space positions to positions in pixel space and
         checks for duplicates.
+        Position of (np.nan, np.nan) marks a point object as already having
+        collided before, it's never reported again.
+        Only objects with the same group label (if given) can collide.
         """
-        pixel_positions = []
-        for pos in positions:
-            # np.nan is used to mark a point object as already having collided before,
-            # so there is no need to run any calculations for it.
-            if pos is not np.nan:
-                pixel_positions.append((pos / self._meters_per_pixel).round())
-            else:
-                pixel_positions.append(np.array([np.nan, np.nan]))
+        pixel_positions = (np.asarray(positions, dtype=float).reshape(-1, 2)
+                           / self._meters_per_pixel).round()
+        finite_x = pixel_positions[np.isfinite(pixel_positions).all(axis=1), 0]
+        if groups is not None and len(finite_x) > 0:
+            # Each group is moved in pixel space past all the others
+            span = finite_x.max() - finite_x.min() + 1
+            pixel_positions[:, 0] += np.asarray(groups) * span
+        return find_duplicate_points(pixel_positions).tolist()
+
+    def _close_call_searches(self, old_positions: np.ndarray, new_positions: np.ndarray,
+                             run_step: tuple[int, int] = None) -> tuple:
+        """
+        Returns the neighbour searches over old_positions and new_positions.
+        Run step is the run id and the step of the check, the search over the new
+        positions of one step is reused for the old positions of the next one.
+        """
+        if (run_step is not None and self._close_call_search is not None
+            and self._close_call_search[0] == (run_step[0], run_step[1] - 1)):
+            old_search = self._close_call_search[1]
+        else:
+            old_search = self._neighbour_search(old_positions, self._close_call_distance)
+        if run_step is not None:
+            # The search keeps the positions, they mustn't change with the next step
+            new_positions = new_positions.copy()
+        new_search = self._neighbour_search(new_positions, self._close_call_distance)
+        if run_step is not None:
+            self._close_call_search = (run_step, new_search)
+        return old_search, new_search
+
+    @profiled("simulation.close_calls",
+              lambda self, old_positions, new_positions, active, *_: int(active.sum()))
+    def _find_close_calls(self, old_positions: np.ndarray, new_positions: np.ndarray,
+                          active: np.ndarray,
+                          run_step: tuple[int, int] = None) -> list[list[int]]:
+        """
+        Returns the close call groups found while advancing the active objects
+        from old_positions to new_positions. Objects are processed in index order,
+        so when an object is checked all objects with a lower index have already
+        been moved and all objects with a higher index have not. Objects, which
+        already collided stay where they collided and are still checked against.
+        Each group is the sorted list of indexes of an active object and all objects
+        within close call distance of it.
+        Only objects found by the neighbour search are compared and, if point objects
+        are grouped, only ones in the same group. Run step lets the neighbour search
+        be reused by the next step, see _close_call_searches().
+        """
+        active_indexes = np.flatnonzero(active)
+        # Without anything to compare no search has to be built
+        if len(active_indexes) == 0 or len(old_positions) < 2:
+            return []
+        queries = old_positions[active_indexes]
+        old_search, new_search = self._close_call_searches(old_positions, new_positions,
+                                                           run_step)
+
+        # Objects with a higher index are seen at their old position...
+        query_old, others_old = old_search.query_pairs(queries,
+                                                       self._close_call_distance)
+        indexes_old = active_indexes[query_old]
+        later = others_old > indexes_old
+
+        # ...and ones with a lower index at their new position
+        query_new, others_new = new_search.query_pairs(queries,
+                                                       self._close_call_distance)
+        indexes_new = active_indexes[query_new]
+        earlier = others_new < indexes_new
 
-        _, inverse, count = np.unique(pixel_positions, return_inverse=True,
-                                      return_counts=True, axis=0)
-        duplicate_indexes = np.where(count[inverse] > 1)[0]
-        return duplicate_indexes.tolist()
+        indexes = np.concatenate((indexes_old[later], indexes_new[earlier]))
+        others = np.concatenate((others_old[later], others_new[earlier]))
+        if self._point_obj_groups is not None:
+            same_group = self._point_obj_groups[indexes] == self._point_obj_groups[others]
+            indexes = indexes[same_group]
+            others = others[same_group]
+        if len(indexes) == 0:
+            return []
+
+        # Every group also contains the object it was found for
+        with_close_calls = np.unique(indexes)
+        indexes = np.concatenate((indexes, with_close_calls))
+        others = np.concatenate((others, with_close_calls))
+        order = np.lexsort((others, indexes))
+        bounds = np.searchsorted(indexes[order], with_close_calls[1:])
+        return [group.tolist() for group in np.split(others[order], bounds)]
 
     def _check_for_close_calls(self, point_obj: PointObject) -> list[int]:
         """
         Returns a list of indexes of point objects, which are within close call distance
         """
-        close_call_indexes = []
-        for index, obj in enumerate(self._point_objs):
-            dist = np.linalg.norm(obj.position - point_obj.position)
-            if dist <= self._close_call_distance and obj != point_obj:
-                close_call_indexes.append(index)
-        return close_call_indexes
+        positions = np.array([obj.position for obj in self._point_objs], dtype=float)
+        _, indexes = self._neighbour_search(
+            positions, self._close_call_distance).query_pairs(
+            point_obj.position, self._close_call_distance)
+        return sorted(index for index in indexes.tolist()
+                      if self._point_objs[index] is not point_obj)
+
+    def iterate(self, steps: int, chunk_size: int = None,
+                checkpoint_writer: CheckpointWriter = None,
+                resume_from: Checkpoint = None,
+                progress_reporter: ProgressReporter = None) -> Iterator[SimulationChunk]:
+        """
+        Runs the simulation for the given amount of steps, yielding its output as
+        chunks of at most chunk_size steps each (by default about a million
+        positions per chunk), so memory use doesn't depend on the amount of steps.
+        The first chunk starts with the starting positions.
+        All point objects are advanced together on contiguous arrays and their
+        state is written back into the PointObject instances once the run ends
+        or the generator is closed.
+        With a checkpoint writer, a checkpoint is saved whenever it's due, right
+        after the chunk with its step has been handed over (a chunk ends early
+        for it). Resuming from a checkpoint continues the run from its step,
+        the first chunk then starts with the positions at that step and only
+        the events after it are yielded.
+        With a progress reporter, progress is reported whenever it's due and
+        once more after the last chunk has been handed over.
+        Once a stop condition is met, the last chunk ends with the step, after
+        which it was met, so there are fewer steps than requested.
+        """
+        table = BodyTable.from_point_objects(self._point_objs)
+        positions = table.positions
+        velocities = table.velocities
+        masses = table.masses
+        alive = np.ones(len(table), dtype=bool)  # False once an object has collided
+        start_positions = positions.copy()
+        start_velocities = velocities.copy()
+        first_step = 0
+        reported_close_calls = set()  # Groups of indexes already reported
+        # Events handed over so far, they're all part of each checkpoint
+        past_collisions = []
+        past_close_calls = []
+        # Amounts of events handed over so far, for the progress reporter
+        yielded_collisions = yielded_close_calls = 0
+        if resume_from is not None:
+            if resume_from.point_obj_amount != len(table) or resume_from.step > steps:
+                raise errors.CheckpointMismatchError
+            positions[:] = resume_from.positions
+            velocities[:] = resume_from.velocities
+            alive[:] = resume_from.alive
+            start_positions[:] = resume_from.start_positions
+            start_velocities[:] = resume_from.start_velocities
+            first_step = resume_from.step
+            reported_close_calls.update(resume_from.reported_close_calls)
+            yielded_collisions = len(resume_from.collisions)
+            yielded_close_calls = len(resume_from.close_calls)
+            if checkpoint_writer is not None:
+                past_collisions = resume_from.collisions
+                past_close_calls = resume_from.close_calls
+        if chunk_size is None:
+            chunk_size = max(1, self._CHUNK_POSITIONS // max(len(table), 1))
+        # Both stop conditions come down to the amount of objects still alive,
+        # the first collision of the run is the first time it drops
+        live_amount = int(np.count_nonzero(alive))
+        stop_live_amount = self._stop_at_live_bodies
+        if self._stop_on_collision:
+            stop_live_amount = max(stop_live_amount, live_amount - 1)
+
+        run_id = next(_run_ids)
+        shard_pool = None
+        if self._workers > 1 and len(table) > 1 and steps > first_step:
+            # Workers get a copy without point objects, they only need the settings
+            worker_simulation = copy(self)
+            worker_simulation._point_objs = []
+            worker_simulation._close_call_search = None
+            block_steps = min(steps - first_step,
+                              max(1, self._CHUNK_POSITIONS // len(table)))
+            shard_pool = ShardPool({
+                "block": worker_simulation._advance_block,
+                "close_calls": worker_simulation._find_shard_close_calls
+            }, {
+                "positions": positions, "velocities": velocities, "masses": masses,
+                "start_positions": start_positions,
+                "start_velocities": start_velocities,
+                "stopped": np.zeros(len(table), dtype=bool),
+                "block_positions": np.empty((block_steps, len(table), 2)),
+                "block_velocities": np.empty((block_steps, len(table), 2)),
+                "block_hit_center": np.empty((block_steps, len(table)), dtype=bool),
+                # Close calls of each step are looked for by the workers too
+                "old_positions": positions, "new_positions": positions,
+                "active": alive
+            }, len(table), self._workers)
+            block_start = block_end = first_step
+
+        chunk = SimulationChunk(
+            first_step,
+            np.empty((min(chunk_size, steps - first_step + 1), len(table), 2)), [], [])
+        chunk.positions[0] = np.nan
+        chunk.positions[0][alive] = positions[alive]
+        chunk_filled = 1
+        try:
+            for step in range(first_step, steps):
+                if live_amount <= stop_live_amount:
+                    break
+                checkpoint_due = (checkpoint_writer is not None
+                                  and checkpoint_writer.due(step) and step > first_step)
+                if chunk_filled == len(chunk.positions) or checkpoint_due:
+                    chunk.positions = chunk.positions[:chunk_filled]
+                    yield chunk
+                    yielded_collisions += len(chunk.collisions)
+                    yielded_close_calls += len(chunk.close_calls)
+                    if checkpoint_writer is not None:
+                        past_collisions.extend(chunk.collisions)
+                        past_close_calls.extend(chunk.close_calls)
+                    if checkpoint_due:
+                        checkpoint_writer.save(Checkpoint(
+                            step, positions, velocities, alive, start_positions,
+                            start_velocities, past_collisions, past_close_calls,
+                            reported_close_calls))
+                    chunk = SimulationChunk(
+                        step + 1,
+                        np.empty((min(chunk_size, steps - step), len(table), 2)), [], [])
+                    chunk_filled = 0
 
-    def run(self, steps: int) -> SimulationOutput:
+                # Only objects, which are still alive can collide
+                live_indexes = np.flatnonzero(alive)
+                live_groups = (None if self._point_obj_groups is None
+                               else self._point_obj_groups[live_indexes])
+                indexes = live_indexes[self._check_for_collisions(
+                    positions[live_indexes], live_groups)].tolist()
+                if len(indexes) > 0:
+                    chunk.collisions.append(SpaceEvent(step, indexes))
+                alive[indexes] = False
+                live_amount -= len(indexes)
+
+                old_positions = positions.copy()
+                if shard_pool is not None:
+                    buffers = shard_pool.buffers
+                    buffers["old_positions"][:] = old_positions
+                    if step == block_end:
+                        # Objects, which collided don't have to be moved anymore
+                        buffers["stopped"][~alive] = True
+                        block_start = step
+                        block_end = min(steps, step + block_steps)
+                        shard_pool.run("block", block_start, block_end - block_start)
+                    row = step - block_start
+                    new_positions = buffers["block_positions"][row][alive]
+                    new_velocities = buffers["block_velocities"][row][alive]
+                    hit_center = buffers["block_hit_center"][row][alive]
+                    del buffers
+                elif self._propagator == "kepler":
+                    new_positions, new_velocities, hit_center = self._advance_kepler(
+                        start_positions[alive], start_velocities[alive],
+                        positions[alive], velocities[alive], (step + 1) * self._time_step)
+                else:
+                    new_positions, new_velocities, hit_center = self._advance(
+                        positions[alive], velocities[alive], masses[alive])
+                # Velocity is updated even if the object hits the center object,
+                # its position stays at the last one before the collision
+                velocities[alive] = new_velocities
+                moving = np.flatnonzero(alive)
+                positions[moving[~hit_center]] = new_positions[~hit_center]
+
+                if self._close_call_dedupe == "step":
+                    reported_close_calls.clear()
+                if shard_pool is not None:
+                    # Each worker looks for the close calls of its shard's objects
+                    buffers = shard_pool.buffers
+                    buffers["new_positions"][:] = positions
+                    buffers["active"][:] = alive
+                    del buffers
+                    close_calls = [group for groups in shard_pool.run("close_calls",
+                                                                      run_id, step)
+                                   for group in groups]
+                else:
+                    close_calls = self._find_close_calls(old_positions, positions, alive,
+                                                         (run_id, step))
+                for cc_for_obj in close_calls:
+                    cc_key = tuple(cc_for_obj)
+                    if cc_key not in reported_close_calls:
+                        reported_close_calls.add(cc_key)
+                        chunk.close_calls.append(SpaceEvent(step, cc_for_obj))
+
+                hit_indexes = moving[hit_center]
+                for index in hit_indexes.tolist():
+                    chunk.collisions.append(SpaceEvent(step, [index]))
+                alive[hit_indexes] = False
+                live_amount -= len(hit_indexes)
+
+                # Position of (np.nan, np.nan) indicates an object has already collided
+                step_positions = chunk.positions[chunk_filled]
+                step_positions[:] = np.nan
+                step_positions[alive] = positions[alive]
+                chunk_filled += 1
+                if progress_reporter is not None and progress_reporter.due(step + 1):
+                    progress_reporter.report(
+                        step + 1, steps, live_amount,
+                        yielded_collisions + len(chunk.collisions),
+                        yielded_close_calls + len(chunk.close_calls))
+            # The chunk isn't full, if the run stopped early
+            chunk.positions = chunk.positions[:chunk_filled]
+            yield chunk
+            if progress_reporter is not None:
+                progress_reporter.report(
+                    chunk.end_step - 1, steps, live_amount,
+                    yielded_collisions + len(chunk.collisions),
+                    yielded_close_calls + len(chunk.close_calls), final=True)
+        finally:
+            if shard_pool is not None:
+                shard_pool.close()
+            if progress_reporter is not None:
+                progress_reporter.close()
+            table.sync_to_point_objects(self._point_objs)
+            self._close_call_search = None
+
+    def run(self, steps: int, dtype: type = np.float64,
+            checkpoint_writer: CheckpointWriter = None,
+            resume_from: Checkpoint = None,
+            progress_reporter: ProgressReporter = None) -> SimulationOutput:
         """
         Runs the simulation for the given amount of steps.
-        Returns a tuple, where the first element is a list of point objects' position
-        per step (for example the position of the third object at the second step
-        would be run()[0][1][2]) and the second is a list of collisions, which occured.
-        """
-        sim_steps = [[copy(obj.position) for obj in self._point_objs]]
-        collisions = []
-        close_calls = []
-        blacklist = []  # List of indexes of objects, which have already collided
-        for step in range(steps):
-            indexes = self._check_for_collisions(sim_steps[-1])
-            if len(indexes) > 0:
-                collisions.append(SpaceEvent(step, indexes))
-            blacklist.extend(indexes)
-
-            # Position of (np.nan, np.nan) indicates an object has already collided
-            # It's overridden with the next position if an object's index is
-            # not in the blacklist
-            positions = [np.array([np.nan, np.nan])] * len(self._point_objs)
-            for index in range(len(self._point_objs)):
-                if index not in blacklist:
-                    cc_for_obj = self._check_for_close_calls(self._point_objs[index])
-                    if len(cc_for_obj) > 0:
-                        cc_for_obj.append(index)
-                        cc_for_obj.sort()
-                        cc_event = SpaceEvent(step, sorted(cc_for_obj))
-                        if cc_event not in close_calls:
-                            close_calls.append(cc_event)
-                    pos = self._calculate_next(self._point_objs[index])
-                    if self._check_for_center_obj_collision(pos):
-                        collisions.append(SpaceEvent(step, [index]))
-                        blacklist.append(index)
-                    else:
-                        positions[index] = pos
-                        self._point_objs[index].set_position(pos)
-
-            sim_steps.append(positions)
-        return SimulationOutput(sim_steps, collisions, close_calls)
+        Returns the output, where simulation_steps is a (steps + 1, n, 2) array of
+        point objects' position per step with the given float dtype (for example
+        the position of the third object at the second step would be run()[0][1][2])
+        and the rest are the collisions and close calls, which occured.
+        Keeps the whole output in memory, use iterate() to process it in chunks.
+        Checkpoints are saved and resumed like in iterate(), when resuming the
+        positions of steps before the checkpoint aren't known, so they're np.nan,
+        but the output contains all events. Progress is reported like in iterate().
+        If the run stops early, the output only contains the steps done.
+        """
+        output = SimulationOutput.allocate(steps, len(self._point_objs), dtype)
+        if resume_from is not None:
+            output.add_events(resume_from.collisions, resume_from.close_calls)
+        for chunk in self.iterate(steps, None, checkpoint_writer, resume_from,
+                                  progress_reporter):
+            output.simulation_steps[chunk.start_step:chunk.end_step] = chunk.positions
+            output.add_events(chunk.collisions, chunk.close_calls)
+        if chunk.end_step <= steps:
+            output.truncate(chunk.end_step - 1)
+        return output
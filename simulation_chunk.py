@@ -0,0 +1,20 @@
+import numpy as np
+from dataclasses import dataclass
+from space_event import SpaceEvent
+
+
+@dataclass
+class SimulationChunk:
+    # Index of the first step in this chunk, step 0 holds the starting positions
+    start_step: int
+    # Positions of each point object in each step of the chunk as a (k, n, 2) array,
+    # (np.nan, np.nan) for objects, which have already collided
+    positions: np.ndarray
+    # Events, which led to the steps in this chunk
+    collisions: list[SpaceEvent]
+    close_calls: list[SpaceEvent]
+
+    @property
+    def end_step(self) -> int:
+        """Index of the step after the last one in this chunk."""
+        return self.start_step + len(self.positions)
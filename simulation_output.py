@@ -1,11 +1,106 @@
 import numpy as np
-from dataclasses import dataclass
 from space_event import SpaceEvent
 
+# One row per point object taking part in an event, rows of the same event share
+# the event number
+EVENT_DTYPE = np.dtype([("step", np.int64), ("event", np.int64),
+                        ("point_obj_index", np.int64)])
+
 
-@dataclass
 class SimulationOutput:
-    # List of positions for each point object in each step
-    simulation_steps: list[list[np.array]]
-    collisions: list[SpaceEvent]
-    close_calls: list[SpaceEvent]
+    def __init__(self, simulation_steps: np.ndarray, collisions: list[SpaceEvent],
+                 close_calls: list[SpaceEvent]):
+        """
+        Simulation steps are the positions of each point object in each step,
+        as a (steps + 1, n, 2) array or anything convertible to one. Objects, which
+        have already collided are at (np.nan, np.nan). Events are stored as
+        structured arrays of EVENT_DTYPE.
+        """
+        simulation_steps = np.asarray(simulation_steps)
+        if simulation_steps.dtype not in (np.float32, np.float64):
+            simulation_steps = simulation_steps.astype(float)
+        self._simulation_steps = simulation_steps.reshape(len(simulation_steps), -1, 2)
+        self._collision_records = self.events_to_records(collisions)
+        self._close_call_records = self.events_to_records(close_calls)
+
+    @classmethod
+    def allocate(cls, steps: int, point_obj_amount: int, dtype: type = np.float64):
+        """
+        Creates an output with room for the given amount of steps (plus the
+        starting positions) filled with np.nan, to be filled in place.
+        """
+        return cls(np.full((steps + 1, point_obj_amount, 2), np.nan, dtype=dtype), [], [])
+
+    @property
+    def simulation_steps(self) -> np.ndarray:
+        return self._simulation_steps
+
+    @property
+    def collisions(self) -> list[SpaceEvent]:
+        return self.records_to_events(self._collision_records)
+
+    @property
+    def close_calls(self) -> list[SpaceEvent]:
+        return self.records_to_events(self._close_call_records)
+
+    @property
+    def collision_records(self) -> np.ndarray:
+        return self._collision_records
+
+    @property
+    def close_call_records(self) -> np.ndarray:
+        return self._close_call_records
+
+    def add_events(self, collisions: list[SpaceEvent], close_calls: list[SpaceEvent]):
+        """Appends the given events to the ones already stored."""
+        self._collision_records = self._append_records(self._collision_records,
+                                                       collisions)
+        self._close_call_records = self._append_records(self._close_call_records,
+                                                        close_calls)
+
+    def truncate(self, steps: int):
+        """Drops everything after the given amount of steps."""
+        self._simulation_steps = self._simulation_steps[:steps + 1]
+
+    def __getitem__(self, index: int):
+        """
+        Allows the tuple-like access of run()[0][step][obj] - simulation steps,
+        collisions and close calls in that order.
+        """
+        return (self.simulation_steps, self.collisions, self.close_calls)[index]
+
+    def __iter__(self):
+        return iter((self.simulation_steps, self.collisions, self.close_calls))
+
+    @classmethod
+    def _append_records(cls, records: np.ndarray,
+                        events: list[SpaceEvent]) -> np.ndarray:
+        """Returns the records with the given events appended, numbered after them."""
+        if len(events) == 0:
+            return records
+        new_records = cls.events_to_records(events)
+        if len(records) > 0:
+            new_records["event"] += records["event"][-1] + 1
+        return np.concatenate((records, new_records))
+
+    @staticmethod
+    def events_to_records(events: list[SpaceEvent]) -> np.ndarray:
+        """Converts a list of events to a structured array of EVENT_DTYPE."""
+        sizes = [len(event.point_obj_indexes) for event in events]
+        records = np.empty(sum(sizes), dtype=EVENT_DTYPE)
+        records["step"] = np.repeat([event.step for event in events], sizes)
+        records["event"] = np.repeat(np.arange(len(events)), sizes)
+        records["point_obj_index"] = [index for event in events
+                                      for index in event.point_obj_indexes]
+        return records
+
+    @staticmethod
+    def records_to_events(records: np.ndarray) -> list[SpaceEvent]:
+        """Converts a structured array of EVENT_DTYPE back to a list of events."""
+        if len(records) == 0:
+            return []
+        bounds = np.flatnonzero(np.diff(records["event"])) + 1
+        steps = records["step"][np.concatenate(([0], bounds))].tolist()
+        indexes = np.split(records["point_obj_index"], bounds)
+        return [SpaceEvent(step, event_indexes.tolist())
+                for step, event_indexes in zip(steps, indexes)]
@@ -1,8 +1,16 @@
+import errors
 import numpy as np
+from pathlib import Path
 from PIL import Image, ImageDraw
 from point_object import PointObject
 from center_object import CenterObject
 from simulation_output import SimulationOutput
+from space_event import SpaceEvent
+from tile_pyramid import TilePyramid
+from profiler import profiled
+
+# Ways of mapping visit counts of a heatmap to colors
+HEATMAP_SCALINGS = ("log", "equalize")
 
 
 class SimulationVisualizer:
@@ -27,33 +35,204 @@ class SimulationVisualizer:
         Gets the simulation objects and a list of steps (most likely generated by
         Simulation.run() and returns an image, which shows the result of the simulation.
         """
+        output = self.new_image(center_obj)
+        self.draw_steps(output, simulation_steps)
+        self.draw_end_positions(output, point_objs)
+        return output
+
+    def new_image(self, center_obj: CenterObject) -> Image.Image:
+        """
+        Returns an image with only the center object drawn on it. Steps can be
+        drawn onto it incrementally with draw_steps().
+        """
         output = Image.new("RGB", self._resolution)
         draw_output = ImageDraw.Draw(output)
 
         pixel_radius = round((center_obj.diameter / 2) / self._meters_per_pixel)
-        img_center = [round(self._resolution[0] / 2), round(self._resolution[1] / 2)]
-        draw_output.circle(img_center, pixel_radius, fill=self._center_obj_color)
-
-        # Draw all steps of the simulation
-        for step in simulation_steps:
-            for obj_pos in step:
-                if obj_pos is not np.nan:
-                    corrected_pos = obj_pos * np.array([1, -1])
-                    # Y axis has to be inverted
-                    # This is because on the image it rises the lower it goes, which
-                    # is the opposite of how it works in 2D geometry
-                    pixel_pos = (corrected_pos / self._meters_per_pixel).round()
-                    draw_output.point(tuple(img_center + pixel_pos),
-                                      self._point_obj_color)
-
-        # Draw current positions of point objects
-        for obj in point_objs:
-            obj_pos = obj.position * np.array([1, -1])  # Invert Y axis
-            pos = img_center + (obj_pos / self._meters_per_pixel).round()
-            draw_output.point(tuple(pos), self._point_obj_end_color)
-
+        draw_output.circle(self._image_center(), pixel_radius,
+                           fill=self._center_obj_color)
         return output
 
+    @profiled("render.steps", lambda self, output, steps: np.size(steps) // 2)
+    def draw_steps(self, output: Image.Image, simulation_steps: list[list[np.array]]):
+        """
+        Draws the given steps onto an image created by new_image(). Steps can be
+        a whole simulation or a single chunk of it (SimulationChunk.positions).
+        """
+        positions = np.asarray(simulation_steps, dtype=float).reshape(-1, 2)
+        self._draw_points(output, positions, self._point_obj_color)
+
+    @profiled("render.end_positions", lambda self, output, point_objs: len(point_objs))
+    def draw_end_positions(self, output: Image.Image, point_objs: list[PointObject]):
+        """Draws current positions of point objects onto the image."""
+        positions = np.array([obj.position for obj in point_objs],
+                             dtype=float).reshape(-1, 2)
+        self._draw_points(output, positions, self._point_obj_end_color)
+
+    def new_heatmap(self) -> np.ndarray:
+        """
+        Returns an empty heatmap - a buffer of visit counts per pixel, indexed as
+        [y, x]. Steps can be accumulated onto it incrementally with
+        accumulate_steps() and it can be drawn with draw_heatmap().
+        """
+        return np.zeros((self._resolution[1], self._resolution[0]), dtype=np.int64)
+
+    @profiled("render.heatmap_steps", lambda self, heatmap, steps: np.size(steps) // 2)
+    def accumulate_steps(self, heatmap: np.ndarray,
+                         simulation_steps: list[list[np.array]]):
+        """
+        Adds a visit to each pixel of the heatmap for each position in the given
+        steps. Steps can be a whole simulation or a single chunk of it.
+        """
+        pixels = self._to_pixels(np.asarray(simulation_steps, dtype=float).reshape(-1, 2))
+        flat_heatmap = heatmap.reshape(-1)
+        flat_indexes = pixels[:, 1] * heatmap.shape[1] + pixels[:, 0]
+        # Counting the whole image at once only pays off when there are enough
+        # points, otherwise each visit is added separately
+        if len(flat_indexes) * 8 >= len(flat_heatmap):
+            flat_heatmap += np.bincount(flat_indexes, minlength=len(flat_heatmap))
+        else:
+            np.add.at(flat_heatmap, flat_indexes, 1)
+
+    @profiled("render.heatmap")
+    def draw_heatmap(self, output: Image.Image, heatmap: np.ndarray,
+                     scaling: str = "log"):
+        """
+        Draws the visited pixels of the heatmap onto an image created by new_image(),
+        from black for the least visited ones to the step color for the most
+        visited. Scaling is log (brightness grows with the logarithm of the visit
+        count) or equalize (each brightness level is shared by a similar amount of
+        pixels, so the whole range of colors is used).
+        """
+        if scaling not in HEATMAP_SCALINGS:
+            raise errors.InvalidHeatmapScalingError
+        visited = heatmap > 0
+        counts = heatmap[visited]
+        if len(counts) == 0:
+            return
+        if scaling == "log":
+            intensity = np.log1p(counts) / np.log1p(counts.max())
+        else:
+            _, level_indexes, level_sizes = np.unique(
+                counts, return_inverse=True, return_counts=True)
+            intensity = (np.cumsum(level_sizes) / len(counts))[level_indexes]
+
+        color = np.clip(self._point_obj_color, 0, 255)
+        colors = np.zeros(heatmap.shape + (3,), dtype=np.uint8)
+        colors[visited] = (intensity[:, np.newaxis] * color).round()
+        mask = visited.astype(np.uint8) * 255
+        output.paste(Image.fromarray(colors, "RGB"), (0, 0), Image.fromarray(mask))
+
+    def new_tile_pyramid(self, tile_size: int = 256) -> TilePyramid:
+        """
+        Returns an empty tile pyramid of the whole image. Steps can be binned
+        into it incrementally with bin_steps() and it can be saved with
+        export_tile_pyramid().
+        """
+        return TilePyramid(self._resolution, tile_size)
+
+    @profiled("render.tile_steps", lambda self, pyramid, steps: np.size(steps) // 2)
+    def bin_steps(self, pyramid: TilePyramid, simulation_steps: list[list[np.array]]):
+        """
+        Bins the pixels of the given steps into the tiles of the pyramid.
+        Steps can be a whole simulation or a single chunk of it.
+        """
+        positions = np.asarray(simulation_steps, dtype=float).reshape(-1, 2)
+        pyramid.add_pixels(self._to_pixels(positions))
+
+    @profiled("render.tiles")
+    def export_tile_pyramid(self, directory: Path, pyramid: TilePyramid,
+                            center_obj: CenterObject,
+                            point_objs: list[PointObject]) -> int:
+        """
+        Saves every tile of the pyramid, which has anything drawn on it, as
+        directory/level/x/y.png. Tiles of the last level look just like the
+        corresponding part of the image from draw(), every level before it is
+        zoomed out twice as much. Only one tile is held in memory at a time.
+        Returns the amount of saved tiles.
+        """
+        end_positions = np.array([obj.position for obj in point_objs],
+                                 dtype=float).reshape(-1, 2)
+        end_pixels = self._to_pixels(end_positions)
+        tile_size = pyramid.tile_size
+        saved_tiles = 0
+        for level in range(pyramid.levels):
+            shift = pyramid.level_shift(level)
+            level_resolution = pyramid.level_resolution(level)
+            center = np.array(self._image_center()) >> shift
+            pixel_radius = round((center_obj.diameter / 2)
+                                 / (self._meters_per_pixel * 2**shift))
+
+            # Tiles covered by the center object, the steps and the end positions
+            first_tile = np.maximum(center - pixel_radius, 0) // tile_size
+            last_tile = np.minimum(center + pixel_radius,
+                                   np.array(level_resolution) - 1) // tile_size
+            tiles = {(tile_x, tile_y): [None, None]
+                     for tile_x in range(first_tile[0], last_tile[0] + 1)
+                     for tile_y in range(first_tile[1], last_tile[1] + 1)}
+            for tile_x, tile_y, tile_pixels in pyramid.tiles(level):
+                tiles.setdefault((tile_x, tile_y), [None, None])[0] = tile_pixels
+            level_end_pixels = end_pixels >> shift
+            end_tiles = level_end_pixels // tile_size
+            for tile_x, tile_y in set(map(tuple, end_tiles.tolist())):
+                in_tile = (end_tiles[:, 0] == tile_x) & (end_tiles[:, 1] == tile_y)
+                origin = np.array([tile_x, tile_y]) * tile_size
+                tiles.setdefault((tile_x, tile_y), [None, None])[1] = \
+                    level_end_pixels[in_tile] - origin
+
+            for (tile_x, tile_y), (tile_pixels, tile_end_pixels) in tiles.items():
+                origin = np.array([tile_x, tile_y]) * tile_size
+                size = np.minimum(tile_size, np.array(level_resolution) - origin)
+                tile = Image.new("RGB", tuple(size.tolist()))
+                ImageDraw.Draw(tile).circle(tuple((center - origin).tolist()),
+                                            pixel_radius, fill=self._center_obj_color)
+                if tile_pixels is not None:
+                    self._paste_pixels(tile, tile_pixels, self._point_obj_color)
+                if tile_end_pixels is not None:
+                    self._paste_pixels(tile, tile_end_pixels, self._point_obj_end_color)
+                tile_path = directory / str(level) / str(tile_x) / f"{tile_y}.png"
+                tile_path.parent.mkdir(parents=True, exist_ok=True)
+                tile.save(tile_path)
+                saved_tiles += 1
+        return saved_tiles
+
+    def _to_pixels(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Converts (k, 2) positions in meters to (m, 2) integer pixel coordinates,
+        leaving out the ones, which don't land on the image (or are np.nan).
+        """
+        # Y axis has to be inverted
+        # This is because on the image it rises the lower it goes, which
+        # is the opposite of how it works in 2D geometry
+        corrected_pos = positions * np.array([1, -1])
+        pixel_pos = (corrected_pos / self._meters_per_pixel).round()
+        pixel_pos += self._image_center()
+        with np.errstate(invalid="ignore"):
+            on_image = ((pixel_pos >= 0) & (pixel_pos < self._resolution)).all(axis=1)
+        return pixel_pos[on_image].astype(np.intp)
+
+    def _draw_points(self, output: Image.Image, positions: np.ndarray,
+                     color: tuple[int]):
+        """Draws single pixels at all the given positions at once."""
+        self._paste_pixels(output, self._to_pixels(positions), color)
+
+    @staticmethod
+    def _paste_pixels(output: Image.Image, pixels: np.ndarray, color: tuple[int]):
+        """
+        Colors the given (m, 2) pixels of the image. The pixels are marked in
+        a NumPy mask, through which the color is pasted onto the image.
+        """
+        if len(pixels) == 0:
+            return
+        mask = np.zeros((output.size[1], output.size[0]), dtype=np.uint8)
+        mask[pixels[:, 1], pixels[:, 0]] = 255
+        color = tuple(int(value) for value in np.clip(color, 0, 255))
+        output.paste(color, (0, 0), Image.fromarray(mask))
+
+    def _image_center(self) -> list[int]:
+        """Returns the pixel, on which the center object is drawn."""
+        return [round(self._resolution[0] / 2), round(self._resolution[1] / 2)]
+
     @staticmethod
     def generate_report(simulation_output: SimulationOutput,
                         point_objs: list[PointObject]) -> str:
@@ -61,23 +240,36 @@ class SimulationVisualizer:
         Presents the given collision data in a readable format, which lists
         all objects and all collisions which occurred during the simulation.
         """
+        return SimulationVisualizer.generate_event_report(
+            simulation_output.simulation_steps[0], simulation_output.collisions,
+            simulation_output.close_calls, point_objs)
+
+    @staticmethod
+    @profiled("report", lambda start_positions, *_: len(start_positions))
+    def generate_event_report(start_positions: list[np.array],
+                              collisions: list[SpaceEvent], close_calls: list[SpaceEvent],
+                              point_objs: list[PointObject]) -> str:
+        """
+        Same as generate_report(), but only needs the starting positions and events,
+        so it can be used when the simulation output is processed in chunks.
+        """
         obj_output = "Objects:\n"
-        for index in range(len(simulation_output.simulation_steps[0])):
-            start_pos = simulation_output.simulation_steps[0][index].round(2)
+        for index in range(len(start_positions)):
+            start_pos = np.asarray(start_positions[index]).round(2)
             start_pos_str = f"start position = ({start_pos[0]}, {start_pos[1]})"
             end_pos = point_objs[index].position.round(2)
             end_pos_str = f"end position = ({end_pos[0]}, {end_pos[1]})"
             obj_output += f"n={index}, {start_pos_str}, {end_pos_str}\n"
 
         col_output = "\nCollisions:\n"
-        for collision in simulation_output.collisions:
+        for collision in collisions:
             objects = ""
             for obj in collision.point_obj_indexes:
                 objects += f"n={obj}, "
             col_output += f"{objects[:-2]} at k={collision.step}\n"
 
         cc_output = "\nClose calls:\n"
-        for close_call in simulation_output.close_calls:
+        for close_call in close_calls:
             objects = ""
             for obj in close_call.point_obj_indexes:
                 objects += f"n={obj}, "
@@ -1,30 +1,64 @@
 import errors
 import numpy as np
+from body_table import BodyTable
+
+# Whole numbers above this can't all be stored in a float exactly
+_MAX_EXACT_INTEGER = 2**53
 
 
 class SpaceObject:
+    __slots__ = ("_table", "_index")
+
     def __init__(self, position: np.array = None, mass: float = 1.0):
         """
         Position is a vector, which signifies where the object is in space (meters),
         mass is in kilograms.
+        The object is only a handle to its row of a body table, which holds its
+        state. A new object gets a table of its own, many objects can also view
+        into rows of one shared table.
         """
         if position is None:
-            self._position = np.array([0, 0]).astype(float)
-        else:
-            self._position = position
+            position = np.array([0, 0]).astype(float)
 
         # Mass of any space object cannot be negative
         if mass < 0:
             raise errors.NegativeMassError
-        self._mass = mass
+        self._table = BodyTable(position, np.zeros(2), [mass])
+        self._index = 0
 
     @property
     def position(self) -> np.array:
-        return self._position
+        """View of the object's position, writing into it moves the object."""
+        return self._table.positions[self._index]
 
     @property
     def mass(self) -> float:
-        return self._mass
+        return float(self._table.masses[self._index])
+
+    @property
+    def body_table(self) -> BodyTable:
+        return self._table
+
+    @property
+    def index(self) -> int:
+        """Row of the body table holding this object's state."""
+        return self._index
+
+    @staticmethod
+    def _to_json_number(value: float) -> int | float:
+        """
+        Returns the value as an int if it's a whole number, so integer data
+        stays integer once stored as floats in a body table. Floats too large
+        to be exact integers are kept as they are.
+        """
+        if value.is_integer() and abs(value) <= _MAX_EXACT_INTEGER:
+            return int(value)
+        return value
+
+    @staticmethod
+    def _to_json_vector(vector: list[float]) -> list[int | float]:
+        """Converts every element of the vector like _to_json_number()."""
+        return [SpaceObject._to_json_number(element) for element in vector]
 
     # Virtual methods
     @classmethod
@@ -0,0 +1,116 @@
+import time
+import pytest
+import numpy as np
+import errors
+from PIL import Image
+from animation_exporter import AnimationExporter
+from center_object import CenterObject
+from point_object import PointObject
+from simulation_visualizer import SimulationVisualizer
+
+
+def _line_steps(steps):
+    """One object moving a pixel to the right each step."""
+    return np.array([[[float(x), 0.0]] for x in range(steps)])
+
+
+def test_animation_exporter_frames(tmp_path):
+    sim_vis = SimulationVisualizer([21, 21], 1.0)
+    path = tmp_path / "frames"
+    exporter = AnimationExporter(sim_vis, CenterObject(0.5), path, "frames", 3)
+    steps = _line_steps(8)
+    exporter.add_steps(steps[:2])
+    exporter.add_steps(steps[2:7])
+    exporter.add_steps(steps[7:])
+    exporter.close()
+    # Frames after steps 3 and 6 and the last one with the remaining 2
+    assert exporter.frame_count == 3
+    frames = sorted(path.iterdir())
+    assert [frame.name for frame in frames] == ["frame_00000.png", "frame_00001.png",
+                                                "frame_00002.png"]
+    for frame, drawn_steps in zip(frames, [3, 6, 8]):
+        row = [Image.open(frame).getpixel((10 + x, 10)) for x in range(8)]
+        assert row == [(0, 255, 0)] * drawn_steps + [(0, 0, 0)] * (8 - drawn_steps)
+
+
+def test_animation_exporter_matches_static_image(tmp_path):
+    rng = np.random.default_rng(3)
+    sim_vis = SimulationVisualizer([41, 41], 1.0)
+    center_obj = CenterObject(6.0)
+    steps = rng.uniform(-20.0, 20.0, (17, 5, 2))
+    point_objs = [PointObject(position) for position in steps[-1]]
+    path = tmp_path / "frames"
+    exporter = AnimationExporter(sim_vis, center_obj, path, "frames", 4)
+    exporter.add_steps(steps)
+    exporter.close(point_objs)
+    assert exporter.frame_count == 5
+    last_frame = Image.open(path / "frame_00004.png")
+    expected = sim_vis.draw(center_obj, point_objs, steps)
+    assert list(last_frame.getdata()) == list(expected.getdata())
+
+
+@pytest.mark.parametrize("animation_format, file_name", [("gif", "anim.gif"),
+                                                         ("apng", "anim.png")])
+def test_animation_exporter_animated_file(tmp_path, animation_format, file_name):
+    sim_vis = SimulationVisualizer([21, 21], 1.0)
+    path = tmp_path / file_name
+    with AnimationExporter(sim_vis, CenterObject(2.0), path, animation_format,
+                           2) as exporter:
+        exporter.add_steps(_line_steps(10))
+    with Image.open(path) as animation:
+        assert animation.n_frames == 5
+        animation.seek(4)
+        assert animation.convert("RGB").getpixel((19, 10)) == (0, 255, 0)
+
+
+@pytest.mark.parametrize("animation_format", ["gif", "apng"])
+def test_animation_exporter_streams_frames(tmp_path, animation_format):
+    path = tmp_path / "anim"
+    exporter = AnimationExporter(SimulationVisualizer([21, 21], 1.0), CenterObject(2.0),
+                                 path, animation_format)
+    exporter.add_steps(_line_steps(4))
+    # Encoded frames are written to the file before the exporter is closed
+    deadline = time.monotonic() + 10
+    while exporter._encoded_count < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    exporter._file.flush()
+    assert path.stat().st_size > 0
+    exporter.add_steps(_line_steps(2))
+    exporter.close()
+    with Image.open(path) as animation:
+        assert animation.n_frames == 6
+
+
+def test_animation_exporter_invalid_format(tmp_path):
+    with pytest.raises(errors.InvalidAnimationFormatError):
+        AnimationExporter(SimulationVisualizer([21, 21], 1.0), CenterObject(1.0),
+                          tmp_path / "anim.avi", "avi")
+
+
+@pytest.mark.parametrize("stride", [0, -2, 1.5])
+def test_animation_exporter_invalid_stride(tmp_path, stride):
+    with pytest.raises(errors.InvalidAnimationStrideError):
+        AnimationExporter(SimulationVisualizer([21, 21], 1.0), CenterObject(1.0),
+                          tmp_path / "anim.gif", "gif", stride)
+
+
+def test_animation_exporter_encoding_error(tmp_path):
+    path = tmp_path / "frames"
+    exporter = AnimationExporter(SimulationVisualizer([21, 21], 1.0), CenterObject(1.0),
+                                 path, "frames")
+    path.rmdir()
+    exporter.add_steps(_line_steps(2))
+    with pytest.raises(OSError):
+        exporter.close()
+
+
+def test_animation_exporter_unexpected_encoding_error(tmp_path, monkeypatch):
+    def fail(self, frame, index):
+        raise ValueError("unexpected")
+
+    monkeypatch.setattr(AnimationExporter, "_write_gif_frame", fail)
+    exporter = AnimationExporter(SimulationVisualizer([21, 21], 1.0), CenterObject(1.0),
+                                 tmp_path / "anim.gif")
+    exporter.add_steps(_line_steps(2))
+    with pytest.raises(ValueError):
+        exporter.close()
@@ -0,0 +1,162 @@
+import json
+import pytest
+import numpy as np
+import errors
+from copy import deepcopy
+from batch_runner import (BatchMember, load_batch_spec, stack_members, run_batch,
+                          format_summary, save_summary, main)
+from config_data import ConfigData
+from center_object import CenterObject
+from point_object import PointObject
+from simulation import Simulation
+
+
+def _member_config(seed: int, mass: float = 1.0e20) -> ConfigData:
+    rng = np.random.default_rng(seed)
+    angles = rng.uniform(0, 2 * np.pi, 60)
+    radii = rng.uniform(40.0, 120.0, 60)
+    positions = np.stack((radii * np.cos(angles), radii * np.sin(angles)), axis=1)
+    velocities = rng.normal(0.0, 3.0, (60, 2))
+    point_objs = [PointObject(positions[i], 1.0, velocities[i]) for i in range(60)]
+    return ConfigData(25, (64, 64), 4.0, 6.0, CenterObject(10.0, mass), point_objs)
+
+
+def _separate_run(config: ConfigData):
+    point_objs = deepcopy(config.point_objs)
+    output = Simulation(config.meters_per_pixel, config.close_call_distance,
+                        config.center_obj, point_objs).run(config.steps)
+    return output.collisions, output.close_calls
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_batch_stacked_matches_separate_runs(workers):
+    members = [BatchMember(f"m{seed}", _member_config(seed)) for seed in range(3)]
+    members.append(BatchMember("heavy", _member_config(3, 2.0e20)))
+    assert stack_members(members) == [[0, 1, 2], [3]]
+    results = run_batch(members, workers)
+    for member, result in zip(members, results):
+        collisions, close_calls = _separate_run(member.config)
+        assert result.name == member.name
+        assert result.point_obj_amount == 60
+        assert result.collisions == collisions
+        assert result.close_calls == close_calls
+    assert sum(len(result.close_calls) for result in results) > 0
+    # Members' own point objects are not moved by the batch
+    np.testing.assert_array_equal(members[0].config.point_objs[0].position,
+                                  _member_config(0).point_objs[0].position)
+
+
+def test_stacked_members_dont_interact():
+    config = _member_config(0)
+    # Two identical members would collide with each other everywhere if stacked
+    results = run_batch([BatchMember("a", config), BatchMember("b", config)])
+    collisions, close_calls = _separate_run(config)
+    assert results[0].collisions == results[1].collisions == collisions
+    assert results[0].close_calls == results[1].close_calls == close_calls
+
+
+def test_stack_members_no_stack():
+    members = [BatchMember(str(seed), _member_config(seed)) for seed in range(3)]
+    assert stack_members(members, False) == [[0], [1], [2]]
+
+
+def _write_json(path, data):
+    with path.open("w") as file:
+        json.dump(data, file)
+
+
+def test_load_batch_spec_configs(tmp_path):
+    _member_config(0).save_data_to_json(tmp_path / "first.json")
+    _member_config(1).save_data_to_json(tmp_path / "second.json")
+    _write_json(tmp_path / "spec.json", {"configs": ["first.json", "second.json"]})
+    members = load_batch_spec(tmp_path / "spec.json")
+    assert [member.name for member in members] == ["first", "second"]
+    assert len(members[1].config.point_objs) == 60
+
+
+def test_load_batch_spec_sweep_and_ensemble(tmp_path):
+    _member_config(0).save_data_to_json(tmp_path / "base.json")
+    _write_json(tmp_path / "spec.json", {
+        "base": "base.json",
+        "sweep": {"center_object.mass": [1.0e20, 3.0e20], "time_step": [0.5, 1.0, 2.0]},
+        "ensemble": {"members": 2, "velocity_perturbation": 0.01, "seed": 4}
+    })
+    members = load_batch_spec(tmp_path / "spec.json")
+    assert len(members) == 12
+    assert members[0].name == "center_object.mass=1e+20, time_step=0.5 #0"
+    assert members[-1].config.center_obj.mass == 3.0e20
+    assert members[-1].config.time_step == 2.0
+    base_velocity = _member_config(0).point_objs[0].velocity
+    velocities = [member.config.point_objs[0].velocity for member in members[:2]]
+    assert not np.array_equal(velocities[0], velocities[1])
+    np.testing.assert_allclose(velocities[0], base_velocity, rtol=0.1)
+    assert len(stack_members(members)) == 6
+
+
+@pytest.mark.parametrize("spec", [
+    {}, {"configs": []}, {"configs": ["a.json"], "base": "base.json"},
+    {"base": "base.json", "sweep": {"steps": []}},
+    {"base": "base.json", "sweep": {"missing.mass": [1.0]}},
+    {"base": "base.json", "ensemble": {"members": 0}}
+])
+def test_load_batch_spec_invalid(tmp_path, spec):
+    _member_config(0).save_data_to_json(tmp_path / "base.json")
+    _write_json(tmp_path / "spec.json", spec)
+    with pytest.raises(errors.InvalidBatchSpecError):
+        load_batch_spec(tmp_path / "spec.json")
+
+
+def test_load_batch_spec_invalid_member(tmp_path):
+    _member_config(0).save_data_to_json(tmp_path / "base.json")
+    _write_json(tmp_path / "spec.json", {"base": "base.json",
+                                         "sweep": {"time_step": [1.0, -1.0]}})
+    with pytest.raises(errors.InvalidTimeStepError):
+        load_batch_spec(tmp_path / "spec.json")
+
+
+def test_batch_summary(tmp_path):
+    members = [BatchMember("only", _member_config(0))]
+    results = run_batch(members)
+    lines = format_summary(results).splitlines()
+    assert lines[0].split() == ["member", "objects", "collided", "collisions", "close",
+                                "calls"]
+    assert lines[1].split()[:2] == ["only", "60"]
+    save_summary(results, tmp_path / "summary.json")
+    with (tmp_path / "summary.json").open() as file:
+        data = json.load(file)
+    assert data[0]["name"] == "only"
+    assert len(data[0]["close_calls"]) == len(results[0].close_calls)
+
+
+def test_batch_main(tmp_path, capsys):
+    _member_config(0).save_data_to_json(tmp_path / "base.json")
+    _write_json(tmp_path / "spec.json", {"base": "base.json",
+                                         "ensemble": {"members": 3}})
+    main([str(tmp_path / "spec.json"), "-o", str(tmp_path / "summary.json")])
+    assert len(capsys.readouterr().out.splitlines()) == 4
+    assert (tmp_path / "summary.json").exists()
+
+
+def test_stack_members_stop_conditions():
+    config = _member_config(2)
+    stopping = ConfigData.from_dict({**config.to_dict(), "stop_on_collision": True})
+    members = [BatchMember("a", config), BatchMember("b", stopping),
+               BatchMember("c", config), BatchMember("d", stopping)]
+    assert stack_members(members) == [[0, 2], [1], [3]]
+    results = run_batch(members)
+    collisions, close_calls = _separate_run(config)
+    assert len(collisions) == 1
+    # Stopped members have no events after the collision, the others run on
+    assert results[1].collisions == results[3].collisions == collisions
+    assert results[1].close_calls == [event for event in close_calls
+                                      if event.step <= collisions[0].step]
+    assert results[0].close_calls == results[2].close_calls == close_calls
+
+
+def test_batch_main_invalid_member(tmp_path, capsys):
+    _member_config(0).save_data_to_json(tmp_path / "base.json")
+    _write_json(tmp_path / "spec.json", {"base": "base.json",
+                                         "sweep": {"stop_at_live_bodies": [-1]}})
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / "spec.json")])
+    assert str(errors.InvalidStopAtLiveBodiesError()) in capsys.readouterr().out
@@ -0,0 +1,115 @@
+import pytest
+import numpy as np
+import errors
+import benchmark
+from benchmark import (generate_positions, run_neighbour_search_benchmark,
+                       generate_scenario, run_benchmark_suite, compare_results,
+                       save_results, load_results, main, SCENARIO_RADIUS, SCENARIOS,
+                       PHASES, available_searches)
+from neighbour_search import KDTree
+
+
+def test_generate_positions():
+    positions = generate_positions(1000, 0.5)
+    radii = np.linalg.norm(positions, axis=1)
+    assert positions.shape == (1000, 2)
+    assert (radii <= SCENARIO_RADIUS).all()
+    ring = np.abs(radii - SCENARIO_RADIUS / 2) < SCENARIO_RADIUS / 100
+    assert ring.sum() >= 500
+
+
+def test_run_neighbour_search_benchmark():
+    results = run_neighbour_search_benchmark([100], [0.0, 0.9], ["grid", "sweep"])
+    assert len(results) == 4
+    assert {result["search"] for result in results} == {"grid", "sweep"}
+    assert all(result["close_calls"] >= 0 for result in results)
+
+
+def test_benchmark_without_scipy(monkeypatch, capsys):
+    def check_available(cls):
+        raise errors.MissingScipyError
+
+    monkeypatch.setattr(KDTree, "check_available", classmethod(check_available))
+    assert available_searches() == ["grid", "sweep"]
+    main(["searches", "-n", "100", "-c", "0.0"])
+    output = capsys.readouterr().out
+    assert "grid" in output and "kdtree" not in output
+
+
+def test_benchmark_searches_by_default(monkeypatch):
+    calls = []
+    monkeypatch.setattr(benchmark, "run_neighbour_search_benchmark",
+                        lambda *args: calls.append(args) or [])
+    main([])
+    assert calls == [([1000, 10000, 100000], [0.0, 0.9, 0.99], available_searches())]
+    # Sizes only belong to a command, so they can't be given for both
+    with pytest.raises(SystemExit):
+        main(["-n", "100", "suite"])
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_generate_scenario(scenario):
+    config = generate_scenario(scenario, 500, 20)
+    assert len(config.point_objs) == 500
+    assert config.steps == 20
+    positions = np.array([obj.position for obj in config.point_objs])
+    velocities = np.array([obj.velocity for obj in config.point_objs])
+    # Objects start on circular orbits - velocity is perpendicular to position
+    np.testing.assert_allclose(np.einsum("ij,ij->i", positions, velocities), 0.0,
+                               atol=1e-3)
+    assert (np.linalg.norm(positions, axis=1) < 1.5 * SCENARIO_RADIUS).all()
+
+
+def test_generate_scenario_unknown():
+    with pytest.raises(ValueError):
+        generate_scenario("spiral", 10, 10)
+
+
+def test_run_benchmark_suite():
+    results = run_benchmark_suite(["ring", "cluster"], [200], [5, 10])
+    assert [(result["scenario"], result["steps"]) for result in results] == \
+        [("ring", 5), ("ring", 10), ("cluster", 5), ("cluster", 10)]
+    for result in results:
+        assert set(result["phases"]) == set(PHASES)
+        assert all(seconds >= 0 for seconds in result["phases"].values())
+        assert result["total"] == pytest.approx(sum(result["phases"].values()))
+
+
+def _suite_result(stepping: float, total: float, n: int = 100) -> dict:
+    phases = dict.fromkeys(PHASES, 0.001)
+    phases["stepping"] = stepping
+    return {"scenario": "disk", "n": n, "steps": 10, "phases": phases, "total": total}
+
+
+def test_compare_results():
+    baseline = [_suite_result(1.0, 1.1), _suite_result(1.0, 1.1, 200)]
+    results = [_suite_result(1.2, 1.3), _suite_result(1.0, 1.0, 300)]
+    comparison = compare_results(results, baseline, 0.25)
+    # Only the result with a matching baseline is compared, phase by phase
+    assert len(comparison) == len(PHASES) + 1
+    assert not any(entry["regression"] for entry in comparison)
+    comparison = compare_results(results, baseline, 0.1)
+    assert {entry["phase"] for entry in comparison if entry["regression"]} == \
+        {"stepping", "total"}
+    # Tiny phases don't count, even if they got much slower
+    results[0]["phases"]["report"] = 0.003
+    assert not next(entry for entry in compare_results(results, baseline, 0.1)
+                    if entry["phase"] == "report")["regression"]
+
+
+def test_suite_main_baseline(tmp_path, capsys):
+    results_path = tmp_path / "results.json"
+    main(["suite", "--scenarios", "disk", "-n", "100", "-k", "5", "-o",
+          str(results_path)])
+    saved = load_results(results_path)
+    assert len(saved) == 1
+    # Compared with much faster phases, the run is a regression
+    for phase in PHASES:
+        saved[0]["phases"][phase] = 0.0
+    saved[0]["total"] = 0.0
+    save_results(saved, tmp_path / "baseline.json")
+    with pytest.raises(SystemExit) as exc_info:
+        main(["suite", "--scenarios", "disk", "-n", "100", "-k", "5", "-b",
+              str(tmp_path / "baseline.json"), "--min-difference", "0"])
+    assert exc_info.value.code == 1
+    assert "REGRESSION" in capsys.readouterr().out
@@ -0,0 +1,89 @@
+import pytest
+import numpy as np
+import errors
+from checkpoint import Checkpoint, CheckpointWriter, CHECKPOINT_SUFFIX
+from space_event import SpaceEvent
+
+
+def _example_checkpoint(step: int = 12) -> Checkpoint:
+    rng = np.random.default_rng(0)
+    return Checkpoint(step, rng.normal(size=(4, 2)), rng.normal(size=(4, 2)),
+                      [True, False, True, False], rng.normal(size=(4, 2)),
+                      rng.normal(size=(4, 2)),
+                      [SpaceEvent(3, [1, 3])],
+                      [SpaceEvent(1, [0, 2]), SpaceEvent(5, [0, 2])], [(0, 2)])
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = tmp_path / f"run{CHECKPOINT_SUFFIX}"
+    checkpoint = _example_checkpoint()
+    checkpoint.save(path)
+    loaded = Checkpoint.load(path)
+    assert loaded.step == 12
+    assert loaded.point_obj_amount == 4
+    for name in ("positions", "velocities", "alive", "start_positions",
+                 "start_velocities"):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(checkpoint, name))
+    assert loaded.collisions == [SpaceEvent(3, [1, 3])]
+    assert loaded.close_calls == checkpoint.close_calls
+    assert loaded.reported_close_calls == [(0, 2)]
+    # Nothing is left behind by the atomic save
+    assert [file.name for file in tmp_path.iterdir()] == [path.name]
+
+
+def test_checkpoint_save_replaces_previous(tmp_path):
+    path = tmp_path / f"run{CHECKPOINT_SUFFIX}"
+    _example_checkpoint(5).save(path)
+    _example_checkpoint(9).save(path)
+    assert Checkpoint.load(path).step == 9
+
+
+@pytest.mark.parametrize("content", [b"", b"not a checkpoint"])
+def test_checkpoint_invalid_file(tmp_path, content):
+    path = tmp_path / f"run{CHECKPOINT_SUFFIX}"
+    path.write_bytes(content)
+    with pytest.raises(errors.InvalidCheckpointFileError):
+        Checkpoint.load(path)
+
+
+def test_checkpoint_missing_arrays(tmp_path):
+    path = tmp_path / f"run{CHECKPOINT_SUFFIX}"
+    with path.open("wb") as file:
+        np.savez(file, version=1, step=3, positions=np.zeros((2, 2)))
+    with pytest.raises(errors.InvalidCheckpointFileError):
+        Checkpoint.load(path)
+
+
+def test_checkpoint_missing_file(tmp_path):
+    with pytest.raises(errors.InvalidCheckpointFileError):
+        Checkpoint.load(tmp_path / "missing.ckpt.npz")
+
+
+def test_checkpoint_writer_every_steps(tmp_path):
+    writer = CheckpointWriter(tmp_path / f"run{CHECKPOINT_SUFFIX}", every_steps=3)
+    assert [writer.due(step) for step in range(5)] == [False] * 3 + [True] * 2
+    writer.save(_example_checkpoint(4))
+    assert not writer.due(6)
+    assert writer.due(7)
+
+
+def test_checkpoint_writer_before_save(tmp_path):
+    path = tmp_path / f"run{CHECKPOINT_SUFFIX}"
+    saved_before = []
+    writer = CheckpointWriter(path, every_steps=1,
+                              before_save=lambda: saved_before.append(path.exists()))
+    writer.save(_example_checkpoint(4))
+    assert saved_before == [False]
+
+
+def test_checkpoint_writer_every_seconds(tmp_path):
+    writer = CheckpointWriter(tmp_path / f"run{CHECKPOINT_SUFFIX}", every_seconds=1e-9)
+    assert writer.due(0)
+    assert not CheckpointWriter(tmp_path / "other.npz", every_seconds=3600).due(5)
+
+
+@pytest.mark.parametrize("options", [{"every_steps": 0}, {"every_steps": 1.5},
+                                     {"every_seconds": -1.0}])
+def test_checkpoint_writer_invalid_interval(tmp_path, options):
+    with pytest.raises(errors.InvalidCheckpointIntervalError):
+        CheckpointWriter(tmp_path / f"run{CHECKPOINT_SUFFIX}", **options)
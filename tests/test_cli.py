@@ -1,8 +1,14 @@
+import json
+import shutil
+import pytest
+import profiler
 import numpy as np
+from PIL import Image
 from cli import CommandLineInterface
 from config_data import ConfigData
 from center_object import CenterObject
 from point_object import PointObject
+from checkpoint import CheckpointWriter
 
 
 def test_load_config_from_input_valid(monkeypatch):
@@ -116,3 +122,217 @@ def test_load_config_from_input_invalid_point_obj(monkeypatch):
     np.testing.assert_array_equal(config.point_objs[0].position, [100, 100])
     assert config.point_objs[0].mass == 10
     np.testing.assert_array_equal(config.point_objs[0].velocity, [200, 200])
+
+
+def _save_example_config(path):
+    center_obj = CenterObject(1.0e6, 6.0e24)
+    point_objs = [PointObject(np.array([7.0e6, 0.0]), 1.0, np.array([0.0, 7500.0])),
+                  PointObject(np.array([-9.0e6, 0.0]), 1.0, np.array([0.0, -6000.0]))]
+    ConfigData(50, (128, 128), 2.0e5, 1000.0, center_obj,
+               point_objs).save_data_to_json(path)
+
+
+def test_output_to_file_keeps_settings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    center_obj = CenterObject(1.0e6, 6.0e24)
+    point_objs = [PointObject(np.array([7.0e6, 0.0]), 1.0, np.array([0.0, 7500.0]))]
+    start = ConfigData(20, [128, 128], 2.0e5, 1000.0, center_obj, point_objs,
+                       "sweep", "run", "leapfrog", 2.0, True, "numeric", 1, True, 0)
+    start.save_data_to_json(tmp_path / "config.json")
+    cli = CommandLineInterface(["-sq", "-f", "config.json"])
+    cli.output_to_file()
+    end = ConfigData.from_json(tmp_path / f"{cli._file_name}.json")
+    end_settings = end.to_dict()
+    start_settings = start.to_dict()
+    for settings in (end_settings, start_settings):
+        del settings["point_objects"]
+    assert end_settings == start_settings
+    assert not np.array_equal(end.point_objs[0].position, [7.0e6, 0.0])
+
+
+def test_render_saved_trajectory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _save_example_config(tmp_path / "config.json")
+    cli = CommandLineInterface(["-sq", "-f", "config.json"])
+    cli.output_to_file()
+    saved = tmp_path / cli._file_name
+    rendered = CommandLineInterface(["-q", "-f", f"{saved}.json",
+                                     "-r", f"{saved}.traj"])
+    assert list(rendered._output_img.getdata()) == list(cli._output_img.getdata())
+
+
+def test_render_saved_trajectory_overrides(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _save_example_config(tmp_path / "config.json")
+    cli = CommandLineInterface(["-sq", "-f", "config.json"])
+    cli.output_to_file()
+    saved = tmp_path / cli._file_name
+    rendered = CommandLineInterface(["-q", "-f", f"{saved}.json",
+                                     "-r", f"{saved}.traj", "--step-color", "0", "0",
+                                     "255", "--resolution", "64", "32",
+                                     "--meters-per-pixel", "4e5"])
+    assert rendered._output_img.size == (64, 32)
+    colors = set(rendered._output_img.getdata())
+    assert (0, 0, 255) in colors
+    assert (0, 255, 0) not in colors
+
+
+def test_render_mismatched_trajectory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _save_example_config(tmp_path / "config.json")
+    cli = CommandLineInterface(["-sq", "-f", "config.json"])
+    cli.output_to_file()
+    ConfigData(50, (128, 128), 1.0e5, 1000.0, CenterObject(1.0, 1.0),
+               []).save_data_to_json(tmp_path / "empty.json")
+    with pytest.raises(SystemExit):
+        CommandLineInterface(["-q", "-f", "empty.json", "-r", f"{cli._file_name}.traj"])
+
+
+def test_render_saved_trajectory_heatmap(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _save_example_config(tmp_path / "config.json")
+    cli = CommandLineInterface(["-sq", "--heatmap", "log", "-f", "config.json"])
+    cli.output_to_file()
+    saved = tmp_path / cli._file_name
+    rendered = CommandLineInterface(["-q", "-f", f"{saved}.json", "-r", f"{saved}.traj",
+                                     "--heatmap", "log"])
+    assert list(rendered._output_img.getdata()) == list(cli._output_img.getdata())
+    pixels = rendered._output_img.getdata()
+    assert any(pixel[0] == 0 and pixel[1] > 0 for pixel in pixels)
+
+
+def test_save_animation(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _save_example_config(tmp_path / "config.json")
+    cli = CommandLineInterface(["-sq", "-f", "config.json", "--animate", "frames",
+                                "--animation-stride", "10"])
+    frames = sorted((tmp_path / f"{cli._file_name}_frames").iterdir())
+    # 51 stored steps give 5 full frames and the last one with end positions
+    assert len(frames) == 6
+    cli.output_to_file()
+    last_frame = Image.open(frames[-1])
+    assert list(last_frame.getdata()) == list(cli._output_img.getdata())
+
+
+def test_save_tiles(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _save_example_config(tmp_path / "config.json")
+    cli = CommandLineInterface(["-sq", "-f", "config.json", "--tiles", "64"])
+    cli.output_to_file()
+    tiles = tmp_path / f"{cli._file_name}_tiles"
+    # 128x128 image in tiles of 64 gives 2 levels, 1 tile and 2x2 tiles
+    assert [path.name for path in (tiles / "0").glob("*/*.png")] == ["0.png"]
+    assert len(list((tiles / "1").glob("*/*.png"))) == 4
+    assert not (tmp_path / f"{cli._file_name}.png").exists()
+    assert (tmp_path / f"{cli._file_name}.txt").exists()
+
+
+def test_resume_from_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _save_example_config(tmp_path / "config.json")
+    cli = CommandLineInterface(["-sq", "-f", "config.json", "--checkpoint-steps", "20"])
+    cli.output_to_file()
+    saved = tmp_path / cli._file_name
+    trajectory = saved.with_name(saved.name + ".traj").read_bytes()
+    report = saved.with_name(saved.name + ".txt").read_text()
+
+    # The last checkpoint is at step 40, the steps after it are simulated again
+    resumed = CommandLineInterface(["-sq", "-f", "config.json",
+                                    "--resume", f"{cli._file_name}.ckpt.npz"])
+    resumed.output_to_file()
+    assert resumed._file_name == cli._file_name
+    assert list(resumed._output_img.getdata()) == list(cli._output_img.getdata())
+    assert saved.with_name(saved.name + ".traj").read_bytes() == trajectory
+    assert saved.with_name(saved.name + ".txt").read_text() == report
+
+
+def test_resume_after_crash(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _save_example_config(tmp_path / "config.json")
+    crash_path = tmp_path / "crash"
+    crash_path.mkdir()
+    save = CheckpointWriter.save
+
+    def save_and_crash(writer, checkpoint):
+        save(writer, checkpoint)
+        # What's on the disk right after the first checkpoint, as if the process
+        # was killed then - data only buffered by the writers is lost
+        if checkpoint.step == 20:
+            for path in tmp_path.iterdir():
+                if path.is_file():
+                    shutil.copy(path, crash_path / path.name)
+
+    monkeypatch.setattr(CheckpointWriter, "save", save_and_crash)
+    cli = CommandLineInterface(["-sq", "-f", "config.json", "--checkpoint-steps", "20"])
+    cli.output_to_file()
+    monkeypatch.undo()
+
+    monkeypatch.chdir(crash_path)
+    resumed = CommandLineInterface(["-sq", "-f", "config.json",
+                                    "--resume", f"{cli._file_name}.ckpt.npz"])
+    resumed.output_to_file()
+    assert list(resumed._output_img.getdata()) == list(cli._output_img.getdata())
+    assert (crash_path / f"{cli._file_name}.traj").read_bytes() == \
+        (tmp_path / f"{cli._file_name}.traj").read_bytes()
+
+
+def test_resume_requires_save_and_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _save_example_config(tmp_path / "config.json")
+    with pytest.raises(SystemExit):
+        CommandLineInterface(["-q", "-f", "config.json", "--resume", "run.ckpt.npz"])
+    with pytest.raises(SystemExit):
+        CommandLineInterface(["-sq", "-i", "--resume", "run.ckpt.npz"])
+    with pytest.raises(SystemExit):
+        CommandLineInterface(["-q", "-f", "config.json", "--checkpoint-steps", "5"])
+
+
+def test_resume_invalid_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _save_example_config(tmp_path / "config.json")
+    (tmp_path / "run.ckpt.npz").write_bytes(b"broken")
+    with pytest.raises(SystemExit):
+        CommandLineInterface(["-sq", "-f", "config.json", "--resume", "run.ckpt.npz"])
+
+
+def test_npz_config(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _save_example_config(tmp_path / "config.json")
+    ConfigData.from_json(tmp_path / "config.json").save(tmp_path / "config.npz")
+    expected = CommandLineInterface(["-q", "-f", "config.json"])
+    cli = CommandLineInterface(["-sq", "-f", "config.npz"])
+    cli.output_to_file()
+    assert list(cli._output_img.getdata()) == list(expected._output_img.getdata())
+    end_config = ConfigData.load(tmp_path / f"{cli._file_name}.npz")
+    np.testing.assert_array_equal(end_config.point_objs[0].position,
+                                  cli._sim.point_objs[0].position)
+    assert not (tmp_path / f"{cli._file_name}.json").exists()
+
+
+def test_profile(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    _save_example_config(tmp_path / "config.json")
+    cli = CommandLineInterface(["-q", "-f", "config.json", "--profile-trace",
+                                "trace.json"])
+    cli.output_profile()
+    summary = capsys.readouterr().out
+    for phase in ("cli.load_config", "simulation.integrate", "render.steps", "report"):
+        assert phase in summary
+    trace = json.loads((tmp_path / "trace.json").read_text())
+    assert {event["name"] for event in trace["traceEvents"]} >= {"cli.run_simulation"}
+    # Once the profile is output, nothing is timed anymore
+    assert profiler._active_profiler is None
+
+
+def test_progress_metrics(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    _save_example_config(tmp_path / "config.json")
+    CommandLineInterface(["-q", "-f", "config.json", "--progress",
+                          "--metrics-file", "metrics.jsonl"])
+    assert "step 50/50 (100.0%)" in capsys.readouterr().err
+    metrics = [json.loads(line)
+               for line in (tmp_path / "metrics.jsonl").read_text().splitlines()]
+    assert metrics[-1]["final"] and metrics[-1]["live_bodies"] == 2
+    with pytest.raises(SystemExit):
+        CommandLineInterface(["-q", "-f", "config.json", "--metrics-file",
+                              "metrics.jsonl", "--metrics-seconds", "0"])
@@ -192,3 +192,212 @@ def test_save_data_to_json(tmp_path, valid_sim_config):
     assert saved_config.point_objs[0].mass == loaded_config.point_objs[0].mass
     np.testing.assert_array_equal(saved_config.point_objs[0].position,
                                   loaded_config.point_objs[0].position)
+
+
+def test_from_json_neighbour_search(tmp_path, valid_sim_config):
+    valid_sim_config["neighbour_search"] = "sweep"
+    config_file = tmp_path / "config.json"
+    with config_file.open("w") as file:
+        json.dump(valid_sim_config, file)
+
+    assert ConfigData.from_json(config_file).neighbour_search == "sweep"
+
+
+def test_from_json_default_neighbour_search(tmp_path, valid_sim_config):
+    config_file = tmp_path / "config.json"
+    with config_file.open("w") as file:
+        json.dump(valid_sim_config, file)
+
+    assert ConfigData.from_json(config_file).neighbour_search == "grid"
+
+
+def test_from_json_invalid_neighbour_search(tmp_path, valid_sim_config):
+    valid_sim_config["neighbour_search"] = "octree"
+    config_file = tmp_path / "config.json"
+    with config_file.open("w") as file:
+        json.dump(valid_sim_config, file)
+
+    with pytest.raises(errors.InvalidNeighbourSearchError):
+        ConfigData.from_json(config_file)
+
+
+def test_from_json_invalid_close_call_dedupe(tmp_path, valid_sim_config):
+    valid_sim_config["close_call_dedupe"] = "forever"
+    config_file = tmp_path / "config.json"
+    with config_file.open("w") as file:
+        json.dump(valid_sim_config, file)
+
+    with pytest.raises(errors.InvalidCloseCallDedupeError):
+        ConfigData.from_json(config_file)
+
+
+def test_from_json_invalid_integrator(tmp_path, valid_sim_config):
+    valid_sim_config["integrator"] = "midpoint"
+    config_file = tmp_path / "config.json"
+    with config_file.open("w") as file:
+        json.dump(valid_sim_config, file)
+
+    with pytest.raises(errors.InvalidIntegratorError):
+        ConfigData.from_json(config_file)
+
+
+def test_from_json_time_step(tmp_path, valid_sim_config):
+    valid_sim_config["time_step"] = 0.5
+    valid_sim_config["adaptive_time_step"] = True
+    config_file = tmp_path / "config.json"
+    with config_file.open("w") as file:
+        json.dump(valid_sim_config, file)
+
+    config = ConfigData.from_json(config_file)
+    assert config.time_step == 0.5
+    assert config.adaptive_time_step
+
+
+def test_from_json_invalid_time_step(tmp_path, valid_sim_config):
+    valid_sim_config["time_step"] = -1
+    config_file = tmp_path / "config.json"
+    with config_file.open("w") as file:
+        json.dump(valid_sim_config, file)
+
+    with pytest.raises(errors.InvalidTimeStepError):
+        ConfigData.from_json(config_file)
+
+
+def test_from_json_invalid_adaptive_time_step(tmp_path, valid_sim_config):
+    valid_sim_config["adaptive_time_step"] = "yes"
+    config_file = tmp_path / "config.json"
+    with config_file.open("w") as file:
+        json.dump(valid_sim_config, file)
+
+    with pytest.raises(errors.InvalidAdaptiveTimeStepError):
+        ConfigData.from_json(config_file)
+
+
+def test_from_json_invalid_propagator(tmp_path, valid_sim_config):
+    valid_sim_config["propagator"] = "analytic"
+    config_file = tmp_path / "config.json"
+    with config_file.open("w") as file:
+        json.dump(valid_sim_config, file)
+
+    with pytest.raises(errors.InvalidPropagatorError):
+        ConfigData.from_json(config_file)
+
+
+def test_from_json_workers(tmp_path, valid_sim_config):
+    valid_sim_config["workers"] = 8
+    config_file = tmp_path / "config.json"
+    with config_file.open("w") as file:
+        json.dump(valid_sim_config, file)
+
+    assert ConfigData.from_json(config_file).workers == 8
+
+
+def test_from_json_invalid_workers(tmp_path, valid_sim_config):
+    valid_sim_config["workers"] = 0
+    config_file = tmp_path / "config.json"
+    with config_file.open("w") as file:
+        json.dump(valid_sim_config, file)
+
+    with pytest.raises(errors.InvalidWorkersError):
+        ConfigData.from_json(config_file)
+
+
+def test_from_json_stop_conditions(tmp_path, valid_sim_config):
+    valid_sim_config["stop_on_collision"] = True
+    valid_sim_config["stop_at_live_bodies"] = 3
+    config_file = tmp_path / "config.json"
+    with config_file.open("w") as file:
+        json.dump(valid_sim_config, file)
+
+    config_data = ConfigData.from_json(config_file)
+    assert config_data.stop_on_collision
+    assert config_data.stop_at_live_bodies == 3
+
+
+@pytest.mark.parametrize("key, value, error", [
+    ("stop_on_collision", 1, errors.InvalidStopOnCollisionError),
+    ("stop_at_live_bodies", -1, errors.InvalidStopAtLiveBodiesError),
+    ("stop_at_live_bodies", 2.0, errors.InvalidStopAtLiveBodiesError)
+])
+def test_from_json_invalid_stop_conditions(tmp_path, valid_sim_config, key, value,
+                                           error):
+    valid_sim_config[key] = value
+    config_file = tmp_path / "config.json"
+    with config_file.open("w") as file:
+        json.dump(valid_sim_config, file)
+
+    with pytest.raises(error):
+        ConfigData.from_json(config_file)
+
+
+def test_from_dict_to_dict(valid_sim_config):
+    config = ConfigData.from_dict(valid_sim_config)
+    assert ConfigData.from_dict(config.to_dict()).to_dict() == config.to_dict()
+    assert config.to_dict()["steps"] == valid_sim_config["steps"]
+
+
+def _save_npz(path, settings, **arrays):
+    with path.open("wb") as file:
+        np.savez(file, settings=np.array(json.dumps(settings)), **arrays)
+
+
+def test_npz_round_trip(tmp_path, valid_sim_config):
+    valid_sim_config["point_objects"].append(
+        {"velocity": [1.5, -2.0], "mass": 3.0, "position": [10.0, 20.0]})
+    valid_sim_config["integrator"] = "leapfrog"
+    config = ConfigData.from_dict(valid_sim_config)
+    config.save(tmp_path / "config.npz")
+    loaded = ConfigData.load(tmp_path / "config.npz")
+    assert loaded.to_dict() == config.to_dict()
+    assert loaded.integrator == "leapfrog"
+    assert loaded.point_objs[1].mass == 3.0
+
+
+def test_npz_integer_arrays(tmp_path, valid_sim_config):
+    del valid_sim_config["point_objects"]
+    _save_npz(tmp_path / "config.npz", valid_sim_config,
+              positions=np.array([[1, 2], [3, 4]]), velocities=np.zeros((2, 2), int),
+              masses=np.array([1, 2]))
+    config = ConfigData.from_npz(tmp_path / "config.npz")
+    np.testing.assert_array_equal(config.point_objs[1].position, [3.0, 4.0])
+
+
+@pytest.mark.parametrize("arrays", [
+    {"positions": np.zeros((2, 2)), "velocities": np.zeros((2, 2))},
+    {"positions": np.zeros((2, 3)), "velocities": np.zeros((2, 2)),
+     "masses": np.ones(2)},
+    {"positions": np.zeros((2, 2)), "velocities": np.zeros((3, 2)),
+     "masses": np.ones(2)},
+    {"positions": np.array([["a", "b"], ["c", "d"]]), "velocities": np.zeros((2, 2)),
+     "masses": np.ones(2)}
+])
+def test_npz_invalid_point_objects(tmp_path, valid_sim_config, arrays):
+    del valid_sim_config["point_objects"]
+    _save_npz(tmp_path / "config.npz", valid_sim_config, **arrays)
+    with pytest.raises(errors.InvalidPointObjectDataError):
+        ConfigData.from_npz(tmp_path / "config.npz")
+
+
+def test_npz_negative_mass(tmp_path, valid_sim_config):
+    del valid_sim_config["point_objects"]
+    _save_npz(tmp_path / "config.npz", valid_sim_config, positions=np.zeros((2, 2)),
+              velocities=np.zeros((2, 2)), masses=np.array([1.0, -1.0]))
+    with pytest.raises(errors.NegativeMassError):
+        ConfigData.from_npz(tmp_path / "config.npz")
+
+
+def test_npz_invalid_settings(tmp_path, invalid_steps_sim_config):
+    del invalid_steps_sim_config["point_objects"]
+    _save_npz(tmp_path / "config.npz", invalid_steps_sim_config,
+              positions=np.zeros((0, 2)), velocities=np.zeros((0, 2)),
+              masses=np.zeros(0))
+    with pytest.raises(errors.InvalidStepsError):
+        ConfigData.from_npz(tmp_path / "config.npz")
+
+
+def test_npz_invalid_file(tmp_path):
+    (tmp_path / "config.npz").write_bytes(b"not a config")
+    with pytest.raises(errors.UnableToOpenConfigError):
+        ConfigData.load(tmp_path / "config.npz")
+    with pytest.raises(errors.UnableToOpenConfigError):
+        ConfigData.load(tmp_path / "missing.npz")
@@ -0,0 +1,54 @@
+import pytest
+import numpy as np
+from integrators import INTEGRATORS, SemiImplicitEuler
+
+# Circular orbit of radius 1000 m with a period of 100 s
+GM = (2 * np.pi * 1000.0 / 100.0)**2 * 1000.0
+
+
+def _acceleration(positions):
+    dist = np.linalg.norm(positions, axis=1)[:, np.newaxis]
+    return -GM * positions / dist**3
+
+
+def _orbit_position_error(integrator_name, time_step, orbits=3):
+    """Distance (meters) from the start after a whole amount of orbits."""
+    integrator = INTEGRATORS[integrator_name]()
+    positions = np.array([[1000.0, 0.0]])
+    velocities = np.array([[0.0, np.sqrt(GM / 1000.0)]])
+    for _ in range(round(orbits * 100 / time_step)):
+        positions, velocities = integrator.step(positions, velocities, _acceleration,
+                                                time_step)
+    return np.linalg.norm(positions[0] - np.array([1000.0, 0.0]))
+
+
+def test_semi_implicit_euler_step():
+    positions, velocities = SemiImplicitEuler().step(
+        np.array([[10.0, 0.0]]), np.array([[0.0, 1.0]]),
+        lambda at_positions: np.array([[-2.0, 0.0]]), 0.5)
+    np.testing.assert_array_equal(velocities, [[-1.0, 1.0]])
+    np.testing.assert_array_equal(positions, [[9.5, 0.5]])
+
+
+def test_leapfrog_more_accurate():
+    assert _orbit_position_error("leapfrog", 1.0) < _orbit_position_error("euler", 1.0)
+
+
+@pytest.mark.parametrize("integrator_name", ["yoshida4", "rk4"])
+def test_fourth_order_integrators_more_accurate(integrator_name):
+    assert (_orbit_position_error(integrator_name, 1.0)
+            < _orbit_position_error("euler", 1.0) / 100)
+
+
+@pytest.mark.parametrize("integrator_name", ["yoshida4", "rk4"])
+def test_fourth_order_integrators_allow_larger_steps(integrator_name):
+    assert _orbit_position_error(integrator_name, 2.0) < _orbit_position_error("euler", 0.5)
+
+
+def test_integrators_dont_modify_inputs():
+    positions = np.array([[1000.0, 0.0]])
+    velocities = np.array([[0.0, 10.0]])
+    for integrator in INTEGRATORS.values():
+        integrator().step(positions, velocities, _acceleration, 1.0)
+        np.testing.assert_array_equal(positions, [[1000.0, 0.0]])
+        np.testing.assert_array_equal(velocities, [[0.0, 10.0]])
@@ -0,0 +1,78 @@
+import numpy as np
+from integrators import Yoshida4
+from kepler import propagate_kepler, pericenter_distances, orbital_periods
+
+MU = 6.67430e-11 * 5e16
+
+
+def _acceleration(positions):
+    dist = np.linalg.norm(positions, axis=1)[:, np.newaxis]
+    return -MU * positions / dist**3
+
+
+def _integrate(positions, velocities, elapsed, substeps=20000):
+    integrator = Yoshida4()
+    for _ in range(substeps):
+        positions, velocities = integrator.step(positions, velocities, _acceleration,
+                                                elapsed / substeps)
+    return positions, velocities
+
+
+def _test_states():
+    positions = np.array([[9000.0, 0.0], [0.0, -3000.0], [2000.0, 2000.0],
+                          [4000.0, 0.0]])
+    velocities = np.array([[0.0, 12.0], [25.0, 0.0], [-40.0, 30.0],
+                           [0.0, np.sqrt(2 * MU / 4000.0)]])  # Elliptic to parabolic
+    return positions, velocities
+
+
+def test_propagate_kepler_matches_integration():
+    positions, velocities = _test_states()
+    expected_positions, expected_velocities = _integrate(positions, velocities, 500.0)
+    new_positions, new_velocities = propagate_kepler(positions, velocities, MU, 500.0)
+    np.testing.assert_allclose(new_positions, expected_positions, atol=1e-3)
+    np.testing.assert_allclose(new_velocities, expected_velocities, atol=1e-5)
+
+
+def test_propagate_kepler_whole_periods():
+    positions = np.array([[9000.0, 0.0], [0.0, 3000.0]])
+    velocities = np.array([[0.0, 12.0], [-30.0, 5.0]])
+    periods = orbital_periods(positions, velocities, MU)
+    for index in range(2):
+        new_positions, _ = propagate_kepler(positions[index:index + 1],
+                                            velocities[index:index + 1], MU,
+                                            1000 * periods[index])
+        np.testing.assert_allclose(new_positions[0], positions[index], atol=1e-3)
+
+
+def test_propagate_kepler_conserves_energy():
+    positions, velocities = _test_states()
+    new_positions, new_velocities = propagate_kepler(positions, velocities, MU, 1.0e6)
+
+    def energy(pos, vel):
+        return (np.sum(vel**2, axis=1) / 2 - MU / np.linalg.norm(pos, axis=1))
+    np.testing.assert_allclose(energy(new_positions, new_velocities),
+                               energy(positions, velocities), rtol=1e-8, atol=1e-12)
+
+
+def test_pericenter_distances():
+    speed = np.sqrt(MU * (2 / 9000.0 - 1 / 5000.0))
+    distances = pericenter_distances(np.array([[9000.0, 0.0]]),
+                                     np.array([[0.0, speed]]), MU)
+    np.testing.assert_allclose(distances, [1000.0])
+
+
+def test_orbital_periods_unbound():
+    periods = orbital_periods(np.array([[1000.0, 0.0]]), np.array([[0.0, 1000.0]]), MU)
+    assert np.isinf(periods[0])
+
+
+def test_kepler_without_mass():
+    positions, velocities = _test_states()
+    new_positions, new_velocities = propagate_kepler(positions, velocities, 0.0, 10.0)
+    np.testing.assert_allclose(new_positions, positions + 10.0 * velocities)
+    np.testing.assert_array_equal(new_velocities, velocities)
+    distances = pericenter_distances(np.array([[3.0, -4.0], [5.0, 0.0]]),
+                                     np.array([[0.0, 2.0], [0.0, 0.0]]), 0.0)
+    np.testing.assert_allclose(distances, [3.0, 5.0])
+    assert np.isinf(orbital_periods(positions, velocities, 0.0)).all()
@@ -0,0 +1,101 @@
+import pytest
+import numpy as np
+from neighbour_search import NEIGHBOUR_SEARCHES, SpatialHash, find_duplicate_points
+
+
+def _brute_force_pairs(points, queries, radius):
+    pairs = set()
+    for query_index, query in enumerate(queries):
+        for point_index, point in enumerate(points):
+            if np.linalg.norm(point - query) <= radius:
+                pairs.add((query_index, point_index))
+    return pairs
+
+
+@pytest.fixture(params=NEIGHBOUR_SEARCHES.keys())
+def neighbour_search(request):
+    if request.param == "kdtree":
+        pytest.importorskip("scipy")
+    return NEIGHBOUR_SEARCHES[request.param]
+
+
+def test_query_pairs_matches_brute_force(neighbour_search):
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-50.0, 50.0, (200, 2))
+    queries = rng.uniform(-60.0, 60.0, (50, 2))
+    query_indexes, point_indexes = neighbour_search(points, 5.0).query_pairs(queries,
+                                                                             5.0)
+    found = set(zip(query_indexes.tolist(), point_indexes.tolist()))
+    assert len(found) == len(query_indexes)
+    assert found == _brute_force_pairs(points, queries, 5.0)
+
+
+def test_query_pairs_nan_points_matches_brute_force(neighbour_search):
+    rng = np.random.default_rng(1)
+    points = rng.uniform(-50.0, 50.0, (200, 2))
+    points[rng.choice(200, 40, replace=False)] = np.nan
+    queries = rng.uniform(-60.0, 60.0, (50, 2))
+    query_indexes, point_indexes = neighbour_search(points, 5.0).query_pairs(queries,
+                                                                             5.0)
+    found = set(zip(query_indexes.tolist(), point_indexes.tolist()))
+    assert len(found) == len(query_indexes)
+    assert found == _brute_force_pairs(points, queries, 5.0)
+
+
+def test_query_pairs_on_radius_border(neighbour_search):
+    points = np.array([[0.0, 0.0], [2.0, 0.0], [-2.0, 0.0], [2.0, 2.0]])
+    query_indexes, point_indexes = neighbour_search(points, 2.0).query_pairs(
+        points[:1], 2.0)
+    assert query_indexes.tolist() == [0, 0, 0]
+    assert sorted(point_indexes.tolist()) == [0, 1, 2]
+
+
+def test_spatial_hash_huge_span():
+    points = np.array([[0.0, 0.0], [1.0, 0.0], [1.0e30, 1.0e30]])
+    spatial_hash = SpatialHash(points, 1.0)
+    assert spatial_hash.cell_size > 1.0
+    _, point_indexes = spatial_hash.query_pairs(points[:1], 1.0)
+    assert sorted(point_indexes.tolist()) == [0, 1]
+
+
+def test_query_pairs_empty(neighbour_search):
+    query_indexes, point_indexes = neighbour_search(np.empty((0, 2)), 1.0).query_pairs(
+        np.array([[0.0, 0.0]]), 1.0)
+    assert len(query_indexes) == 0
+    assert len(point_indexes) == 0
+
+
+def test_query_pairs_nan_queries_ignored(neighbour_search):
+    points = np.array([[0.0, 0.0]])
+    query_indexes, _ = neighbour_search(points, 1.0).query_pairs(
+        np.array([[np.nan, np.nan], [0.5, 0.0]]), 1.0)
+    assert query_indexes.tolist() == [1]
+
+
+def test_find_duplicate_points():
+    points = np.array([[0.0, 0.0], [3.0, 1.0], [0.0, 0.0], [3.0, 2.0], [3.0, 1.0]])
+    assert find_duplicate_points(points).tolist() == [0, 1, 2, 4]
+
+
+def test_find_duplicate_points_sparse():
+    points = np.array([[0.0, 0.0], [1.0e6, -1.0e6], [5.0, 5.0], [1.0e6, -1.0e6]])
+    assert find_duplicate_points(points).tolist() == [1, 3]
+
+
+def test_find_duplicate_points_huge_coordinates():
+    points = np.array([[1.0e20, 0.0], [0.0, 0.0], [1.0e20, 0.0], [1.0e20, 1.0]])
+    assert find_duplicate_points(points).tolist() == [0, 2]
+
+
+def test_find_duplicate_points_nan():
+    points = np.array([[np.nan, np.nan], [np.nan, np.nan], [1.0, 1.0], [1.0, 1.0]])
+    assert find_duplicate_points(points).tolist() == [2, 3]
+
+
+def test_find_duplicate_points_matches_unique():
+    rng = np.random.default_rng(0)
+    points = rng.integers(-30, 30, (500, 2)).astype(float)
+    _, inverse, count = np.unique(points, return_inverse=True, return_counts=True,
+                                  axis=0)
+    expected = np.flatnonzero(count[inverse] > 1)
+    np.testing.assert_array_equal(find_duplicate_points(points), expected)
@@ -0,0 +1,71 @@
+import json
+import pytest
+import profiler
+from profiler import Profiler, profiled
+
+
+@profiled("outer", lambda values: len(values))
+def _outer(values: list[int]) -> int:
+    return sum(_inner(value) for value in values)
+
+
+@profiled("inner")
+def _inner(value: int) -> int:
+    return value * 2
+
+
+def test_profiled_disabled():
+    assert profiler._active_profiler is None
+    assert _outer([1, 2, 3]) == 12
+    assert _outer.__name__ == "_outer"
+
+
+def test_profiler_stats():
+    with Profiler() as active:
+        assert _outer([1, 2, 3]) == 12
+        assert _outer([4]) == 8
+    assert profiler._active_profiler is None
+    # Calls after the profiler stopped aren't recorded
+    _outer([5])
+    assert set(active.stats) == {"outer", "inner"}
+    assert active.stats["outer"].calls == 2
+    assert active.stats["outer"].items == 4
+    assert active.stats["outer"].items_per_call == 2.0
+    assert active.stats["inner"].calls == 4
+    # Nested phases are included in the time of the outer one
+    assert active.stats["outer"].seconds >= active.stats["inner"].seconds
+    summary = active.format_summary()
+    assert summary.splitlines()[1].startswith("outer")
+
+
+def test_profiler_exception():
+    @profiled("failing")
+    def failing():
+        raise ValueError
+
+    with Profiler() as active:
+        with pytest.raises(ValueError):
+            failing()
+    assert active.stats["failing"].calls == 1
+
+
+def test_profiler_nested():
+    with Profiler() as outer:
+        with Profiler() as inner:
+            _inner(1)
+        _inner(2)
+    assert inner.stats["inner"].calls == 1
+    assert outer.stats["inner"].calls == 1
+
+
+def test_profiler_trace(tmp_path):
+    with Profiler(trace=True) as active:
+        _outer([1, 2])
+    active.save_trace(tmp_path / "trace.json")
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert sorted(event["name"] for event in events) == ["inner", "inner", "outer"]
+    outer = next(event for event in events if event["name"] == "outer")
+    assert outer["ph"] == "X" and outer["args"]["items"] == 2
+    for event in events:
+        if event["name"] == "inner":
+            assert outer["ts"] <= event["ts"] <= outer["ts"] + outer["dur"]
@@ -0,0 +1,48 @@
+import io
+import json
+import pytest
+import errors
+from progress import ProgressReporter
+
+
+@pytest.mark.parametrize("options", [
+    {"every_seconds": 0}, {"every_seconds": -1.0}, {"metrics_every_seconds": "1"}
+])
+def test_progress_reporter_invalid_interval(options):
+    with pytest.raises(errors.InvalidProgressIntervalError):
+        ProgressReporter(**options)
+
+
+def test_progress_reporter_line():
+    stream = io.StringIO()
+    reporter = ProgressReporter(stream, every_seconds=1e-9)
+    assert not reporter.due(0)
+    assert reporter.due(1)
+    reporter.report(50, 200, 10, 3, 4)
+    assert stream.getvalue().startswith("\rstep 50/200 (25.0%), ")
+    assert stream.getvalue().endswith("live bodies: 10, collisions: 3, close calls: 4")
+    reporter.report(200, 200, 1000, 3, 4, final=True)
+    reporter.close()
+    # The whole previous line is overwritten, the last one ends the output
+    lines = stream.getvalue().split("\r")
+    assert len(lines[2]) >= len(lines[1])
+    assert "ETA 0:00:00" in lines[2] and lines[2].endswith("\n")
+
+
+def test_progress_reporter_throttled(tmp_path):
+    stream = io.StringIO()
+    path = tmp_path / "metrics.jsonl"
+    reporter = ProgressReporter(stream, 3600.0, path, 3600.0)
+    reporter.due(0)
+    assert not reporter.due(1)
+    reporter.report(1, 10, 5, 0, 0)
+    assert stream.getvalue() == ""
+    # The final report ignores the intervals
+    reporter.report(10, 10, 5, 1, 2, final=True)
+    reporter.close()
+    metrics = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(metrics) == 1
+    assert metrics[0]["step"] == 10 and metrics[0]["steps"] == 10
+    assert metrics[0]["collisions"] == 1 and metrics[0]["close_calls"] == 2
+    assert metrics[0]["eta_seconds"] == pytest.approx(0.0)
+    assert stream.getvalue().endswith("\n")
@@ -1,9 +1,11 @@
+import json
 import pytest
 import errors
 import numpy as np
 from space_object import SpaceObject
 from center_object import CenterObject
 from point_object import PointObject
+from body_table import BodyTable
 
 
 def test_space_object_defaults():
@@ -122,3 +124,72 @@ def test_point_object_verify_vector_correct():
 
 def test_point_object_verify_vector_incorrect():
     assert not PointObject._verify_vector(np.array([1, 2, 3.0, "g"]))
+
+
+def test_point_object_is_slotted_handle():
+    point_obj = PointObject(np.array([1.0, 2.0]), 3.0, np.array([4.0, 5.0]))
+    assert not hasattr(point_obj, "__dict__")
+    point_obj.set_position(np.array([6.0, 7.0]))
+    # Updates are written in place into the body table
+    assert np.shares_memory(point_obj.position, point_obj.body_table.positions)
+    np.testing.assert_array_equal(point_obj.body_table.positions[point_obj.index],
+                                  [6.0, 7.0])
+
+
+def test_point_object_from_body_table():
+    table = BodyTable(np.arange(6).reshape(3, 2), -np.arange(6).reshape(3, 2),
+                      [1.0, 2.0, 3.0])
+    point_objs = PointObject.from_body_table(table)
+    assert [obj.index for obj in point_objs] == [0, 1, 2]
+    np.testing.assert_array_equal(point_objs[1].position, [2, 3])
+    np.testing.assert_array_equal(point_objs[2].velocity, [-4, -5])
+    assert point_objs[2].mass == 3.0
+    point_objs[0].set_velocity(np.array([9.0, 9.0]))
+    np.testing.assert_array_equal(table.velocities[0], [9.0, 9.0])
+
+
+def test_point_object_from_json_list():
+    json_data = [{"position": [1, 2], "mass": 3, "velocity": [4, 5]},
+                 {"position": [6, 7], "mass": 8.5, "velocity": [9, 10]}]
+    point_objs = PointObject.from_json_list(json_data)
+    assert point_objs[0].body_table is point_objs[1].body_table
+    assert [obj.serialize() for obj in point_objs] == json_data
+    assert PointObject.serialize_all(point_objs) == json_data
+
+
+def test_space_objects_json_round_trip():
+    point_text = json.dumps([{"velocity": [0, 1], "mass": 1000, "position": [0.5, -2]},
+                             {"velocity": [1.5, 0], "mass": 2.5e30,
+                              "position": [3, 4]}])
+    point_objs = PointObject.from_json_list(json.loads(point_text))
+    # Integer values stay integer, though the objects store them as floats
+    assert json.dumps(PointObject.serialize_all(point_objs)) == point_text
+    assert json.dumps([obj.serialize() for obj in point_objs]) == point_text
+    center_text = json.dumps({"diameter": 10, "mass": 1000})
+    center_obj = CenterObject.from_json(json.loads(center_text))
+    assert json.dumps(center_obj.serialize()) == center_text
+
+
+@pytest.mark.parametrize("json_data, error", [
+    ({"position": [1, "2"], "mass": 3, "velocity": [4, 5]},
+     errors.InvalidPointObjectDataError),
+    ({"position": [1, 2, 3], "mass": 3, "velocity": [4, 5]},
+     errors.InvalidPointObjectDataError),
+    ({"position": [1, 2], "mass": -3, "velocity": [4, 5]}, errors.NegativeMassError)
+])
+def test_point_object_from_json_list_invalid_data(json_data, error):
+    with pytest.raises(error):
+        PointObject.from_json_list([{"position": [0, 0], "mass": 1,
+                                     "velocity": [0, 0]}, json_data])
+
+
+def test_body_table_mixed_point_objects():
+    shared = PointObject.from_body_table(BodyTable(np.zeros((2, 2)), np.zeros((2, 2)),
+                                                   [1.0, 2.0]))
+    point_objs = [shared[1], PointObject(np.array([5.0, 5.0]), 3.0), shared[0]]
+    table = BodyTable.from_point_objects(point_objs)
+    np.testing.assert_array_equal(table.masses, [2.0, 3.0, 1.0])
+    table.positions[:] = [[1.0, 1.0], [2.0, 2.0], [3.0, 3.0]]
+    table.sync_to_point_objects(point_objs)
+    np.testing.assert_array_equal(shared[0].position, [3.0, 3.0])
+    np.testing.assert_array_equal(point_objs[1].position, [2.0, 2.0])
@@ -1,7 +1,14 @@
+import json
+import pytest
+import warnings
 import numpy as np
+import errors
 from center_object import CenterObject
 from point_object import PointObject
 from simulation import Simulation
+from space_event import SpaceEvent
+from checkpoint import Checkpoint, CheckpointWriter
+from progress import ProgressReporter
 
 
 def test_simulation_calculate_acceleration():
@@ -89,9 +96,454 @@ def test_simulation_run():
     output = simulation.run(20)
     sim_steps = output.simulation_steps
     collisions = output.collisions
-    assert len(sim_steps) == 21
+    # The run stops once the only object has collided
+    assert len(sim_steps) == 13
     np.testing.assert_array_equal(sim_steps[0][0], np.array([0.0, 20.0]))
     np.testing.assert_array_equal(sim_steps[-1][0], np.array([np.nan, np.nan]))
     assert len(collisions) == 1
     assert collisions[0].point_obj_indexes == [0]
     assert collisions[0].step == 11
+
+
+def _reference_run(simulation: Simulation, steps: int):
+    """
+    Straightforward per-object implementation of the simulation loop, used to
+    check that the batched engine produces the same trajectories and events.
+    """
+    center_obj = simulation.center_obj
+    point_objs = simulation.point_objs
+    sim_steps = [[obj.position.copy() for obj in point_objs]]
+    collisions = []
+    close_calls = []
+    blacklist = []
+    for step in range(steps):
+        indexes = simulation._check_for_collisions(sim_steps[-1])
+        if len(indexes) > 0:
+            collisions.append(SpaceEvent(step, indexes))
+        blacklist.extend(indexes)
+
+        positions = [np.array([np.nan, np.nan])] * len(point_objs)
+        for index, point_obj in enumerate(point_objs):
+            if index in blacklist:
+                continue
+            cc_for_obj = [other_index for other_index, obj in enumerate(point_objs)
+                          if obj is not point_obj
+                          and np.linalg.norm(obj.position - point_obj.position)
+                          <= simulation._close_call_distance]
+            if len(cc_for_obj) > 0:
+                cc_event = SpaceEvent(step, sorted(cc_for_obj + [index]))
+                if cc_event not in close_calls:
+                    close_calls.append(cc_event)
+            dist_vector = center_obj.position - point_obj.position
+            dist = np.linalg.norm(dist_vector)
+            force = (center_obj.mass * point_obj.mass * 6.67430e-11) / (dist**2)
+            accel_vector = force * (dist_vector / dist) / point_obj.mass
+            point_obj.set_velocity(point_obj.velocity + accel_vector)
+            pos = point_obj.position + point_obj.velocity
+            if np.linalg.norm(center_obj.position - pos) <= center_obj.diameter / 2:
+                collisions.append(SpaceEvent(step, [index]))
+                blacklist.append(index)
+            else:
+                positions[index] = pos
+                point_obj.set_position(pos)
+        sim_steps.append(positions)
+    return sim_steps, collisions, close_calls
+
+
+def _random_point_objs(seed: int, n: int) -> list[PointObject]:
+    rng = np.random.default_rng(seed)
+    angles = rng.uniform(0, 2 * np.pi, n)
+    radii = rng.uniform(40.0, 120.0, n)
+    positions = np.stack((radii * np.cos(angles), radii * np.sin(angles)), axis=1)
+    velocities = rng.normal(0.0, 3.0, (n, 2))
+    return [PointObject(positions[i], 1.0, velocities[i]) for i in range(n)]
+
+
+@pytest.mark.parametrize("neighbour_search", ["grid", "sweep", "kdtree"])
+def test_simulation_run_matches_reference(neighbour_search):
+    if neighbour_search == "kdtree":
+        pytest.importorskip("scipy")
+    center_obj = CenterObject(20.0, 1e14)
+    reference = Simulation(4.0, 6.0, center_obj, _random_point_objs(1, 60))
+    expected_steps, expected_collisions, expected_close_calls = \
+        _reference_run(reference, 40)
+
+    simulation = Simulation(4.0, 6.0, center_obj, _random_point_objs(1, 60),
+                            neighbour_search)
+    output = simulation.run(40)
+
+    assert len(expected_collisions) > 1
+    assert len(expected_close_calls) > 1
+    np.testing.assert_allclose(np.array(output.simulation_steps),
+                               np.array(expected_steps))
+    assert output.collisions == expected_collisions
+    assert output.close_calls == expected_close_calls
+    for obj, expected_obj in zip(simulation.point_objs, reference.point_objs):
+        np.testing.assert_allclose(obj.position, expected_obj.position)
+        np.testing.assert_allclose(obj.velocity, expected_obj.velocity)
+
+
+@pytest.mark.parametrize("neighbour_search", ["grid", "sweep", "kdtree"])
+def test_simulation_run_matches_reference_after_center_hit(neighbour_search):
+    if neighbour_search == "kdtree":
+        pytest.importorskip("scipy")
+    def point_objs():
+        return [PointObject(np.array(position))
+                for position in ([0.0, 0.0], [100.0, 0.0], [102.0, 0.0])]
+
+    center_obj = CenterObject(1.0, 1.0)
+    reference = Simulation(1.0, 5.0, center_obj, point_objs())
+    simulation = Simulation(1.0, 5.0, center_obj, point_objs(), neighbour_search)
+    # The object at the center gets a NaN position, which mustn't be indexed
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        _, _, expected_close_calls = _reference_run(reference, 3)
+        output = simulation.run(3)
+    assert expected_close_calls == [SpaceEvent(step, [1, 2]) for step in range(3)]
+    assert output.close_calls == expected_close_calls
+
+
+def test_simulation_invalid_neighbour_search():
+    with pytest.raises(errors.InvalidNeighbourSearchError):
+        Simulation(1.0, 1.0, CenterObject(), [], "octree")
+
+
+def test_simulation_run_close_call_dedupe_step():
+    simulation = Simulation(1.0, 5.0, CenterObject(1.0, 1.0),
+                            [PointObject(np.array([100.0, 0.0])),
+                             PointObject(np.array([102.0, 0.0]))])
+    output = simulation.run(3)
+    assert output.close_calls == [SpaceEvent(0, [0, 1]), SpaceEvent(1, [0, 1]),
+                                  SpaceEvent(2, [0, 1])]
+
+
+def test_simulation_run_close_call_dedupe_run():
+    simulation = Simulation(1.0, 5.0, CenterObject(1.0, 1.0),
+                            [PointObject(np.array([100.0, 0.0])),
+                             PointObject(np.array([102.0, 0.0]))],
+                            close_call_dedupe="run")
+    output = simulation.run(3)
+    assert output.close_calls == [SpaceEvent(0, [0, 1])]
+
+
+def test_simulation_invalid_close_call_dedupe():
+    with pytest.raises(errors.InvalidCloseCallDedupeError):
+        Simulation(1.0, 1.0, CenterObject(), [], close_call_dedupe="forever")
+
+
+def test_simulation_invalid_integrator():
+    with pytest.raises(errors.InvalidIntegratorError):
+        Simulation(1.0, 1.0, CenterObject(), [], integrator="midpoint")
+
+
+@pytest.mark.parametrize("integrator", ["leapfrog", "yoshida4", "rk4"])
+def test_simulation_run_integrator(integrator):
+    center_obj = CenterObject(1.0, 1.0e20)
+    point_obj = PointObject(np.array([5000.0, 0.0]), 1.0e3, np.array([0.0, 0.0]))
+    simulation = Simulation(1.0, 1.0, center_obj, [point_obj], integrator=integrator)
+    output = simulation.run(1)
+    # Falling straight towards the center from rest covers a * t^2 / 2,
+    # half of what semi-implicit Euler estimates
+    assert output.simulation_steps[1][0][1] == 0.0
+    np.testing.assert_allclose(output.simulation_steps[1][0][0], 5000 - 266.952 / 2,
+                               atol=2.0)
+
+
+def test_simulation_invalid_time_step():
+    with pytest.raises(errors.InvalidTimeStepError):
+        Simulation(1.0, 1.0, CenterObject(), [], time_step=0.0)
+
+
+def test_simulation_run_time_step():
+    center_obj = CenterObject(1.0, 1.0e20)
+    point_obj = PointObject(np.array([5000.0, 0.0]), 1.0e3, np.array([0.0, 0.0]))
+    simulation = Simulation(1.0, 1.0, center_obj, [point_obj], time_step=0.5)
+    output = simulation.run(1)
+    np.testing.assert_almost_equal(output.simulation_steps[1][0],
+                                   np.array([5000 - 266.952 / 4, 0]), 1)
+
+
+def _eccentric_orbit_end(time_step, steps, adaptive_time_step):
+    # Orbit with pericenter at 1000 m and apocenter at 9000 m around a center
+    # object of mass M = 5e16 kg, starting at apocenter
+    gm = 6.67430e-11 * 5e16
+    semi_major_axis = 5000.0
+    speed = np.sqrt(gm * (2 / 9000.0 - 1 / semi_major_axis))
+    point_obj = PointObject(np.array([9000.0, 0.0]), 1.0, np.array([0.0, speed]))
+    simulation = Simulation(1.0, 1.0, CenterObject(10.0, 5e16), [point_obj],
+                            integrator="leapfrog", time_step=time_step,
+                            adaptive_time_step=adaptive_time_step)
+    output = simulation.run(steps)
+    return output.simulation_steps[-1][0]
+
+
+def test_simulation_run_adaptive_time_step():
+    expected = _eccentric_orbit_end(1.0, 1000, False)
+    fixed = _eccentric_orbit_end(10.0, 100, False)
+    adaptive = _eccentric_orbit_end(10.0, 100, True)
+    assert np.linalg.norm(adaptive - expected) < np.linalg.norm(fixed - expected) / 10
+
+
+def test_simulation_run_adaptive_time_step_center_collision():
+    simulation = Simulation(1.0, 1.0, CenterObject(10.0, 1e12),
+                            [PointObject(np.array([0.0, 20.0]))], time_step=20.0,
+                            adaptive_time_step=True)
+    output = simulation.run(2)
+    assert output.collisions == [SpaceEvent(0, [0])]
+    np.testing.assert_array_equal(output.simulation_steps[1][0], [np.nan, np.nan])
+
+
+def test_simulation_invalid_propagator():
+    with pytest.raises(errors.InvalidPropagatorError):
+        Simulation(1.0, 1.0, CenterObject(), [], propagator="analytic")
+
+
+def test_simulation_run_kepler_circular_orbit():
+    # Circular orbit of radius 1000 m with a period of 100 s
+    mass = (2 * np.pi * 1000.0 / 100.0)**2 * 1000.0 / 6.67430e-11
+    speed = 2 * np.pi * 1000.0 / 100.0
+    point_obj = PointObject(np.array([1000.0, 0.0]), 1.0, np.array([0.0, speed]))
+    simulation = Simulation(1.0, 1.0, CenterObject(10.0, mass), [point_obj],
+                            time_step=25.0, propagator="kepler")
+    output = simulation.run(4)
+    expected = [[1000.0, 0.0], [0.0, 1000.0], [-1000.0, 0.0], [0.0, -1000.0],
+                [1000.0, 0.0]]
+    np.testing.assert_allclose(np.array(output.simulation_steps)[:, 0], expected,
+                               atol=1e-6)
+    np.testing.assert_allclose(simulation.point_objs[0].velocity, [0.0, speed],
+                               atol=1e-9)
+    assert output.collisions == []
+
+
+def test_simulation_run_kepler_collision_between_samples():
+    # Nearly radial orbit diving through the center object between two samples
+    point_obj = PointObject(np.array([0.0, 1000.0]), 1.0, np.array([0.5, 0.0]))
+    simulation = Simulation(1.0, 1.0, CenterObject(100.0, 1e16), [point_obj],
+                            time_step=1000.0, propagator="kepler")
+    output = simulation.run(3)
+    assert output.collisions == [SpaceEvent(0, [0])]
+
+
+def test_simulation_iterate_matches_run():
+    center_obj = CenterObject(20.0, 1e14)
+    output = Simulation(4.0, 6.0, center_obj, _random_point_objs(2, 30)).run(25)
+    chunks = list(Simulation(4.0, 6.0, center_obj,
+                             _random_point_objs(2, 30)).iterate(25, chunk_size=7))
+    assert [chunk.start_step for chunk in chunks] == [0, 7, 14, 21]
+    assert chunks[-1].end_step == 26
+    np.testing.assert_array_equal(
+        np.concatenate([chunk.positions for chunk in chunks]),
+        np.array(output.simulation_steps))
+    assert sum((chunk.collisions for chunk in chunks), []) == output.collisions
+    assert sum((chunk.close_calls for chunk in chunks), []) == output.close_calls
+    for chunk in chunks:
+        assert all(chunk.start_step <= event.step + 1 < chunk.end_step
+                   for event in chunk.collisions + chunk.close_calls)
+
+
+def test_simulation_iterate_close_syncs_point_objs():
+    point_obj = PointObject(np.array([0.0, 100.0]), 1.0, np.array([1.0, 0.0]))
+    simulation = Simulation(1.0, 1.0, CenterObject(1.0, 1.0), [point_obj])
+    chunks = simulation.iterate(10, chunk_size=2)
+    next(chunks)
+    next(chunks)
+    chunks.close()
+    # Steps up to the second chunk have been run
+    np.testing.assert_allclose(point_obj.position, [3.0, 100.0], atol=1e-6)
+
+
+def test_simulation_run_float32_output():
+    center_obj = CenterObject(10.0, 1.0e20)
+    point_objs = _random_point_objs(3, 10)
+    output = Simulation(4.0, 6.0, center_obj, point_objs).run(10, np.float32)
+    assert output.simulation_steps.dtype == np.float32
+    assert output.simulation_steps.shape == (11, 10, 2)
+
+
+@pytest.mark.parametrize("options", [{}, {"adaptive_time_step": True},
+                                     {"propagator": "kepler"}])
+def test_simulation_run_workers_match_single_process(options):
+    center_obj = CenterObject(10.0, 1.0e16)
+    expected_objs = _random_point_objs(2, 200)
+    expected = Simulation(4.0, 6.0, center_obj, expected_objs, **options).run(30)
+    # Close calls are looked for by the workers as well
+    assert len({event.step for event in expected.close_calls}) > 1
+    point_objs = _random_point_objs(2, 200)
+    simulation = Simulation(4.0, 6.0, center_obj, point_objs, workers=3, **options)
+    # Small blocks, so collisions have to be passed on to the workers between them
+    simulation._CHUNK_POSITIONS = 1000
+    output = simulation.run(30)
+    np.testing.assert_array_equal(output.simulation_steps, expected.simulation_steps)
+    assert output.collisions == expected.collisions
+    assert output.close_calls == expected.close_calls
+    for obj, expected_obj in zip(point_objs, expected_objs):
+        np.testing.assert_array_equal(obj.position, expected_obj.position)
+        np.testing.assert_array_equal(obj.velocity, expected_obj.velocity)
+
+
+@pytest.mark.parametrize("workers", [0, -1, 2.0])
+def test_simulation_invalid_workers(workers):
+    with pytest.raises(errors.InvalidWorkersError):
+        Simulation(1.0, 1.0, CenterObject(), [], workers=workers)
+
+
+# On exact orbits every object would fall into the heavier center object right away,
+# ending the run before the first checkpoint
+@pytest.mark.parametrize("options, center_mass", [
+    ({}, 1.0e20), ({"close_call_dedupe": "run"}, 1.0e20),
+    ({"propagator": "kepler"}, 1.0e16), ({"workers": 2}, 1.0e20)
+])
+def test_simulation_resume_from_checkpoint(tmp_path, options, center_mass):
+    center_obj = CenterObject(10.0, center_mass)
+    expected_objs = _random_point_objs(2, 200)
+    expected = Simulation(4.0, 6.0, center_obj, expected_objs, **options).run(30)
+    assert len(expected.collisions) > 0 and len(expected.close_calls) > 0
+
+    # The run is interrupted after a few chunks, past the second checkpoint
+    path = tmp_path / "run.ckpt.npz"
+    simulation = Simulation(4.0, 6.0, center_obj, _random_point_objs(2, 200),
+                            **options)
+    chunks = simulation.iterate(30, 5, CheckpointWriter(path, every_steps=7))
+    for chunk in chunks:
+        np.testing.assert_array_equal(chunk.positions,
+                                      expected.simulation_steps[chunk.start_step:
+                                                                chunk.end_step])
+        if chunk.end_step > 16:
+            break
+    chunks.close()
+    checkpoint = Checkpoint.load(path)
+    assert checkpoint.step == 14
+
+    point_objs = _random_point_objs(2, 200)
+    simulation = Simulation(4.0, 6.0, center_obj, point_objs, **options)
+    output = simulation.run(30, resume_from=checkpoint)
+    assert np.isnan(output.simulation_steps[:14]).all()
+    np.testing.assert_array_equal(output.simulation_steps[14:],
+                                  expected.simulation_steps[14:])
+    assert output.collisions == expected.collisions
+    assert output.close_calls == expected.close_calls
+    for obj, expected_obj in zip(point_objs, expected_objs):
+        np.testing.assert_array_equal(obj.position, expected_obj.position)
+        np.testing.assert_array_equal(obj.velocity, expected_obj.velocity)
+
+
+def test_simulation_checkpoints_every_steps(tmp_path):
+    path = tmp_path / "run.ckpt.npz"
+    simulation = Simulation(4.0, 6.0, CenterObject(10.0, 1.0e20),
+                            _random_point_objs(2, 50))
+    chunks = list(simulation.iterate(20, 8, CheckpointWriter(path, every_steps=6)))
+    # Chunks end early, right before each checkpoint
+    assert [chunk.start_step for chunk in chunks] == [0, 7, 13, 19]
+    assert Checkpoint.load(path).step == 18
+
+
+def test_simulation_resume_mismatch():
+    checkpoint = Checkpoint(5, np.zeros((3, 2)), np.zeros((3, 2)), np.ones(3, bool),
+                            np.zeros((3, 2)), np.zeros((3, 2)), [], [])
+    simulation = Simulation(1.0, 1.0, CenterObject(), _random_point_objs(0, 4))
+    with pytest.raises(errors.CheckpointMismatchError):
+        simulation.run(10, resume_from=checkpoint)
+    simulation = Simulation(1.0, 1.0, CenterObject(), _random_point_objs(0, 3))
+    with pytest.raises(errors.CheckpointMismatchError):
+        simulation.run(4, resume_from=checkpoint)
+
+
+def test_simulation_progress_metrics(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    center_obj = CenterObject(10.0, 1.0e20)
+    expected = Simulation(4.0, 6.0, center_obj, _random_point_objs(2, 100)).run(20)
+    simulation = Simulation(4.0, 6.0, center_obj, _random_point_objs(2, 100))
+    output = simulation.run(20, progress_reporter=ProgressReporter(
+        metrics_path=path, metrics_every_seconds=1e-9))
+    np.testing.assert_array_equal(output.simulation_steps, expected.simulation_steps)
+    metrics = [json.loads(line) for line in path.read_text().splitlines()]
+    # Every step after the first one is due, then the final report follows
+    assert [entry["step"] for entry in metrics] == list(range(2, 21)) + [20]
+    assert metrics[-1]["final"] and not metrics[-2]["final"]
+    assert metrics[-1]["collisions"] == len(expected.collisions)
+    assert metrics[-1]["close_calls"] == len(expected.close_calls)
+    assert metrics[-1]["live_bodies"] == \
+        np.count_nonzero(~np.isnan(expected.simulation_steps[-1, :, 0]))
+
+
+def test_simulation_stop_on_collision():
+    center_obj = CenterObject(10.0, 1.0e20)
+    expected = Simulation(4.0, 6.0, center_obj, _random_point_objs(5, 100)).run(40)
+    first_step = expected.collisions[0].step
+    simulation = Simulation(4.0, 6.0, center_obj, _random_point_objs(5, 100),
+                            stop_on_collision=True)
+    chunks = list(simulation.iterate(40, 4))
+    # The last chunk ends with the step after the first collision
+    assert chunks[-1].end_step == first_step + 2
+    output = Simulation(4.0, 6.0, center_obj, _random_point_objs(5, 100),
+                        stop_on_collision=True).run(40)
+    np.testing.assert_array_equal(output.simulation_steps,
+                                  expected.simulation_steps[:first_step + 2])
+    assert output.collisions == [event for event in expected.collisions
+                                 if event.step == first_step]
+
+
+def test_simulation_stop_at_live_bodies():
+    center_obj = CenterObject(10.0, 1.0e20)
+    expected = Simulation(4.0, 6.0, center_obj, _random_point_objs(5, 100)).run(40)
+    live = np.count_nonzero(~np.isnan(expected.simulation_steps[:, :, 0]), axis=1)
+    assert live[-1] < 99
+    output = Simulation(4.0, 6.0, center_obj, _random_point_objs(5, 100),
+                        stop_at_live_bodies=99).run(40)
+    # Steps go on until the first one with at most 99 live objects
+    end = np.flatnonzero(live <= 99)[0]
+    np.testing.assert_array_equal(output.simulation_steps,
+                                  expected.simulation_steps[:end + 1])
+
+
+def test_simulation_stops_without_live_bodies():
+    simulation = Simulation(1.0, 1.0, CenterObject(), [])
+    assert len(simulation.run(10).simulation_steps) == 1
+
+
+@pytest.mark.parametrize("options, error", [
+    ({"stop_on_collision": "yes"}, errors.InvalidStopOnCollisionError),
+    ({"stop_at_live_bodies": -1}, errors.InvalidStopAtLiveBodiesError)
+])
+def test_simulation_invalid_stop_conditions(options, error):
+    with pytest.raises(error):
+        Simulation(1.0, 1.0, CenterObject(), [], **options)
+
+
+def test_simulation_kepler_massless_center_object():
+    point_objs = [PointObject(np.array([0.0, 20.0]), 1.0, np.array([0.5, -2.0])),
+                  PointObject(np.array([40.0, 0.0]), 1.0, np.array([0.0, 1.0]))]
+    expected = Simulation(1.0, 0.1, CenterObject(10.0, 0.0), point_objs).run(20)
+    point_objs = [PointObject(np.array([0.0, 20.0]), 1.0, np.array([0.5, -2.0])),
+                  PointObject(np.array([40.0, 0.0]), 1.0, np.array([0.0, 1.0]))]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        output = Simulation(1.0, 0.1, CenterObject(10.0, 0.0), point_objs,
+                            propagator="kepler").run(20)
+    # Objects move in straight lines like with the numeric propagator
+    np.testing.assert_allclose(output.simulation_steps, expected.simulation_steps)
+    assert output.collisions == expected.collisions
+    assert [event.point_obj_indexes for event in output.collisions] == [[0]]
+
+
+def test_simulation_reuses_close_call_searches():
+    simulation = Simulation(4.0, 6.0, CenterObject(10.0, 1.0e20),
+                            _random_point_objs(2, 50))
+    builds = []
+    search = simulation._neighbour_search
+
+    def counted_search(*args):
+        builds.append(len(args[0]))
+        return search(*args)
+
+    simulation._neighbour_search = counted_search
+    simulation.run(20)
+    # The search over the positions after a step is reused before the next one
+    assert len(builds) == 21
+
+    builds.clear()
+    single = Simulation(4.0, 6.0, CenterObject(), _random_point_objs(2, 1))
+    single._neighbour_search = counted_search
+    single.run(20)
+    # A single object has nothing to be close to
+    assert builds == []
@@ -0,0 +1,48 @@
+import numpy as np
+from simulation_output import SimulationOutput
+from space_event import SpaceEvent
+
+
+def test_simulation_output_from_lists():
+    sim_steps = [[np.array([1.0, 2.0]), np.array([3.0, 4.0])],
+                 [np.array([1.5, 2.5]), np.array([np.nan, np.nan])]]
+    output = SimulationOutput(sim_steps, [SpaceEvent(0, [1])], [])
+    assert output.simulation_steps.shape == (2, 2, 2)
+    assert output.simulation_steps.dtype == np.float64
+    np.testing.assert_array_equal(output[0][1][0], [1.5, 2.5])
+    assert np.isnan(output[0][1][1]).all()
+
+
+def test_simulation_output_events_round_trip():
+    collisions = [SpaceEvent(3, [0, 2]), SpaceEvent(3, [4, 5, 6]), SpaceEvent(7, [1, 8])]
+    close_calls = [SpaceEvent(1, [2, 3])]
+    output = SimulationOutput(np.zeros((8, 9, 2)), collisions, close_calls)
+    assert output.collisions == collisions
+    assert output.close_calls == close_calls
+    assert output.collision_records["step"].tolist() == [3, 3, 3, 3, 3, 7, 7]
+    assert output.collision_records["event"].tolist() == [0, 0, 1, 1, 1, 2, 2]
+
+
+def test_simulation_output_add_events():
+    output = SimulationOutput.allocate(4, 3, np.float32)
+    output.add_events([SpaceEvent(0, [0, 1])], [])
+    output.add_events([], [SpaceEvent(1, [1, 2])])
+    output.add_events([SpaceEvent(2, [1, 2])], [SpaceEvent(2, [0, 2])])
+    assert output.simulation_steps.dtype == np.float32
+    assert np.isnan(output.simulation_steps).all()
+    assert output.collisions == [SpaceEvent(0, [0, 1]), SpaceEvent(2, [1, 2])]
+    assert output.close_calls == [SpaceEvent(1, [1, 2]), SpaceEvent(2, [0, 2])]
+
+
+def test_simulation_output_unpacking():
+    output = SimulationOutput(np.zeros((3, 1, 2)), [], [SpaceEvent(1, [0, 0])])
+    sim_steps, collisions, close_calls = output
+    assert sim_steps.shape == (3, 1, 2)
+    assert collisions == []
+    assert close_calls == [SpaceEvent(1, [0, 0])]
+
+
+def test_simulation_output_truncate():
+    output = SimulationOutput(np.arange(12.0).reshape(3, 2, 2), [], [])
+    output.truncate(1)
+    assert output.simulation_steps.shape == (2, 2, 2)
@@ -1,4 +1,7 @@
+import pytest
 import numpy as np
+import errors
+from PIL import Image, ImageDraw
 from simulation_visualizer import SimulationVisualizer
 from center_object import CenterObject
 from point_object import PointObject
@@ -81,3 +84,145 @@ def test_simulation_visualiser_generate_report_close_calls():
                        "end position = (50.0, 50.0)\n\nCollisions:\n" +
                        "\nClose calls:\nn=1, n=2 at k=1\nn=3 at k=2\n")
     assert report == expected_report
+
+
+def test_simulation_visualizer_draw_incrementally():
+    sim_vis = SimulationVisualizer([101, 101], 1.0)
+    center_obj = CenterObject(20.0)
+    sim_steps = np.array([[[48.0, 48.0], [-10.0, 30.0]], [[40.0, 20.0], [np.nan, np.nan]],
+                          [[30.0, 0.0], [np.nan, np.nan]]])
+    point_objs = [PointObject(np.array([30.0, 0.0])), PointObject(np.array([-10.0, 30.0]))]
+    expected = sim_vis.draw(center_obj, point_objs, sim_steps)
+
+    output = sim_vis.new_image(center_obj)
+    sim_vis.draw_steps(output, sim_steps[:1])
+    sim_vis.draw_steps(output, sim_steps[1:])
+    sim_vis.draw_end_positions(output, point_objs)
+    assert output.tobytes() == expected.tobytes()
+
+
+def test_simulation_visualiser_generate_event_report():
+    report = SimulationVisualizer.generate_event_report(
+        np.array([[48.0, 48.0]]), [SpaceEvent(1, [0])], [],
+        [PointObject(np.array([50.0, 50.0]))])
+    expected_report = ("Objects:\nn=0, start position = (48.0, 48.0), " +
+                       "end position = (50.0, 50.0)\n\nCollisions:\nn=0 at k=1\n" +
+                       "\nClose calls:\n")
+    assert report == expected_report
+
+
+def _reference_draw_steps(sim_vis, output, simulation_steps, color):
+    """Legacy per-point drawing, which the vectorized one has to match."""
+    draw_output = ImageDraw.Draw(output)
+    img_center = sim_vis._image_center()
+    for step in simulation_steps:
+        for obj_pos in step:
+            if np.isnan(obj_pos).any():
+                continue
+            corrected_pos = obj_pos * np.array([1, -1])
+            pixel_pos = (corrected_pos / sim_vis._meters_per_pixel).round()
+            draw_output.point(tuple(img_center + pixel_pos), color)
+
+
+@pytest.mark.parametrize("step_color", [(0, 255, 0), (300, -5, 128)])
+def test_simulation_visualizer_draw_steps_matches_reference(step_color):
+    rng = np.random.default_rng(5)
+    sim_vis = SimulationVisualizer([90, 61], 2.0, point_obj_color=step_color)
+    center_obj = CenterObject(20.0)
+    sim_steps = rng.uniform(-110.0, 110.0, (30, 40, 2))
+    sim_steps[:, ::7] = np.nan
+    # Half-pixel positions test that rounding is the same
+    sim_steps[0, :10] = rng.integers(-50, 50, (10, 2)) + 0.5
+    sim_steps[0, 10:12] = [[1.0e300, 0.0], [-0.9, -0.9]]
+
+    output = sim_vis.new_image(center_obj)
+    sim_vis.draw_steps(output, sim_steps)
+    expected = sim_vis.new_image(center_obj)
+    _reference_draw_steps(sim_vis, expected, sim_steps, step_color)
+    assert list(output.getdata()) == list(expected.getdata())
+
+
+def test_simulation_visualizer_draw_end_positions_off_image():
+    sim_vis = SimulationVisualizer([11, 11], 1.0)
+    output = Image.new("RGB", (11, 11))
+    point_objs = [PointObject(np.array([-5.0, 5.0])), PointObject(np.array([6.0, 0.0])),
+                  PointObject(np.array([0.0, -6.0]))]
+    sim_vis.draw_end_positions(output, point_objs)
+    assert output.getpixel((1, 1)) == (255, 0, 0)
+    assert sum(pixel != (0, 0, 0) for pixel in output.getdata()) == 1
+
+
+def test_simulation_visualizer_accumulate_steps():
+    sim_vis = SimulationVisualizer([11, 11], 1.0)
+    heatmap = sim_vis.new_heatmap()
+    sim_steps = [[np.array([0.0, 0.0]), np.array([2.0, 3.0])],
+                 [np.array([0.0, 0.0]), np.array([np.nan, np.nan])],
+                 [np.array([0.0, 0.0]), np.array([40.0, 0.0])]]
+    sim_vis.accumulate_steps(heatmap, sim_steps)
+    assert heatmap[6, 6] == 3
+    assert heatmap[3, 8] == 1
+    assert heatmap.sum() == 4
+
+
+def test_simulation_visualizer_accumulate_steps_in_chunks():
+    rng = np.random.default_rng(2)
+    sim_vis = SimulationVisualizer([40, 30], 1.0)
+    sim_steps = rng.normal(0.0, 6.0, (50, 20, 2))
+    whole = sim_vis.new_heatmap()
+    sim_vis.accumulate_steps(whole, sim_steps)
+    chunked = sim_vis.new_heatmap()
+    for start in range(0, 50, 3):
+        # Small chunks use np.add.at, big ones bincount, both must count the same
+        sim_vis.accumulate_steps(chunked, sim_steps[start:start + 3, :2])
+        sim_vis.accumulate_steps(chunked, sim_steps[start:start + 3, 2:])
+    np.testing.assert_array_equal(whole, chunked)
+    assert whole.shape == (30, 40)
+
+
+@pytest.mark.parametrize("scaling", ["log", "equalize"])
+def test_simulation_visualizer_draw_heatmap(scaling):
+    sim_vis = SimulationVisualizer([11, 11], 1.0, point_obj_color=(0, 200, 0))
+    output = Image.new("RGB", (11, 11))
+    heatmap = sim_vis.new_heatmap()
+    heatmap[0, 0] = 1
+    heatmap[0, 1] = 10
+    heatmap[0, 2] = 100
+    sim_vis.draw_heatmap(output, heatmap, scaling)
+    greens = [output.getpixel((x, 0))[1] for x in range(3)]
+    assert 0 < greens[0] < greens[1] < greens[2] == 200
+    assert output.getpixel((3, 0)) == (0, 0, 0)
+
+
+def test_simulation_visualizer_draw_heatmap_invalid_scaling():
+    sim_vis = SimulationVisualizer([11, 11], 1.0)
+    with pytest.raises(errors.InvalidHeatmapScalingError):
+        sim_vis.draw_heatmap(Image.new("RGB", (11, 11)), sim_vis.new_heatmap(),
+                             "linear")
+
+
+def test_simulation_visualizer_export_tile_pyramid(tmp_path):
+    rng = np.random.default_rng(4)
+    sim_vis = SimulationVisualizer([70, 45], 1.0)
+    center_obj = CenterObject(16.0)
+    sim_steps = rng.uniform(-40.0, 40.0, (20, 6, 2))
+    point_objs = [PointObject(position) for position in sim_steps[-1]]
+    pyramid = sim_vis.new_tile_pyramid(16)
+    sim_vis.bin_steps(pyramid, sim_steps[:8])
+    sim_vis.bin_steps(pyramid, sim_steps[8:])
+    saved_tiles = sim_vis.export_tile_pyramid(tmp_path, pyramid, center_obj, point_objs)
+    assert pyramid.levels == 4
+    assert saved_tiles == len(list(tmp_path.glob("*/*/*.png")))
+
+    # The last level stitched together is the same as the whole image
+    expected = sim_vis.draw(center_obj, point_objs, sim_steps)
+    stitched = Image.new("RGB", (70, 45))
+    for tile_path in tmp_path.glob("3/*/*.png"):
+        tile_x, tile_y = int(tile_path.parent.name), int(tile_path.stem)
+        with Image.open(tile_path) as tile:
+            stitched.paste(tile, (tile_x * 16, tile_y * 16))
+    assert list(stitched.getdata()) == list(expected.getdata())
+
+    # The first level is a single tile of the whole image zoomed out 8 times
+    assert list(tmp_path.glob("0/*/*.png")) == [tmp_path / "0" / "0" / "0.png"]
+    with Image.open(tmp_path / "0" / "0" / "0.png") as tile:
+        assert tile.size == (9, 6)
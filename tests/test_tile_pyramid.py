@@ -0,0 +1,46 @@
+import pytest
+import numpy as np
+import errors
+from tile_pyramid import TilePyramid
+
+
+def test_tile_pyramid_levels():
+    pyramid = TilePyramid([1000, 300], 256)
+    assert pyramid.levels == 3
+    assert pyramid.level_resolution(2) == (1000, 300)
+    assert pyramid.level_resolution(1) == (500, 150)
+    assert pyramid.level_resolution(0) == (250, 75)
+    assert TilePyramid([256, 256], 256).levels == 1
+
+
+def test_tile_pyramid_tiles():
+    pyramid = TilePyramid([20, 10], 4)
+    pyramid.add_pixels(np.array([[0, 0], [5, 1], [5, 1], [19, 9]]))
+    pyramid.add_pixels(np.array([[6, 2]]))
+    tiles = {(tile_x, tile_y): pixels.tolist()
+             for tile_x, tile_y, pixels in pyramid.tiles(pyramid.levels - 1)}
+    assert tiles == {(0, 0): [[0, 0]], (1, 0): [[1, 1], [2, 2]], (4, 2): [[3, 1]]}
+    # The level before halves the coordinates
+    tiles = {(tile_x, tile_y): pixels.tolist()
+             for tile_x, tile_y, pixels in pyramid.tiles(pyramid.levels - 2)}
+    assert tiles == {(0, 0): [[0, 0], [2, 0], [3, 1]], (2, 1): [[1, 0]]}
+
+
+def test_tile_pyramid_merges_pending_pixels():
+    pyramid = TilePyramid([64, 64], 8)
+    pyramid._MERGE_SIZE = 10
+    rng = np.random.default_rng(1)
+    pixels = rng.integers(0, 64, (300, 2))
+    for start in range(0, 300, 7):
+        pyramid.add_pixels(pixels[start:start + 7])
+    binned = np.concatenate([tile_pixels + (tile_x * 8, tile_y * 8) for tile_x, tile_y,
+                             tile_pixels in pyramid.tiles(pyramid.levels - 1)])
+    assert {tuple(pixel) for pixel in binned.tolist()} == \
+        {tuple(pixel) for pixel in pixels.tolist()}
+    assert len(binned) == len({tuple(pixel) for pixel in pixels.tolist()})
+
+
+@pytest.mark.parametrize("tile_size", [0, -256, 1.5])
+def test_tile_pyramid_invalid_tile_size(tile_size):
+    with pytest.raises(errors.InvalidTileSizeError):
+        TilePyramid([100, 100], tile_size)
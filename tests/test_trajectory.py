@@ -0,0 +1,114 @@
+import pytest
+import numpy as np
+import errors
+from center_object import CenterObject
+from point_object import PointObject
+from simulation import Simulation
+from trajectory import Trajectory, TrajectoryWriter, HEADER_SIZE
+
+
+def test_trajectory_round_trip(tmp_path):
+    path = tmp_path / "run.traj"
+    positions = np.arange(5 * 3 * 2, dtype=float).reshape(5, 3, 2)
+    positions[3:, 1] = np.nan
+    with TrajectoryWriter(path, 3, 12.5) as writer:
+        writer.write(positions[:2])
+        writer.write(positions[2:])
+        assert writer.steps == 5
+    trajectory = Trajectory(path)
+    assert trajectory.steps == 5
+    assert trajectory.point_obj_amount == 3
+    assert trajectory.meters_per_pixel == 12.5
+    assert trajectory.dtype == np.float64
+    assert isinstance(trajectory.positions, np.memmap)
+    np.testing.assert_array_equal(trajectory.positions, positions)
+
+
+def test_trajectory_float32(tmp_path):
+    path = tmp_path / "run.traj"
+    positions = np.random.default_rng(0).normal(size=(4, 2, 2))
+    with TrajectoryWriter(path, 2, 1.0, np.float32) as writer:
+        writer.write(positions)
+    assert path.stat().st_size == HEADER_SIZE + 4 * 2 * 2 * 4
+    trajectory = Trajectory(path)
+    assert trajectory.dtype == np.float32
+    np.testing.assert_array_equal(trajectory.positions, positions.astype(np.float32))
+
+
+def test_trajectory_reopen(tmp_path):
+    path = tmp_path / "run.traj"
+    positions = np.random.default_rng(0).normal(size=(6, 2, 2))
+    with TrajectoryWriter(path, 2, 3.0, np.float32) as writer:
+        writer.write(positions[:5])
+    with TrajectoryWriter.reopen(path, 3) as writer:
+        assert writer.steps == 3
+        writer.write(positions[3:])
+    trajectory = Trajectory(path)
+    assert trajectory.steps == 6
+    assert trajectory.meters_per_pixel == 3.0
+    np.testing.assert_array_equal(trajectory.positions, positions.astype(np.float32))
+    del trajectory
+    with pytest.raises(errors.InvalidTrajectoryFileError):
+        TrajectoryWriter.reopen(path, 7)
+
+
+def test_trajectory_iter_chunks(tmp_path):
+    path = tmp_path / "run.traj"
+    positions = np.arange(7 * 2 * 2, dtype=float).reshape(7, 2, 2)
+    with TrajectoryWriter(path, 2, 1.0) as writer:
+        writer.write(positions)
+    chunks = list(Trajectory(path).iter_chunks(3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    np.testing.assert_array_equal(np.concatenate(chunks), positions)
+
+
+def test_trajectory_readable_while_writing(tmp_path):
+    path = tmp_path / "run.traj"
+    writer = TrajectoryWriter(path, 1, 1.0)
+    writer.write(np.zeros((2, 1, 2)))
+    writer.sync()
+    assert Trajectory(path).steps == 2
+    writer.close()
+
+
+def test_trajectory_wrong_shape(tmp_path):
+    with TrajectoryWriter(tmp_path / "run.traj", 2, 1.0) as writer:
+        with pytest.raises(ValueError):
+            writer.write(np.zeros((1, 3, 2)))
+
+
+@pytest.mark.parametrize("content", [b"", b"NOTATRAJ" + bytes(56)])
+def test_trajectory_invalid_file(tmp_path, content):
+    path = tmp_path / "run.traj"
+    path.write_bytes(content)
+    with pytest.raises(errors.InvalidTrajectoryFileError):
+        Trajectory(path)
+
+
+def test_trajectory_truncated_file(tmp_path):
+    path = tmp_path / "run.traj"
+    with TrajectoryWriter(path, 2, 1.0) as writer:
+        writer.write(np.zeros((3, 2, 2)))
+    path.write_bytes(path.read_bytes()[:-8])
+    with pytest.raises(errors.InvalidTrajectoryFileError):
+        Trajectory(path)
+
+
+def test_trajectory_missing_file(tmp_path):
+    with pytest.raises(errors.InvalidTrajectoryFileError):
+        Trajectory(tmp_path / "missing.traj")
+
+
+def test_trajectory_from_simulation(tmp_path):
+    center_obj = CenterObject(10.0, 1.0e20)
+    point_objs = [PointObject(np.array([100.0 * i, 50.0]), 1.0, np.array([0.0, 5.0]))
+                  for i in range(1, 6)]
+    expected = Simulation(4.0, 6.0, center_obj, point_objs).run(10).simulation_steps
+    point_objs = [PointObject(np.array([100.0 * i, 50.0]), 1.0, np.array([0.0, 5.0]))
+                  for i in range(1, 6)]
+    simulation = Simulation(4.0, 6.0, center_obj, point_objs)
+    path = tmp_path / "run.traj"
+    with TrajectoryWriter(path, 5, 4.0) as writer:
+        for chunk in simulation.iterate(10, chunk_size=3):
+            writer.write(chunk.positions)
+    np.testing.assert_array_equal(Trajectory(path).positions, expected)
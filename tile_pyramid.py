@@ -0,0 +1,96 @@
+import errors
+import numpy as np
+from typing import Iterator
+
+
+class TilePyramid:
+    # Keys binned from separate chunks are merged once there are this many
+    _MERGE_SIZE = 2**22
+
+    def __init__(self, resolution: list[int], tile_size: int = 256):
+        """
+        Spatial bins of the pixels lit by steps, for every zoom level of a tiled
+        image pyramid. The last level has the given (full) resolution, every
+        level before it halves it, down to level 0, which fits in a single tile.
+        Only the lit pixels are kept, so the full image is never allocated.
+        """
+        if type(tile_size) is not int or tile_size <= 0:
+            raise errors.InvalidTileSizeError
+        self._resolution = tuple(resolution)
+        self._tile_size = tile_size
+        levels = 1
+        while max(self._resolution) > tile_size << (levels - 1):
+            levels += 1
+        self._levels = levels
+        # Sorted unique keys (y * width + x) of lit pixels of each level
+        self._keys = [np.empty(0, dtype=np.int64) for _ in range(levels)]
+        self._pending_keys = [[] for _ in range(levels)]
+        self._pending_size = 0
+
+    @property
+    def resolution(self) -> tuple[int]:
+        return self._resolution
+
+    @property
+    def tile_size(self) -> int:
+        return self._tile_size
+
+    @property
+    def levels(self) -> int:
+        return self._levels
+
+    def level_shift(self, level: int) -> int:
+        """Returns by how many bits pixel coordinates are shifted at the given level."""
+        return self._levels - 1 - level
+
+    def level_resolution(self, level: int) -> tuple[int]:
+        """Returns the resolution of the whole image at the given level."""
+        scale = 1 << self.level_shift(level)
+        return tuple((size + scale - 1) // scale for size in self._resolution)
+
+    def add_pixels(self, pixels: np.ndarray):
+        """
+        Bins (m, 2) pixel coordinates of the full resolution image, which have to
+        be on the image, into every level.
+        """
+        pixels = np.asarray(pixels, dtype=np.int64)
+        for level in range(self._levels):
+            level_pixels = pixels >> self.level_shift(level)
+            width = self.level_resolution(level)[0]
+            keys = np.unique(level_pixels[:, 1] * width + level_pixels[:, 0])
+            self._pending_keys[level].append(keys)
+            self._pending_size += len(keys)
+        if self._pending_size >= self._MERGE_SIZE:
+            self._merge()
+
+    def tiles(self, level: int) -> Iterator[tuple[int, int, np.ndarray]]:
+        """
+        Yields the x and y index of each tile of the given level with any lit
+        pixels and the (m, 2) coordinates of these pixels within the tile.
+        """
+        self._merge()
+        keys = self._keys[level]
+        width = self.level_resolution(level)[0]
+        pixels = np.stack((keys % width, keys // width), axis=1)
+        tile_indexes = pixels // self._tile_size
+        tiles_x = -(-width // self._tile_size)
+        tile_keys = tile_indexes[:, 1] * tiles_x + tile_indexes[:, 0]
+        order = np.argsort(tile_keys, kind="stable")
+        pixels = pixels[order]
+        tile_keys = tile_keys[order]
+        bounds = np.flatnonzero(np.diff(tile_keys)) + 1
+        for tile_pixels in np.split(pixels, bounds):
+            if len(tile_pixels) == 0:
+                continue
+            tile_index = tile_pixels[0] // self._tile_size
+            tile_x, tile_y = tile_index.tolist()
+            yield tile_x, tile_y, tile_pixels - tile_index * self._tile_size
+
+    def _merge(self):
+        """Merges the keys binned from separate chunks."""
+        for level in range(self._levels):
+            if len(self._pending_keys[level]) > 0:
+                self._keys[level] = np.unique(
+                    np.concatenate([self._keys[level]] + self._pending_keys[level]))
+                self._pending_keys[level] = []
+        self._pending_size = 0
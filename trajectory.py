@@ -0,0 +1,151 @@
+import os
+import struct
+import errors
+import numpy as np
+from pathlib import Path
+from typing import Iterator
+from profiler import profiled
+
+# Header: magic, format version, position dtype, point object amount, amount of
+# stored steps (including the starting positions) and meters per pixel
+_MAGIC = b"GRAVTRAJ"
+_VERSION = 1
+_HEADER_FORMAT = "<8sI4sQQd"
+# Positions start at this offset, so they are aligned for any dtype
+HEADER_SIZE = 64
+_STEPS_OFFSET = struct.calcsize("<8sI4sQ")
+# Dtypes positions can be stored as, always little endian
+_DTYPES = {"<f4": np.dtype("<f4"), "<f8": np.dtype("<f8")}
+
+
+class TrajectoryWriter:
+    def __init__(self, path: Path, point_obj_amount: int, meters_per_pixel: float,
+                 dtype: type = np.float64):
+        """
+        Opens a trajectory file for writing. Positions of all point objects are
+        appended step by step with write(), the amount of steps in the header is
+        updated on every write, so the file is valid even if the run is interrupted.
+        """
+        self._dtype = np.dtype(dtype).newbyteorder("<")
+        if self._dtype.str not in _DTYPES:
+            raise ValueError("Positions can only be stored as float32 or float64.")
+        self._point_obj_amount = point_obj_amount
+        self._meters_per_pixel = meters_per_pixel
+        self._steps = 0
+        self._file = Path.open(path, "wb")
+        header = struct.pack(_HEADER_FORMAT, _MAGIC, _VERSION,
+                             self._dtype.str.encode(), point_obj_amount, 0,
+                             meters_per_pixel)
+        self._file.write(header.ljust(HEADER_SIZE, b"\0"))
+
+    @classmethod
+    def reopen(cls, path: Path, steps: int):
+        """
+        Opens an existing trajectory file to continue writing it after its first
+        steps, the ones after them are dropped - for example the ones written after
+        the checkpoint a run is resumed from.
+        """
+        trajectory = Trajectory(path)
+        if trajectory.steps < steps:
+            raise errors.InvalidTrajectoryFileError
+        writer = cls.__new__(cls)
+        writer._dtype = trajectory.dtype
+        writer._point_obj_amount = trajectory.point_obj_amount
+        writer._meters_per_pixel = trajectory.meters_per_pixel
+        writer._steps = steps
+        # The memory map has to be gone before the file is truncated
+        del trajectory
+        writer._file = Path.open(path, "r+b")
+        writer._file.truncate(HEADER_SIZE + steps * writer._point_obj_amount * 2
+                              * writer._dtype.itemsize)
+        writer._file.seek(_STEPS_OFFSET)
+        writer._file.write(struct.pack("<Q", steps))
+        return writer
+
+    @property
+    def steps(self) -> int:
+        return self._steps
+
+    @profiled("trajectory.write", lambda self, positions: np.size(positions) // 2)
+    def write(self, positions: np.ndarray):
+        """Appends a (k, n, 2) block of positions - k consecutive steps."""
+        positions = np.ascontiguousarray(positions, dtype=self._dtype)
+        if positions.shape[1:] != (self._point_obj_amount, 2):
+            raise ValueError("Positions don't match the amount of point objects.")
+        self._file.seek(0, 2)
+        self._file.write(positions.tobytes())
+        self._steps += len(positions)
+        self._file.seek(_STEPS_OFFSET)
+        self._file.write(struct.pack("<Q", self._steps))
+
+    def sync(self):
+        """Makes all written steps and the header durable on the disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Trajectory:
+    def __init__(self, path: Path):
+        """
+        Opens a trajectory file for reading. Positions are memory-mapped,
+        so they are only read from the disk once accessed.
+        """
+        try:
+            with Path.open(path, "rb") as file:
+                header = file.read(HEADER_SIZE)
+        except OSError:
+            raise errors.InvalidTrajectoryFileError
+        if len(header) < HEADER_SIZE:
+            raise errors.InvalidTrajectoryFileError
+        magic, version, dtype, point_obj_amount, steps, meters_per_pixel = \
+            struct.unpack_from(_HEADER_FORMAT, header)
+        dtype = dtype.rstrip(b"\0").decode(errors="replace")
+        if magic != _MAGIC or version != _VERSION or dtype not in _DTYPES:
+            raise errors.InvalidTrajectoryFileError
+        self._meters_per_pixel = meters_per_pixel
+        dtype = _DTYPES[dtype]
+        shape = (steps, point_obj_amount, 2)
+        data_size = steps * point_obj_amount * 2 * dtype.itemsize
+        if Path(path).stat().st_size < HEADER_SIZE + data_size:
+            raise errors.InvalidTrajectoryFileError
+        if steps * point_obj_amount == 0:
+            self._positions = np.empty(shape, dtype=dtype)
+        else:
+            self._positions = np.memmap(path, dtype=dtype, mode="r",
+                                        offset=HEADER_SIZE, shape=shape)
+
+    @property
+    def positions(self) -> np.ndarray:
+        """(steps, n, 2) positions of point objects, read lazily from the file."""
+        return self._positions
+
+    @property
+    def point_obj_amount(self) -> int:
+        return self._positions.shape[1]
+
+    @property
+    def steps(self) -> int:
+        """Amount of stored steps, including the starting positions."""
+        return self._positions.shape[0]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._positions.dtype
+
+    @property
+    def meters_per_pixel(self) -> float:
+        return self._meters_per_pixel
+
+    def iter_chunks(self, chunk_steps: int) -> Iterator[np.ndarray]:
+        """Yields the positions in blocks of at most chunk_steps steps."""
+        for start in range(0, self.steps, chunk_steps):
+            yield self._positions[start:start + chunk_steps]